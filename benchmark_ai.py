@@ -0,0 +1,254 @@
+"""Load-test the AI cogs against the offline fake Gemini backend.
+
+Builds the same services the bot does (LLMService, response cache, semantic
+index, conversation memory, role assigner) around a `FakeBackend`, then runs
+`--users` concurrent simulated members issuing a mix of AI commands through
+the cogs' own code paths. Reports per-command latency, errors, scheduler and
+cache counters, and event-loop lag. No Discord connection, quota or network
+is needed.
+
+    python benchmark_ai.py --users 50 --requests 500 --latency-ms 800 --error-rate 0.05
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "src")
+sys.path.insert(0, SRC_DIR)
+
+from cogs.ai_commands import AICommands  # noqa: E402
+from cogs.game_commands import GameCommands  # noqa: E402
+from cogs.template_manager import TemplateManager  # noqa: E402
+from constants import (  # noqa: E402
+    AI_RESPONSE_CACHE_SIZE,
+    AI_RESPONSE_CACHE_TTL,
+    CONVERSATION_COMPACT_AT,
+    CONVERSATION_KEEP_RECENT,
+    CONVERSATION_MAX_USERS,
+    CONVERSATION_TOKEN_BUDGET,
+    LLM_DEFAULT_MODEL,
+    LLM_GLOBAL_RPM,
+    LLM_LITE_MODEL,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_RETRIES,
+    LLM_MODEL_RPM,
+    LLM_TIMEOUT,
+    ROLE_ANALYSIS_CONCURRENCY,
+    ROLE_BATCH_SIZE,
+    ROLE_BATCH_WINDOW,
+    ROLE_KEYWORDS_CONFIG_PATH,
+    ROLES_CONFIG_PATH,
+    SEMANTIC_CACHE_CAPACITY,
+    SEMANTIC_CACHE_DIM,
+    SEMANTIC_CACHE_THRESHOLD,
+)
+from model.cache import TTLCache  # noqa: E402
+from model.conversation import ConversationMemory  # noqa: E402
+from model.llm import LLMService  # noqa: E402
+from model.llm_backends import FakeBackend  # noqa: E402
+from model.metrics import LatencyTracker  # noqa: E402
+from model.role_assigner import RoleAssigner  # noqa: E402
+from model.semantic_cache import SemanticIndex  # noqa: E402
+from model.watchdog import LoopWatchdog  # noqa: E402
+
+TOPICS = [
+    "black holes", "photosynthesis", "the french revolution", "blockchains", "plate tectonics",
+    "neural networks", "the water cycle", "inflation", "vaccines", "quantum entanglement",
+]
+
+QUESTIONS = [
+    "what should I cook tonight?", "can you recommend a sci-fi book?", "how do I get better at chess?",
+    "what's a good stretching routine?", "why is the sky blue?", "tell me something about octopuses",
+]
+
+INTROS = [
+    "Hey all! I'm a developer who spends weekends hiking and playing chess.",
+    "Hi, I'm Sam. I draw a lot, mostly anime fan art, and I'm learning the guitar as a musician in training.",
+    "Hello! Long time gamer, part time streamer, full time coffee drinker. Also a big reader of fantasy.",
+    "I'm new here. I work in a hospital and like gardening and taking my dog on long walks.",
+    "yo, photographer and traveler, currently backpacking through south america",
+]
+
+DIFFICULTIES = ["easy", "medium", "hard"]
+GENRES = ["general", "science", "history", "geography"]
+TEMPLATE_DESCRIPTIONS = ["a small book club", "a competitive esports team", "a study group for students"]
+
+# (weight, name) — roughly how often members use each command
+DEFAULT_MIX: List[Tuple[int, str]] = [
+    (30, "ask"),
+    (25, "explain"),
+    (25, "trivia"),
+    (15, "intro"),
+    (5, "template"),
+]
+
+
+class Bench:
+    """The bot's AI services and cogs wired to a fake backend."""
+
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.backend = FakeBackend(
+            latency_ms=args.latency_ms,
+            latency_sigma=args.latency_sigma,
+            error_rate=args.error_rate,
+            chunk_chars=args.chunk_chars,
+            chunk_interval_ms=args.chunk_interval_ms,
+            seed=args.seed,
+        )
+        model_rpm = {} if args.unlimited else LLM_MODEL_RPM
+        self.llm = LLMService(
+            None,
+            default_model=LLM_DEFAULT_MODEL,
+            max_concurrency=args.concurrency,
+            global_rpm=1e9 if args.unlimited else LLM_GLOBAL_RPM,
+            model_rpm=model_rpm,
+            timeout=LLM_TIMEOUT,
+            max_retries=LLM_MAX_RETRIES,
+            retry_base_delay=0.2,
+            backend=self.backend,
+        )
+        memory = ConversationMemory(
+            max_users=CONVERSATION_MAX_USERS,
+            token_budget=CONVERSATION_TOKEN_BUDGET,
+            llm=self.llm,
+            summary_model=LLM_LITE_MODEL,
+            compact_at=CONVERSATION_COMPACT_AT,
+            keep_recent=CONVERSATION_KEEP_RECENT,
+        )
+        self.ai = AICommands(
+            None,
+            self.llm,
+            TTLCache(max_size=AI_RESPONSE_CACHE_SIZE, ttl=AI_RESPONSE_CACHE_TTL),
+            SemanticIndex(SEMANTIC_CACHE_CAPACITY, SEMANTIC_CACHE_DIM, SEMANTIC_CACHE_THRESHOLD),
+            memory,
+        )
+        self.games = GameCommands(None, None, None, self.llm)
+        self.templates = TemplateManager(None, self.llm)
+        self.roles = RoleAssigner(
+            self.llm,
+            os.path.join(SRC_DIR, ROLES_CONFIG_PATH),
+            max_concurrency=ROLE_ANALYSIS_CONCURRENCY,
+            batch_size=ROLE_BATCH_SIZE,
+            batch_window=ROLE_BATCH_WINDOW,
+            keywords_path=os.path.join(SRC_DIR, ROLE_KEYWORDS_CONFIG_PATH),
+        )
+
+        self.commands: Dict[str, Callable[[random.Random, int], Awaitable[bool]]] = {
+            "ask": self.ask,
+            "explain": self.explain,
+            "trivia": self.trivia,
+            "intro": self.intro,
+            "template": self.template,
+        }
+
+    # Each returns whether the command produced a usable answer.
+
+    async def ask(self, rng: random.Random, user_id: int) -> bool:
+        parts = [c async for c in self.ai.stream_gemini_response(
+            rng.choice(QUESTIONS), user_id=user_id, use_history=True, tag="ask")]
+        return not "".join(parts).startswith("❌")
+
+    async def explain(self, rng: random.Random, user_id: int) -> bool:
+        topic = rng.choice(TOPICS)
+        parts = [c async for c in self.ai.stream_gemini_response(
+            f"Explain {topic} simply.", cache_key=self.ai._cache_key("explain", topic), tag="explain")]
+        return not "".join(parts).startswith("❌")
+
+    async def trivia(self, rng: random.Random, user_id: int) -> bool:
+        question = await self.games._generate_trivia_with_gemini(rng.choice(DIFFICULTIES), rng.choice(GENRES))
+        return len(question.get("options", [])) == 4
+
+    async def intro(self, rng: random.Random, user_id: int) -> bool:
+        await self.roles.analyze_intro(f"{rng.choice(INTROS)} (member {user_id})")
+        return True
+
+    async def template(self, rng: random.Random, user_id: int) -> bool:
+        description = rng.choice(TEMPLATE_DESCRIPTIONS)
+        if rng.random() < 0.5:
+            return "role_categories" in await self.templates._generate_roles_template(description)
+        return "categories" in await self.templates._generate_channels_template(description)
+
+
+async def run(args: argparse.Namespace) -> None:
+    bench = Bench(args)
+    watchdog = LoopWatchdog()
+    watchdog.start()
+
+    weights, names = zip(*DEFAULT_MIX)
+    latency: Dict[str, LatencyTracker] = {name: LatencyTracker(window=args.requests) for name in names}
+    failures: Dict[str, int] = {name: 0 for name in names}
+    remaining = args.requests
+
+    async def member(index: int) -> None:
+        nonlocal remaining
+        rng = random.Random(None if args.seed is None else args.seed + index)
+        while remaining > 0:
+            remaining -= 1
+            name = rng.choices(names, weights)[0]
+            started = time.monotonic()
+            try:
+                ok = await bench.commands[name](rng, 1000 + index)
+            except Exception:
+                ok = False
+            latency[name].record(time.monotonic() - started)
+            if not ok:
+                failures[name] += 1
+            if args.think_ms:
+                await asyncio.sleep(rng.expovariate(1000 / args.think_ms))
+
+    started = time.monotonic()
+    await asyncio.gather(*(member(i) for i in range(args.users)))
+    elapsed = time.monotonic() - started
+    watchdog.stop()
+
+    print(f"\n{args.requests} commands from {args.users} members in {elapsed:.1f}s "
+          f"({args.requests / elapsed:.1f}/s)\n")
+    print(f"{'command':<10}{'count':>7}{'failed':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for name in names:
+        s = latency[name].summary((50, 95, 99))
+        if not s["count"]:
+            continue
+        print(f"{name:<10}{s['count']:>7}{failures[name]:>8}{s['p50'] * 1000:>9.0f}"
+              f"{s['p95'] * 1000:>9.0f}{s['p99'] * 1000:>9.0f}{s['max'] * 1000:>9.0f}")
+
+    llm = bench.llm.get_stats()
+    cache = bench.ai.response_cache.get_stats()
+    roles = bench.roles.get_stats()
+    lag = watchdog.get_stats()
+    print(f"\nbackend calls {bench.backend.calls} • injected failures {bench.backend.failures}")
+    print(f"llm calls {llm['calls']} • p50 {llm['p50'] * 1000:.0f}ms • p95 {llm['p95'] * 1000:.0f}ms • "
+          f"first chunk p50 {llm['first_chunk_p50'] * 1000:.0f}ms")
+    print(f"llm retries {llm['retries']} • errors {llm['errors']} • timeouts {llm['timeouts']} • "
+          f"coalesced {llm['coalesced']}")
+    print(f"response cache hits {cache['hits']} / misses {cache['misses']} ({cache['hit_ratio']:.0%})")
+    print(f"intros: local {roles['local_decisions']} • gemini {roles['llm_decisions']} • "
+          f"batches {roles['batches']} • cache hits {roles['cache_hits']}")
+    print(f"loop lag p50 {lag['p50_ms']:.1f}ms • p99 {lag['p99_ms']:.1f}ms • max {lag['max_ms']:.1f}ms • "
+          f"stalls {lag['stalls']}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20, help="concurrent simulated members")
+    parser.add_argument("--requests", type=int, default=200, help="total commands to issue")
+    parser.add_argument("--think-ms", type=float, default=0, help="mean pause between a member's commands")
+    parser.add_argument("--latency-ms", type=float, default=800, help="median fake model latency")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="log-normal latency shape")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of fake calls that fail")
+    parser.add_argument("--chunk-chars", type=int, default=40, help="characters per streamed chunk")
+    parser.add_argument("--chunk-interval-ms", type=float, default=50, help="delay between streamed chunks")
+    parser.add_argument("--concurrency", type=int, default=LLM_MAX_CONCURRENCY, help="LLMService slots")
+    parser.add_argument("--unlimited", action="store_true", help="disable the RPM buckets")
+    parser.add_argument("--seed", type=int, default=None)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(run(parse_args()))
@@ -14,6 +14,7 @@ from sqlalchemy import func
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
 
 from logger import get_logger  # noqa: E402
+from model.llm_usage import histogram_percentile  # noqa: E402
 from model.model import (  # noqa: E402
     Birthday,
     Database,
@@ -358,6 +359,42 @@ def trivia_stats():
     })
 
 
+# ============================================================================
+# Routes — LLM
+# ============================================================================
+
+@app.route("/api/llm/usage")
+def llm_usage():
+    hours = request.args.get("hours", 24, type=int)
+    cutoff = datetime.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(hours=hours - 1)
+
+    commands = []
+    for row in db.get_llm_usage(cutoff):
+        calls = row["calls"]
+        attempts = calls + row["errors"]
+        requests_seen = calls + row["cache_hits"]
+        commands.append({
+            "command": row["command"],
+            "calls": calls,
+            "errors": row["errors"],
+            "error_rate": round(row["errors"] / attempts * 100, 1) if attempts else 0,
+            "cache_hits": row["cache_hits"],
+            "cache_hit_rate": round(row["cache_hits"] / requests_seen * 100, 1) if requests_seen else 0,
+            "prompt_tokens": row["prompt_tokens"],
+            "response_tokens": row["response_tokens"],
+            "avg_latency_ms": round(row["latency_ms_total"] / calls) if calls else 0,
+            "p50_latency_ms": histogram_percentile(row["histogram"], 50),
+            "p95_latency_ms": histogram_percentile(row["histogram"], 95),
+        })
+
+    return jsonify({
+        "hours": hours,
+        "total_calls": sum(c["calls"] for c in commands),
+        "total_tokens": sum(c["prompt_tokens"] + c["response_tokens"] for c in commands),
+        "commands": commands,
+    })
+
+
 # ============================================================================
 # Entry point
 # ============================================================================
@@ -10,19 +10,80 @@ import discord
 from discord.ext import commands, tasks
 
 from constants import (
+    AI_RESPONSE_CACHE_PATH,
+    AI_RESPONSE_CACHE_SIZE,
+    AI_RESPONSE_CACHE_TTL,
+    CONVERSATION_COMPACT_AT,
+    CONVERSATION_IDLE_TTL,
+    CONVERSATION_KEEP_RECENT,
+    CONVERSATION_MAX_USERS,
+    CONVERSATION_TOKEN_BUDGET,
     DATABASE_PATH,
     DISCORD_TOKEN,
-    GREETINGS,
+    FAKE_LLM_CHUNK_CHARS,
+    FAKE_LLM_CHUNK_INTERVAL_MS,
+    FAKE_LLM_ERROR_RATE,
+    FAKE_LLM_LATENCY_MS,
+    FAKE_LLM_LATENCY_SIGMA,
+    GAME_SESSION_SNAPSHOT_INTERVAL,
+    GEMINI_API_KEY,
+    INTRO_CACHE_PATH,
+    INTRO_CACHE_SIZE,
+    INTRO_CACHE_TTL,
+    LLM_DEFAULT_MODEL,
+    LLM_BACKEND,
+    LLM_GLOBAL_RPM,
+    LLM_LITE_MODEL,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_RETRIES,
+    LLM_MODEL_RPM,
+    LLM_TIMEOUT,
+    LOOP_LAG_INTERVAL,
+    LOOP_LAG_THRESHOLD,
     MIN_INTRO_LENGTH,
+    MUSIC_COOKIE_BROWSER,
+    MUSIC_COOKIE_PATH,
+    MUSIC_COOKIE_REFRESH_HOURS,
+    MUSIC_EXTRACT_MAX_PENDING,
+    MUSIC_EXTRACT_TIMEOUT,
+    MUSIC_EXTRACT_WORKERS,
     RANDOM_REACTION_CHANCE,
     RANDOM_REACTIONS,
+    ROLE_ANALYSIS_CONCURRENCY,
+    ROLE_ANALYSIS_RETRIES,
+    ROLE_ANALYSIS_TIMEOUT,
+    ROLE_BATCH_SIZE,
+    ROLE_BATCH_WINDOW,
+    ROLE_KEYWORDS_CONFIG_PATH,
+    ROLE_LOCAL_CONFIDENCE,
+    ROLE_LOCAL_MATCH_THRESHOLD,
+    ROLE_LOCAL_MAX_WORDS,
     ROLES_CONFIG_PATH,
+    SEMANTIC_CACHE_CAPACITY,
+    SEMANTIC_CACHE_DIM,
+    SEMANTIC_CACHE_THRESHOLD,
     SPAM_THRESHOLD,
     SPAM_TIMEFRAME,
+    TRIGGERS_CONFIG_PATH,
+    TRIVIA_BANK_MIN_UNSEEN,
+    TRIVIA_BANK_SEEN_DAYS,
+    TRIVIA_MAX_SESSIONS,
+    TRIVIA_SESSION_IDLE_TTL,
+    TRIVIA_SESSION_RESUME_TTL,
+    WIKI_INDEX_DIR,
 )
 from logger import get_logger
+from model.cache import TTLCache
+from model.conversation import ConversationMemory
+from model.game_input import GameInputDispatcher
+from model.game_sessions import GameSessionRegistry
+from model.llm import LLMService
+from model.llm_backends import FakeBackend, GeminiBackend
+from model.llm_usage import LLMUsageTracker
+from model.media_extractor import MediaExtractor
 from model.model import Birthday, Database
 from model.role_assigner import RoleAssigner
+from model.semantic_cache import SemanticIndex
 from model.services import (
     BirthdayService,
     GameStatsService,
@@ -31,6 +92,10 @@ from model.services import (
     ReminderService,
     SpamDetector,
 )
+from model.triggers import TriggerEngine
+from model.trivia import TriviaBank
+from model.watchdog import LoopWatchdog
+from model.wiki_index import WikiIndex
 from utils import get_avatar_url
 
 log = get_logger(__name__)
@@ -40,7 +105,14 @@ log = get_logger(__name__)
 # Bot setup
 # ============================================================================
 
-bot = commands.Bot(command_prefix="!", intents=discord.Intents.all())
+class JuleBot(commands.Bot):
+    async def close(self) -> None:
+        # Stop the yt-dlp workers and fail queued lookups before the loop goes away
+        self.media_extractor.close()
+        await super().close()
+
+
+bot = JuleBot(command_prefix="!", intents=discord.Intents.all())
 
 db = Database(DATABASE_PATH)
 spam_detector = SpamDetector(db, threshold=SPAM_THRESHOLD, timeframe=SPAM_TIMEFRAME)
@@ -49,7 +121,83 @@ points_service = PointsService(db)
 birthday_service = BirthdayService(db)
 music_service = MusicService(db)
 game_stats_service = GameStatsService(db)
-role_assigner = RoleAssigner(ROLES_CONFIG_PATH)
+trivia_bank = TriviaBank(db, seen_window_days=TRIVIA_BANK_SEEN_DAYS, min_unseen=TRIVIA_BANK_MIN_UNSEEN)
+game_input = GameInputDispatcher()
+trivia_sessions = GameSessionRegistry(
+    db,
+    "trivia",
+    max_sessions=TRIVIA_MAX_SESSIONS,
+    idle_ttl=TRIVIA_SESSION_IDLE_TTL,
+    resume_ttl=TRIVIA_SESSION_RESUME_TTL,
+)
+trivia_sessions.load()
+llm_usage = LLMUsageTracker(db)
+if LLM_BACKEND == "fake":
+    log.warning("LLM_BACKEND=fake: AI commands answer from the offline fake backend")
+    llm_backend = FakeBackend(
+        latency_ms=FAKE_LLM_LATENCY_MS,
+        latency_sigma=FAKE_LLM_LATENCY_SIGMA,
+        error_rate=FAKE_LLM_ERROR_RATE,
+        chunk_chars=FAKE_LLM_CHUNK_CHARS,
+        chunk_interval_ms=FAKE_LLM_CHUNK_INTERVAL_MS,
+    )
+else:
+    llm_backend = GeminiBackend(GEMINI_API_KEY)
+llm_service = LLMService(
+    GEMINI_API_KEY,
+    default_model=LLM_DEFAULT_MODEL,
+    max_concurrency=LLM_MAX_CONCURRENCY,
+    global_rpm=LLM_GLOBAL_RPM,
+    model_rpm=LLM_MODEL_RPM,
+    timeout=LLM_TIMEOUT,
+    max_retries=LLM_MAX_RETRIES,
+    usage=llm_usage,
+    backend=llm_backend,
+)
+ai_response_cache = TTLCache(max_size=AI_RESPONSE_CACHE_SIZE, ttl=AI_RESPONSE_CACHE_TTL)
+ai_response_cache.load(AI_RESPONSE_CACHE_PATH)
+semantic_index = SemanticIndex(
+    capacity=SEMANTIC_CACHE_CAPACITY,
+    dim=SEMANTIC_CACHE_DIM,
+    threshold=SEMANTIC_CACHE_THRESHOLD,
+)
+conversation_memory = ConversationMemory(
+    db,
+    max_users=CONVERSATION_MAX_USERS,
+    idle_ttl=CONVERSATION_IDLE_TTL,
+    token_budget=CONVERSATION_TOKEN_BUDGET,
+    llm=llm_service,
+    summary_model=LLM_LITE_MODEL,
+    compact_at=CONVERSATION_COMPACT_AT,
+    keep_recent=CONVERSATION_KEEP_RECENT,
+)
+role_assigner = RoleAssigner(
+    llm_service,
+    ROLES_CONFIG_PATH,
+    max_concurrency=ROLE_ANALYSIS_CONCURRENCY,
+    timeout=ROLE_ANALYSIS_TIMEOUT,
+    max_retries=ROLE_ANALYSIS_RETRIES,
+    batch_size=ROLE_BATCH_SIZE,
+    batch_window=ROLE_BATCH_WINDOW,
+    keywords_path=ROLE_KEYWORDS_CONFIG_PATH,
+    local_match_threshold=ROLE_LOCAL_MATCH_THRESHOLD,
+    local_confidence=ROLE_LOCAL_CONFIDENCE,
+    local_max_words=ROLE_LOCAL_MAX_WORDS,
+    cache_path=INTRO_CACHE_PATH,
+    cache_size=INTRO_CACHE_SIZE,
+    cache_ttl=INTRO_CACHE_TTL,
+)
+trigger_engine = TriggerEngine(TRIGGERS_CONFIG_PATH)
+wiki_index = WikiIndex.open(WIKI_INDEX_DIR)
+loop_watchdog = LoopWatchdog(interval=LOOP_LAG_INTERVAL, threshold=LOOP_LAG_THRESHOLD)
+media_extractor = MediaExtractor(
+    workers=MUSIC_EXTRACT_WORKERS,
+    timeout=MUSIC_EXTRACT_TIMEOUT,
+    max_pending_per_guild=MUSIC_EXTRACT_MAX_PENDING,
+    cookie_browser=MUSIC_COOKIE_BROWSER or None,
+    cookie_file=MUSIC_COOKIE_PATH,
+)
+media_extractor.start()  # fork the yt-dlp workers while this process has no other threads
 
 bot.db = db
 bot.spam_detector = spam_detector
@@ -58,7 +206,18 @@ bot.points_service = points_service
 bot.birthday_service = birthday_service
 bot.music_service = music_service
 bot.game_stats_service = game_stats_service
+bot.trivia_bank = trivia_bank
+bot.game_input = game_input
+bot.trivia_sessions = trivia_sessions
+bot.llm_service = llm_service
+bot.ai_response_cache = ai_response_cache
+bot.semantic_index = semantic_index
+bot.conversation_memory = conversation_memory
 bot.role_assigner = role_assigner
+bot.trigger_engine = trigger_engine
+bot.wiki_index = wiki_index
+bot.loop_watchdog = loop_watchdog
+bot.media_extractor = media_extractor
 
 
 EXTENSIONS: List[str] = [
@@ -130,17 +289,23 @@ async def handle_intro_message(message: discord.Message) -> None:
 
 
 async def handle_natural_responses(message: discord.Message) -> None:
-    """Plain-text chit-chat triggers."""
-    content = message.content.lower()
-
-    if any(greet in content for greet in ("hey jule", "hi jule", "hello jule")):
-        await message.channel.send(random.choice(GREETINGS))
-    elif "thanks jule" in content or "thank you jule" in content:
-        await message.channel.send("You're very welcome! 💙 Happy to help!")
-    elif "good bot" in content:
-        await message.channel.send("Aww, thank you! 🥰 You're pretty great yourself!")
-    elif "avatar" in content and not message.mentions:
+    """Plain-text chit-chat triggers, configured in `TRIGGERS_CONFIG_PATH`."""
+    trigger = trigger_engine.match(
+        message.content,
+        guild_id=message.guild.id,
+        channel_id=message.channel.id,
+        has_mentions=bool(message.mentions),
+    )
+    if not trigger:
+        return
+
+    if trigger.action == "avatar":
         await message.channel.send(get_avatar_url(message.author))
+        return
+
+    response = trigger.pick_response()
+    if response:
+        await message.channel.send(response)
 
 
 async def _cache_member(member: discord.abc.User) -> None:
@@ -157,6 +322,8 @@ async def on_ready() -> None:
     log.info("Logged in as %s", bot.user)
     log.info("Database initialized at %s", db.db_path)
 
+    loop_watchdog.start()
+
     activity = discord.Activity(
         type=discord.ActivityType.watching,
         name="over our cozy nook 🏡",
@@ -169,6 +336,9 @@ async def on_ready() -> None:
     cleanup_tracking.start()
     check_birthdays.start()
     update_user_cache.start()
+    persist_caches.start()
+    snapshot_game_sessions.start()
+    refresh_music_cookies.start()
 
 
 async def load_extensions() -> None:
@@ -227,6 +397,9 @@ async def on_message(message: discord.Message) -> None:
     if message.author == bot.user:
         return
 
+    # Replies to running games; they still go through the checks below.
+    game_input.dispatch(message)
+
     if message.author.bot or not message.guild:
         await bot.process_commands(message)
         return
@@ -281,6 +454,8 @@ async def check_reminders() -> None:
 @tasks.loop(hours=1)
 async def cleanup_tracking() -> None:
     await spam_detector.cleanup_database()
+    trivia_bank.prune()
+    trigger_engine.prune()
     log.info("Cleaned up old message tracking data")
 
 
@@ -335,6 +510,32 @@ async def update_user_cache() -> None:
         log.error("Error updating user cache: %s", e)
 
 
+@tasks.loop(minutes=10)
+async def persist_caches() -> None:
+    try:
+        role_assigner.save_cache()
+        ai_response_cache.save(AI_RESPONSE_CACHE_PATH)
+        conversation_memory.flush()
+        llm_usage.flush()
+    except Exception as e:
+        log.error("Error persisting caches: %s", e)
+
+
+@tasks.loop(seconds=GAME_SESSION_SNAPSHOT_INTERVAL)
+async def snapshot_game_sessions() -> None:
+    try:
+        trivia_sessions.sweep()
+        await trivia_sessions.snapshot()
+    except Exception as e:
+        log.error("Error snapshotting game sessions: %s", e)
+
+
+@tasks.loop(hours=MUSIC_COOKIE_REFRESH_HOURS)
+async def refresh_music_cookies() -> None:
+    # Reading the browser's cookie store is blocking file and keyring I/O
+    await asyncio.to_thread(media_extractor.refresh_cookies)
+
+
 # ============================================================================
 # Error handling
 # ============================================================================
@@ -62,6 +62,126 @@ class AdminCommands(commands.Cog):
         except Exception as e:
             await ctx.send(f"❌ Error reloading role mappings: {str(e)}")
 
+    @commands.command(name="reloadtriggers", help="[Admin] Reload natural-response triggers configuration")
+    @commands.has_permissions(administrator=True)
+    async def reloadtriggers(self, ctx: commands.Context):
+        """Reload trigger configuration"""
+        try:
+            self.bot.trigger_engine.reload()
+            await ctx.send("✅ Triggers reloaded successfully!")
+        except Exception as e:
+            await ctx.send(f"❌ Error reloading triggers: {str(e)}")
+
+    @commands.command(name="perfstats", help="[Admin] Show bot performance metrics")
+    @commands.has_permissions(administrator=True)
+    async def perfstats(self, ctx: commands.Context):
+        """Show event-loop lag and other runtime metrics"""
+        embed = discord.Embed(title="📈 Performance Stats", color=discord.Color.blurple())
+
+        lag = self.bot.loop_watchdog.get_stats()
+        embed.add_field(
+            name="⏱️ Event Loop Lag",
+            value=(
+                f"p50 {lag['p50_ms']:.1f}ms • p95 {lag['p95_ms']:.1f}ms • p99 {lag['p99_ms']:.1f}ms\n"
+                f"max {lag['max_ms']:.0f}ms • stalls {lag['stalls']} • samples {lag['samples']}"
+            ),
+            inline=False
+        )
+
+        llm = self.bot.llm_service.get_stats()
+        embed.add_field(
+            name="🧠 Gemini",
+            value=(
+                f"queued {llm['queued']} • in flight {llm['in_flight']}\n"
+                f"p50 {llm['p50'] * 1000:.0f}ms • p95 {llm['p95'] * 1000:.0f}ms • calls {llm['calls']}\n"
+                f"first streamed text p50 {llm['first_chunk_p50'] * 1000:.0f}ms\n"
+                f"timeouts {llm['timeouts']} • errors {llm['errors']} • retries {llm['retries']}\n"
+                f"calls saved by coalescing {llm['coalesced']}"
+            ),
+            inline=False
+        )
+
+        per_command = self.bot.llm_service.usage.get_stats()
+        if per_command:
+            embed.add_field(
+                name="📊 Gemini by Command",
+                value="\n".join(
+                    f"`{tag}` {usage['count']} calls • p50 {usage['p50'] * 1000:.0f}ms • "
+                    f"p95 {usage['p95'] * 1000:.0f}ms"
+                    for tag, usage in list(per_command.items())[:10]
+                ),
+                inline=False
+            )
+
+        responses = self.bot.ai_response_cache.get_stats()
+        semantic = self.bot.semantic_index.get_stats()
+        embed.add_field(
+            name="🗃️ AI Response Cache",
+            value=(
+                f"hits {responses['hits']} • misses {responses['misses']} ({responses['hit_ratio']:.0%})\n"
+                f"entries {responses['size']}/{responses['max_size']}\n"
+                f"near-duplicate hits {semantic['hits']}/{semantic['lookups']} • "
+                f"search p50 {semantic['search_p50_ms']:.2f}ms • indexed {semantic['size']}"
+            ),
+            inline=False
+        )
+
+        memory = self.bot.conversation_memory.get_stats()
+        embed.add_field(
+            name="💬 Conversation Memory",
+            value=(
+                f"users {memory['users']}/{memory['max_users']} • evictions {memory['evictions']}\n"
+                f"summaries written {memory['compactions']}\n"
+                f"~{memory['tokens']} tokens held • largest ~{memory['max_tokens']}"
+            ),
+            inline=False
+        )
+
+        games = self.bot.game_input.get_stats()
+        trivia = self.bot.trivia_sessions.get_stats()
+        embed.add_field(
+            name="🎮 Games",
+            value=(
+                f"players waiting {games['waiting']} • channel rounds {games['channels']} • "
+                f"pending deadlines {games['deadlines']}\n"
+                f"replies routed {games['dispatched']} • timeouts {games['timeouts']}\n"
+                f"trivia sessions {trivia['active']}/{trivia['max_sessions']} • resumable {trivia['resumable']}\n"
+                f"expired idle {trivia['expired']} • resumed {trivia['resumed']} • turned away {trivia['rejected']}"
+            ),
+            inline=False
+        )
+
+        music = self.bot.media_extractor.get_stats()
+        embed.add_field(
+            name="🎵 Music Lookups",
+            value=(
+                f"running {music['running']}/{music['workers']} • queued {music['queued']} "
+                f"across {music['guilds_waiting']} servers\n"
+                f"p50 {music['p50'] * 1000:.0f}ms • p95 {music['p95'] * 1000:.0f}ms • done {music['completed']}\n"
+                f"errors {music['errors']} • timeouts {music['timeouts']}\n"
+                f"superseded {music['superseded']} • dropped on overflow {music['overflowed']}\n"
+                f"cookies {music['cookies']} • refreshes {music['cookie_refreshes']} • "
+                f"refresh failures {music['cookie_errors']}"
+            ),
+            inline=False
+        )
+
+        roles = self.role_assigner.get_stats()
+        embed.add_field(
+            name="🎭 Intro Analysis",
+            value=(
+                f"queued {roles['queued']} • filling batch {roles['batching']} • in flight {roles['in_flight']}\n"
+                f"p50 {roles['p50'] * 1000:.0f}ms • p95 {roles['p95'] * 1000:.0f}ms • calls {roles['calls']}\n"
+                f"timeouts {roles['timeouts']} • errors {roles['errors']}\n"
+                f"batches {roles['batches']} ({roles['batched_intros']} intros)\n"
+                f"answered locally {roles['local_decisions']} • sent to Gemini {roles['llm_decisions']}\n"
+                f"cache hits {roles['cache_hits']} ({roles['cache_hit_ratio']:.0%})"
+            ),
+            inline=False
+        )
+
+        await ctx.send(embed=embed)
+
     @commands.command(name="setintrochannel", help="[Admin] Set the intro channel for role allocation! Usage: !setintrochannel #channel")
     @commands.has_permissions(administrator=True)
     async def setintrochannel(self, ctx: commands.Context, channel: discord.TextChannel = None):
@@ -4,134 +4,302 @@ Handles Gemini LLM interactions, Wikipedia searches, and intelligent responses
 """
 
 import asyncio
-from typing import Optional
+import time
+from contextlib import aclosing
+from typing import AsyncIterator, List, Optional
 
 import aiohttp
 import discord
-import google.generativeai as genai
 from discord.ext import commands
 
-from constants import GEMINI_API_KEY
+from constants import (
+    AI_STREAM_EDIT_INTERVAL,
+    WIKI_CACHE_SIZE,
+    WIKI_CACHE_TTL,
+    WIKI_DNS_CACHE_TTL,
+    WIKI_HTTP_POOL_SIZE,
+    WIKI_HTTP_TIMEOUT,
+    WIKI_NEGATIVE_CACHE_TTL,
+)
 from logger import get_logger
+from model.cache import TTLCache
+from model.conversation import ConversationMemory
+from model.llm import LLMError, LLMService
+from model.semantic_cache import SemanticIndex
+from model.wiki_index import WikiIndex
 
 log = get_logger(__name__)
 
+# Room left under Discord's 2000-character message limit
+PAGE_SIZE = 1900
+
+
+class StreamingReply:
+    """Render streamed text into an embed plus follow-up messages, editing them in place.
+
+    Edits are throttled to one pass per `edit_interval` seconds so a fast stream
+    does not trip Discord's per-channel rate limits.
+    """
+
+    def __init__(self, ctx: commands.Context, title: str, color: discord.Color,
+                 footer: Optional[str] = None, edit_interval: float = AI_STREAM_EDIT_INTERVAL):
+        self.ctx = ctx
+        self.title = title
+        self.color = color
+        self.footer = footer
+        self.edit_interval = edit_interval
+
+        self.pages: List[str] = [""]
+        self._messages: List[discord.Message] = []
+        self._rendered: List[str] = []
+        self._last_render = 0.0
+
+    @property
+    def text(self) -> str:
+        return "".join(self.pages)
+
+    async def feed(self, chunk: str):
+        """Append streamed text, sending or editing messages if the throttle allows"""
+        self.pages[-1] += chunk
+        while len(self.pages[-1]) > PAGE_SIZE:
+            overflow = self.pages[-1][PAGE_SIZE:]
+            self.pages[-1] = self.pages[-1][:PAGE_SIZE]
+            self.pages.append(overflow)
+
+        # The first text goes out immediately; after that, edits are batched
+        if not self._messages or time.monotonic() - self._last_render >= self.edit_interval:
+            await self._render()
+
+    async def finish(self):
+        """Flush any pending text and add the footer"""
+        if not self.text.strip():
+            self.pages = ["I couldn't generate a response."]
+        await self._render(final=True)
+
+    def _embed(self, description: str, final: bool) -> discord.Embed:
+        embed = discord.Embed(title=self.title, description=description, color=self.color)
+        if final and self.footer:
+            embed.set_footer(text=self.footer)
+        return embed
+
+    async def _render(self, final: bool = False):
+        self._last_render = time.monotonic()
+        for i, page in enumerate(self.pages):
+            if not page.strip():
+                continue
+            if i < len(self._messages):
+                if page == self._rendered[i] and not (final and i == 0):
+                    continue
+                if i == 0:
+                    await self._messages[0].edit(embed=self._embed(page, final))
+                else:
+                    await self._messages[i].edit(content=page)
+                self._rendered[i] = page
+            else:
+                if i == 0:
+                    message = await self.ctx.send(embed=self._embed(page, final))
+                else:
+                    message = await self.ctx.send(page)
+                self._messages.append(message)
+                self._rendered.append(page)
+
 
 class AICommands(commands.Cog):
     """AI-powered commands using Gemini LLM and Wikipedia"""
 
-    def __init__(self, bot: commands.Bot):
-        self.bot = bot
+    # Commands whose answers may be reused for differently worded questions
+    SEMANTIC_COMMANDS = frozenset({"explain", "summarize", "howto", "compare"})
 
-        # Configure Gemini API
-        if not GEMINI_API_KEY:
-            log.warning("GEMINI_API_KEY not found. AI commands will be limited.")
-            self.model = None
-        else:
-            genai.configure(api_key=GEMINI_API_KEY)
-            self.model = genai.GenerativeModel('gemini-2.5-flash')
+    def __init__(self, bot: commands.Bot, llm: LLMService, response_cache: TTLCache,
+                 semantic_index: SemanticIndex, memory: ConversationMemory,
+                 wiki_index: Optional[WikiIndex] = None):
+        self.bot = bot
+        self.llm = llm
 
-        # Wikipedia API endpoint
-        self.wikipedia_api = "https://en.wikipedia.org/w/api.php"
+        # Answers for fixed-template commands, keyed by command + normalized input
+        self.response_cache = response_cache
 
-        # Conversation history per user (for context)
-        self.conversation_history = {}
+        # Near-duplicate lookup into response_cache ("what is a black hole" ~ "explain black holes")
+        self.semantic_index = semantic_index
+        for key in response_cache.keys():
+            command, _, text = key.partition(":")
+            if command in self.SEMANTIC_COMMANDS:
+                semantic_index.add(command, text, key)
 
-    async def get_gemini_response(self, prompt: str, user_id: int = None, use_history: bool = False) -> str:
-        """Get a response from Gemini with optional conversation history"""
-        if not self.model:
-            return "❌ AI service is not available. Please configure GEMINI_API_KEY."
+        # Wikipedia API endpoint, a keep-alive session created on first use, and recent results
+        self.wikipedia_api = "https://en.wikipedia.org/w/api.php"
+        self._http: Optional[aiohttp.ClientSession] = None
+        self.wiki_cache = TTLCache(max_size=WIKI_CACHE_SIZE, ttl=WIKI_CACHE_TTL)
+
+        # Optional offline abstracts index, consulted before the API
+        self.wiki_index = wiki_index
+
+        # Bounded, token-budgeted conversation history per user (for context)
+        self.memory = memory
+
+    @staticmethod
+    def _cache_key(command: str, *inputs: str) -> str:
+        """Cache key that ignores case and whitespace differences in the user's input"""
+        normalized = "|".join(" ".join(text.lower().split()) for text in inputs)
+        return f"{command}:{normalized}"
+
+    def _cached_response(self, cache_key: str) -> Optional[str]:
+        """Exact cache hit, or the answer to a near-identical earlier question"""
+        command, _, text = cache_key.partition(":")
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            self.llm.usage.record_cache_hit(command)
+            return cached
+
+        if command not in self.SEMANTIC_COMMANDS:
+            return None
+        similar_key = self.semantic_index.lookup(command, text)
+        if similar_key is None:
+            return None
+        cached = self.response_cache.get(similar_key)
+        if cached is None:
+            # The answer expired or was evicted; stop matching against it
+            self.semantic_index.discard(similar_key)
+        else:
+            self.llm.usage.record_cache_hit(command)
+        return cached
+
+    def _store_response(self, cache_key: str, text: str):
+        self.response_cache.set(cache_key, text)
+        command, _, normalized = cache_key.partition(":")
+        if command in self.SEMANTIC_COMMANDS:
+            self.semantic_index.add(command, normalized, cache_key)
+
+    async def get_gemini_response(self, prompt: str, user_id: int = None, use_history: bool = False,
+                                  cache_key: Optional[str] = None, *, tag: str) -> str:
+        """Get a response from Gemini with optional conversation history or response caching;
+        usage is recorded under `tag`, the calling command's name"""
+        if cache_key:
+            cached = self._cached_response(cache_key)
+            if cached is not None:
+                return cached
 
         try:
             if use_history and user_id:
-                # Get conversation history
-                if user_id not in self.conversation_history:
-                    self.conversation_history[user_id] = []
-
-                # Add user message to history
-                self.conversation_history[user_id].append({
-                    "role": "user",
-                    "parts": [prompt]
-                })
-
-                # Keep only last 10 messages to avoid token limits
-                if len(self.conversation_history[user_id]) > 10:
-                    self.conversation_history[user_id] = self.conversation_history[user_id][-10:]
-
-                # Create chat with history
-                chat = self.model.start_chat(history=self.conversation_history[user_id][:-1])
-                response = await asyncio.to_thread(chat.send_message, prompt)
-
-                # Add assistant response to history
-                self.conversation_history[user_id].append({
-                    "role": "model",
-                    "parts": [response.text]
-                })
+                text = await self.llm.generate(prompt, history=self.memory.history(user_id), tag=tag)
+                self.memory.append(user_id, prompt, text)
             else:
-                # Single message without history
-                response = await asyncio.to_thread(self.model.generate_content, prompt)
+                text = await self.llm.generate(prompt, tag=tag)
+                if cache_key:
+                    self._store_response(cache_key, text)
 
-            return response.text if response else "I couldn't generate a response."
+            return text
 
-        except Exception as e:
+        except LLMError as e:
             log.error("Error getting Gemini response: %s", e)
-            return f"❌ Error: {str(e)}"
+            return f"❌ {e}"
+
+    async def stream_gemini_response(self, prompt: str, user_id: int = None, use_history: bool = False,
+                                     cache_key: Optional[str] = None, *, tag: str) -> AsyncIterator[str]:
+        """Streaming counterpart of get_gemini_response; yields text as Gemini produces it"""
+        if cache_key:
+            cached = self._cached_response(cache_key)
+            if cached is not None:
+                yield cached
+                return
 
-    async def search_wikipedia(self, query: str, sentences: int = 3) -> dict:
-        """Search Wikipedia and return a summary"""
+        history = self.memory.history(user_id) if use_history and user_id else None
+        parts: List[str] = []
         try:
-            # Wikipedia requires a User-Agent header
-            headers = {
-                "User-Agent": "JuleBot/1.0 (Discord Bot; Python/aiohttp)"
-            }
+            # Closed explicitly so a consumer that stops early frees the LLM slot now, not at GC
+            async with aclosing(self.llm.stream(prompt, history=history, tag=tag)) as chunks:
+                async for chunk in chunks:
+                    parts.append(chunk)
+                    yield chunk
+        except LLMError as e:
+            log.error("Error streaming Gemini response: %s", e)
+            yield f"\n\n❌ {e}" if parts else f"❌ {e}"
+            return
+
+        text = "".join(parts)
+        if history is not None:
+            self.memory.append(user_id, prompt, text)
+        elif cache_key:
+            self._store_response(cache_key, text)
+
+    async def send_streamed_response(self, ctx: commands.Context, prompt: str, title: str, color: discord.Color,
+                                     footer: Optional[str] = None, **options) -> str:
+        """Stream a Gemini answer into the channel, editing the reply as text arrives"""
+        reply = StreamingReply(ctx, title, color, footer)
+        async with aclosing(self.stream_gemini_response(prompt, tag=ctx.command.name, **options)) as chunks:
+            async for chunk in chunks:
+                await reply.feed(chunk)
+        await reply.finish()
+        return reply.text
+
+    async def cog_unload(self):
+        if self._http and not self._http.closed:
+            await self._http.close()
+
+    def _http_session(self) -> aiohttp.ClientSession:
+        """Shared session so repeated lookups reuse warm connections and cached DNS"""
+        if self._http is None or self._http.closed:
+            self._http = aiohttp.ClientSession(
+                # Wikipedia requires a User-Agent header
+                headers={"User-Agent": "JuleBot/1.0 (Discord Bot; Python/aiohttp)"},
+                connector=aiohttp.TCPConnector(limit=WIKI_HTTP_POOL_SIZE, ttl_dns_cache=WIKI_DNS_CACHE_TTL),
+                timeout=aiohttp.ClientTimeout(total=WIKI_HTTP_TIMEOUT),
+            )
+        return self._http
 
-            async with aiohttp.ClientSession(headers=headers) as session:
-                # Search for the page
-                search_params = {
-                    "action": "query",
-                    "format": "json",
-                    "list": "search",
-                    "srsearch": query,
-                    "utf8": 1
-                }
-
-                async with session.get(self.wikipedia_api, params=search_params) as resp:
-                    search_data = await resp.json()
-
-                    if not search_data.get("query", {}).get("search"):
-                        return {"error": "No results found"}
-
-                    # Get the first result
-                    page_title = search_data["query"]["search"][0]["title"]
-                    page_id = search_data["query"]["search"][0]["pageid"]
-
-                # Get page summary
-                summary_params = {
-                    "action": "query",
-                    "format": "json",
-                    "prop": "extracts|pageimages",
-                    "exintro": 1,
-                    "explaintext": 1,
-                    "exsentences": sentences,
-                    "pageids": page_id,
-                    "piprop": "original"
-                }
-
-                async with session.get(self.wikipedia_api, params=summary_params) as resp:
-                    summary_data = await resp.json()
-                    page_data = summary_data["query"]["pages"][str(page_id)]
-
-                    return {
-                        "title": page_data.get("title", page_title),
-                        "extract": page_data.get("extract", "No summary available."),
-                        "url": f"https://en.wikipedia.org/wiki/{page_title.replace(' ', '_')}",
-                        "image": page_data.get("original", {}).get("source")
-                    }
+    async def search_wikipedia(self, query: str, sentences: int = 3) -> dict:
+        """Search Wikipedia and return a summary"""
+        if self.wiki_index:
+            local = self.wiki_index.lookup(query, sentences)
+            if local:
+                return local
+
+        cache_key = (" ".join(query.lower().split()), sentences)
+        cached = self.wiki_cache.get(cache_key)
+        if cached is not None:
+            return dict(cached)
+
+        # One request: the top search hit is fed straight into the extract/image lookup
+        params = {
+            "action": "query",
+            "format": "json",
+            "formatversion": 2,
+            "generator": "search",
+            "gsrsearch": query,
+            "gsrlimit": 1,
+            "prop": "extracts|pageimages",
+            "exintro": 1,
+            "explaintext": 1,
+            "exsentences": sentences,
+            "piprop": "original",
+            "redirects": 1,
+            "utf8": 1
+        }
 
+        try:
+            async with self._http_session().get(self.wikipedia_api, params=params) as resp:
+                data = await resp.json()
         except Exception as e:
             log.error("Error searching Wikipedia: %s", e)
             return {"error": str(e)}
 
+        pages = data.get("query", {}).get("pages")
+        if not pages:
+            result = {"error": "No results found"}
+        else:
+            page = pages[0]
+            title = page.get("title", query)
+            result = {
+                "title": title,
+                "extract": page.get("extract") or "No summary available.",
+                "url": f"https://en.wikipedia.org/wiki/{title.replace(' ', '_')}",
+                "image": page.get("original", {}).get("source")
+            }
+
+        # A miss may be an API hiccup or an article not written yet; only hold it briefly
+        self.wiki_cache.set(cache_key, result, ttl=WIKI_NEGATIVE_CACHE_TTL if "error" in result else None)
+        return dict(result)
+
     @commands.command(name="explain", aliases=["eli5"], help="Ask the AI to explain something! Usage: !explain <topic>")
     async def explain(self, ctx: commands.Context, *, topic: str):
         """Explain a topic in simple terms using Gemini"""
@@ -147,28 +315,13 @@ Topic: {topic}
 
 Explanation:"""
 
-            response = await self.get_gemini_response(prompt)
-
-            # Split response if too long for Discord (2000 char limit)
-            if len(response) > 1900:
-                chunks = [response[i:i+1900] for i in range(0, len(response), 1900)]
-                embed = discord.Embed(
-                    title=f"💡 Explaining: {topic}",
-                    description=chunks[0],
-                    color=discord.Color.blue()
-                )
-                await ctx.send(embed=embed)
-
-                for chunk in chunks[1:]:
-                    await ctx.send(chunk)
-            else:
-                embed = discord.Embed(
-                    title=f"💡 Explaining: {topic}",
-                    description=response,
-                    color=discord.Color.blue()
-                )
-                embed.set_footer(text=f"Asked by {ctx.author.display_name}")
-                await ctx.send(embed=embed)
+            await self.send_streamed_response(
+                ctx, prompt,
+                title=f"💡 Explaining: {topic}",
+                color=discord.Color.blue(),
+                footer=f"Asked by {ctx.author.display_name}",
+                cache_key=self._cache_key("explain", topic)
+            )
 
     @commands.command(name="wiki", aliases=["wikipedia"], help="Search Wikipedia! Usage: !wiki <query>")
     async def wiki(self, ctx: commands.Context, *, query: str):
@@ -210,15 +363,12 @@ Make them thought-provoking, fun, and likely to spark good discussions. Format a
 
 Make them thought-provoking, fun, and likely to spark good discussions. Format as a numbered list."""
 
-            response = await self.get_gemini_response(prompt)
-
-            embed = discord.Embed(
+            await self.send_streamed_response(
+                ctx, prompt,
                 title="💬 Conversation Starters" + (f" - {theme}" if theme else ""),
-                description=response,
-                color=discord.Color.purple()
+                color=discord.Color.purple(),
+                footer=f"Requested by {ctx.author.display_name}"
             )
-            embed.set_footer(text=f"Requested by {ctx.author.display_name}")
-            await ctx.send(embed=embed)
 
     @commands.command(name="ask", aliases=["ai", "gemini"], help="Ask the AI anything! Usage: !ask <question>")
     async def ask(self, ctx: commands.Context, *, question: str):
@@ -234,35 +384,19 @@ Question: {question}
 
 Answer:"""
 
-            response = await self.get_gemini_response(prompt, ctx.author.id, use_history=True)
-
-            # Split if too long
-            if len(response) > 1900:
-                chunks = [response[i:i+1900] for i in range(0, len(response), 1900)]
-                embed = discord.Embed(
-                    title="🤖 AI Response",
-                    description=chunks[0],
-                    color=discord.Color.blue()
-                )
-                embed.set_footer(text=f"Asked by {ctx.author.display_name}")
-                await ctx.send(embed=embed)
-
-                for chunk in chunks[1:]:
-                    await ctx.send(chunk)
-            else:
-                embed = discord.Embed(
-                    title="🤖 AI Response",
-                    description=response,
-                    color=discord.Color.blue()
-                )
-                embed.set_footer(text=f"Asked by {ctx.author.display_name}")
-                await ctx.send(embed=embed)
+            await self.send_streamed_response(
+                ctx, prompt,
+                title="🤖 AI Response",
+                color=discord.Color.blue(),
+                footer=f"Asked by {ctx.author.display_name}",
+                user_id=ctx.author.id,
+                use_history=True
+            )
 
     @commands.command(name="clearcontext", aliases=["clearhistory"], help="Clear your conversation history with the AI")
     async def clearcontext(self, ctx: commands.Context):
         """Clear conversation history for the user"""
-        if ctx.author.id in self.conversation_history:
-            del self.conversation_history[ctx.author.id]
+        if self.memory.clear(ctx.author.id):
             await ctx.send("✅ Your conversation history has been cleared!")
         else:
             await ctx.send("ℹ️ You don't have any conversation history.")
@@ -282,28 +416,13 @@ Highlight key differences, similarities, pros and cons. Keep it under 600 words.
 
 Comparison:"""
 
-            response = await self.get_gemini_response(prompt)
-
-            # Split if too long
-            if len(response) > 1900:
-                chunks = [response[i:i+1900] for i in range(0, len(response), 1900)]
-                embed = discord.Embed(
-                    title=f"⚖️ Comparison",
-                    description=chunks[0],
-                    color=discord.Color.gold()
-                )
-                await ctx.send(embed=embed)
-
-                for chunk in chunks[1:]:
-                    await ctx.send(chunk)
-            else:
-                embed = discord.Embed(
-                    title=f"⚖️ Comparison",
-                    description=response,
-                    color=discord.Color.gold()
-                )
-                embed.set_footer(text=f"Requested by {ctx.author.display_name}")
-                await ctx.send(embed=embed)
+            await self.send_streamed_response(
+                ctx, prompt,
+                title="⚖️ Comparison",
+                color=discord.Color.gold(),
+                footer=f"Requested by {ctx.author.display_name}",
+                cache_key=self._cache_key("compare", comparison)
+            )
 
     @commands.command(name="summarize", aliases=["tldr"], help="Summarize a topic or concept! Usage: !summarize <topic>")
     async def summarize(self, ctx: commands.Context, *, topic: str):
@@ -320,15 +439,13 @@ Topic: {topic}
 
 Summary:"""
 
-            response = await self.get_gemini_response(prompt)
-
-            embed = discord.Embed(
+            await self.send_streamed_response(
+                ctx, prompt,
                 title=f"📝 Summary: {topic}",
-                description=response,
-                color=discord.Color.teal()
+                color=discord.Color.teal(),
+                footer=f"Requested by {ctx.author.display_name}",
+                cache_key=self._cache_key("summarize", topic)
             )
-            embed.set_footer(text=f"Requested by {ctx.author.display_name}")
-            await ctx.send(embed=embed)
 
     @commands.command(name="debate", help="Get debate points for a topic! Usage: !debate <topic>")
     async def debate(self, ctx: commands.Context, *, topic: str):
@@ -350,15 +467,12 @@ Be objective and present both sides fairly. Format clearly with headers.
 
 Debate Points:"""
 
-            response = await self.get_gemini_response(prompt)
-
-            embed = discord.Embed(
+            await self.send_streamed_response(
+                ctx, prompt,
                 title=f"⚔️ Debate: {topic}",
-                description=response[:2000],
-                color=discord.Color.red()
+                color=discord.Color.red(),
+                footer=f"Requested by {ctx.author.display_name} • For educational purposes"
             )
-            embed.set_footer(text=f"Requested by {ctx.author.display_name} • For educational purposes")
-            await ctx.send(embed=embed)
 
     @commands.command(name="aifact", aliases=["smartfact"], help="Get an AI-generated interesting fact!")
     async def aifact(self, ctx: commands.Context, *, category: Optional[str] = None):
@@ -369,7 +483,9 @@ Debate Points:"""
             else:
                 prompt = "Share one fascinating and verified fact about any topic. Make it interesting and surprising!"
 
-            response = await self.get_gemini_response(prompt)
+            # Only cache category facts; the uncategorised command should stay random
+            cache_key = self._cache_key("aifact", category) if category else None
+            response = await self.get_gemini_response(prompt, cache_key=cache_key, tag=ctx.command.name)
 
             embed = discord.Embed(
                 title="💡 Interesting Fact",
@@ -395,15 +511,12 @@ Format as a numbered list with brief descriptions.
 
 Ideas:"""
 
-            response = await self.get_gemini_response(prompt)
-
-            embed = discord.Embed(
+            await self.send_streamed_response(
+                ctx, prompt,
                 title=f"💡 Brainstorming: {topic[:100]}",
-                description=response[:2000],
-                color=discord.Color.purple()
+                color=discord.Color.purple(),
+                footer=f"Requested by {ctx.author.display_name}"
             )
-            embed.set_footer(text=f"Requested by {ctx.author.display_name}")
-            await ctx.send(embed=embed)
 
     @commands.command(name="howto", aliases=["guide"], help="Get a quick guide on how to do something! Usage: !howto <task>")
     async def howto(self, ctx: commands.Context, *, task: str):
@@ -421,28 +534,13 @@ Make it practical and easy to follow. Include tips if relevant. Keep it under 50
 
 Guide:"""
 
-            response = await self.get_gemini_response(prompt)
-
-            # Split if too long
-            if len(response) > 1900:
-                chunks = [response[i:i+1900] for i in range(0, len(response), 1900)]
-                embed = discord.Embed(
-                    title=f"📚 How To: {task[:100]}",
-                    description=chunks[0],
-                    color=discord.Color.green()
-                )
-                await ctx.send(embed=embed)
-
-                for chunk in chunks[1:]:
-                    await ctx.send(chunk)
-            else:
-                embed = discord.Embed(
-                    title=f"📚 How To: {task[:100]}",
-                    description=response,
-                    color=discord.Color.green()
-                )
-                embed.set_footer(text=f"Requested by {ctx.author.display_name}")
-                await ctx.send(embed=embed)
+            await self.send_streamed_response(
+                ctx, prompt,
+                title=f"📚 How To: {task[:100]}",
+                color=discord.Color.green(),
+                footer=f"Requested by {ctx.author.display_name}",
+                cache_key=self._cache_key("howto", task)
+            )
 
     @commands.command(name="quiz", help="Generate a quiz question! Usage: !quiz [topic]")
     async def quiz(self, ctx: commands.Context, *, topic: Optional[str] = None):
@@ -473,7 +571,7 @@ D) [option]
 
 Answer: [letter] - [brief explanation]"""
 
-            response = await self.get_gemini_response(prompt)
+            response = await self.get_gemini_response(prompt, tag=ctx.command.name)
 
             # Split question and answer
             if "Answer:" in response:
@@ -542,7 +640,7 @@ Provide the challenge and why it's beneficial.
 
 Challenge:"""
 
-            response = await self.get_gemini_response(prompt)
+            response = await self.get_gemini_response(prompt, tag=ctx.command.name)
 
             embed = discord.Embed(
                 title="🎯 Daily Challenge",
@@ -568,7 +666,8 @@ Text to translate: {text}
 
 Translation:"""
 
-            response = await self.get_gemini_response(prompt)
+            response = await self.get_gemini_response(prompt, cache_key=self._cache_key("translate", language, text),
+                                                      tag=ctx.command.name)
 
             embed = discord.Embed(
                 title=f"🌐 Translation to {language.title()}",
@@ -582,5 +681,6 @@ Translation:"""
 
 async def setup(bot: commands.Bot):
     """Add the cog to the bot"""
-    await bot.add_cog(AICommands(bot))
+    await bot.add_cog(AICommands(bot, bot.llm_service, bot.ai_response_cache, bot.semantic_index,
+                                 bot.conversation_memory, bot.wiki_index))
 
@@ -8,31 +8,71 @@ import json
 import random
 import re
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 import discord
-import google.generativeai as genai
 from discord.ext import commands
 
 from constants import (
-    GEMINI_API_KEY,
     GUESS_ATTEMPTS,
     GUESS_MAX,
     GUESS_MIN,
     GUESS_TIMEOUT,
     GUESS_WIN_POINTS,
+    LLM_LITE_MODEL,
     RPS_CHOICES,
     RPS_EMOJI_MAP,
     RPS_WIN_POINTS,
+    TRIVIA_POOL_LOW_WATER,
+    TRIVIA_POOL_MAX_KEYS,
+    TRIVIA_POOL_TARGET,
+    TRIVIA_ROUND_DURATION,
+    TRIVIA_ROUND_SLOWEST_SHARE,
 )
 from logger import get_logger
+from model.game_input import GameInputDispatcher
+from model.game_sessions import GameSessionRegistry
+from model.llm import LLMService, Priority
 from model.services import PointsService
+from model.trivia import ANSWER_LETTERS, TriviaBank, TriviaPool, is_valid_question
 
 log = get_logger(__name__)
 
+# Points by difficulty
+TRIVIA_POINTS: Dict[str, int] = {"easy": 5, "medium": 10, "hard": 15, "expert": 20}
+
+TRIVIA_BUSY_MESSAGE = "❌ Too many trivia games are running right now. Please try again in a few minutes."
+
+TRIVIA_DIFFICULTY_GUIDE: Dict[str, str] = {
+    "easy": "The question should be simple and commonly known. Suitable for general knowledge.",
+    "medium": "The question should require some specific knowledge but not be too obscure.",
+    "hard": "The question should be challenging and require detailed or specialized knowledge.",
+    "expert": "The question should be very difficult, suitable only for experts in the field."
+}
+
+
+def _match_trivia_option(answer: str, options: List[str], partial: bool = True) -> Optional[int]:
+    """Index of the option a reply picks: a letter A-D or the option's text"""
+    answer = answer.strip()
+    if answer.upper() in ANSWER_LETTERS:
+        return ANSWER_LETTERS.index(answer.upper())
+
+    # Try matching to option text
+    normalized_user = re.sub(r'\s+', ' ', answer.lower())
+    for i, opt in enumerate(options):
+        if normalized_user == opt.strip().lower():
+            return i
+        # partial match
+        if partial and (normalized_user in opt.strip().lower() or opt.strip().lower() in normalized_user):
+            return i
+    return None
+
 
 class TriviaSession:
     """Tracks a trivia session for a user"""
+    __slots__ = ("user_id", "difficulty", "genre", "is_competition", "total_questions", "current_question",
+                 "correct_answers", "total_points", "start_time", "questions_answered", "questions", "last_active")
+
     def __init__(self, user_id: int, difficulty: str = "medium", genre: str = "general",
                  is_competition: bool = False, total_questions: int = 1):
         self.user_id = user_id
@@ -45,6 +85,38 @@ class TriviaSession:
         self.total_points = 0
         self.start_time = datetime.now()
         self.questions_answered = []
+        # Questions fetched up front (competitions); asked in order
+        self.questions: List[dict] = []
+        self.last_active = 0.0  # set by the session registry
+
+    def to_dict(self) -> dict:
+        """State to snapshot for resuming after a restart"""
+        return {
+            "user_id": self.user_id,
+            "difficulty": self.difficulty,
+            "genre": self.genre,
+            "is_competition": self.is_competition,
+            "total_questions": self.total_questions,
+            "current_question": self.current_question,
+            "correct_answers": self.correct_answers,
+            "total_points": self.total_points,
+            "start_time": self.start_time.isoformat(),
+            "questions_answered": self.questions_answered,
+            "questions": self.questions,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "TriviaSession":
+        """Rebuild a session from `to_dict` output"""
+        session = cls(data["user_id"], data["difficulty"], data["genre"],
+                      data["is_competition"], data["total_questions"])
+        session.current_question = data["current_question"]
+        session.correct_answers = data["correct_answers"]
+        session.total_points = data["total_points"]
+        session.start_time = datetime.fromisoformat(data["start_time"])
+        session.questions_answered = list(data["questions_answered"])
+        session.questions = list(data["questions"])
+        return session
 
     def record_answer(self, correct: bool, points: int):
         """Record an answer"""
@@ -79,24 +151,31 @@ class TriviaSession:
 class GameCommands(commands.Cog):
     """Interactive game commands"""
 
-    def __init__(self, bot: commands.Bot, points_service: PointsService, game_stats_service):
+    def __init__(self, bot: commands.Bot, points_service: PointsService, game_stats_service, llm: LLMService,
+                 trivia_bank: Optional[TriviaBank] = None, game_input: Optional[GameInputDispatcher] = None,
+                 trivia_sessions: Optional[GameSessionRegistry] = None):
         self.bot = bot
         self.points_service = points_service
         self.game_stats_service = game_stats_service
+        self.llm = llm
+        self.trivia_bank = trivia_bank
+        # Players' replies arrive through this instead of bot.wait_for
+        self.game_input = game_input or GameInputDispatcher()
+
+        # Active trivia sessions by user; expired when idle and snapshotted for restarts
+        self.trivia_sessions = trivia_sessions or GameSessionRegistry(None, "trivia")
+
+        # Ready-made questions per (difficulty, genre), topped up in the background
+        self.trivia_pool = TriviaPool(
+            self._generate_banked_trivia,
+            target=TRIVIA_POOL_TARGET,
+            low_water=TRIVIA_POOL_LOW_WATER,
+            max_keys=TRIVIA_POOL_MAX_KEYS,
+            generate_batch=self._generate_banked_trivia_batch,
+        )
 
-        # Track active trivia sessions
-        self.active_trivia_sessions: Dict[int, TriviaSession] = {}
-
-        # Configure Gemini if API key is present
-        if GEMINI_API_KEY:
-            try:
-                genai.configure(api_key=GEMINI_API_KEY)
-                self.gemini_model = genai.GenerativeModel('gemini-2.5-flash-lite')
-            except Exception as e:
-                log.warning("Failed to configure Gemini model: %s", e)
-                self.gemini_model = None
-        else:
-            self.gemini_model = None
+    async def cog_unload(self):
+        self.trivia_pool.close()
 
     @commands.command(name="rps", help="Play rock paper scissors! Usage: !rps <rock/paper/scissors>")
     async def rps(self, ctx: commands.Context, choice: str):
@@ -135,15 +214,13 @@ class GameCommands(commands.Cog):
         )
 
         def check(m):
-            return (m.author == ctx.author and
-                    m.channel == ctx.channel and
-                    m.content.isdigit())
+            return m.content.isdigit()
 
         for attempt in range(GUESS_ATTEMPTS):
             remaining_tries = GUESS_ATTEMPTS - attempt - 1
 
             try:
-                msg = await self.bot.wait_for('message', timeout=GUESS_TIMEOUT, check=check)
+                msg = await self.game_input.wait(ctx.channel.id, ctx.author.id, GUESS_TIMEOUT, check)
                 guess_num = int(msg.content)
 
                 if guess_num == number:
@@ -166,24 +243,17 @@ class GameCommands(commands.Cog):
 
         await ctx.send(f"😅 Out of tries! The number was {number}. Better luck next time!")
 
-    async def _generate_trivia_with_gemini(self, difficulty: str = "medium", genre: str = "general") -> dict:
+    async def _generate_trivia_with_gemini(self, difficulty: str = "medium", genre: str = "general",
+                                           priority: Priority = Priority.INTERACTIVE) -> dict:
         """
         Ask Gemini to create one multiple-choice trivia question and return a dict:
         { "question": str, "options": ["optA","optB","optC","optD"], "answer": "A",
           "explanation": str, "category": str, "difficulty": "easy|medium|hard", "hint": str }
         """
-        if not self.gemini_model:
+        if not self.llm.available:
             raise RuntimeError("Gemini not configured")
 
-        # Build difficulty guidelines
-        difficulty_guide = {
-            "easy": "The question should be simple and commonly known. Suitable for general knowledge.",
-            "medium": "The question should require some specific knowledge but not be too obscure.",
-            "hard": "The question should be challenging and require detailed or specialized knowledge.",
-            "expert": "The question should be very difficult, suitable only for experts in the field."
-        }
-
-        diff_desc = difficulty_guide.get(difficulty.lower(), difficulty_guide["medium"])
+        diff_desc = TRIVIA_DIFFICULTY_GUIDE.get(difficulty.lower(), TRIVIA_DIFFICULTY_GUIDE["medium"])
 
         prompt = f"""
 Create a single multiple-choice trivia question. Output ONLY valid JSON with these fields:
@@ -200,8 +270,7 @@ Constraints:
 """
 
         try:
-            response = await asyncio.to_thread(self.gemini_model.generate_content, prompt)
-            text = response.text if response else ""
+            text = await self.llm.generate(prompt, model=LLM_LITE_MODEL, priority=priority, tag="trivia")
 
             # Try to extract and parse JSON
             # First, try direct parsing
@@ -234,14 +303,81 @@ Constraints:
             # Bubble up to let caller fallback to static questions
             raise
 
-    @commands.command(name="trivia", help="Answer trivia questions! Usage: !trivia [difficulty] [genre]")
-    async def trivia(self, ctx: commands.Context, difficulty: str = "medium", *, genre: str = "general"):
+    async def _generate_trivia_batch_with_gemini(self, difficulty: str, genre: str, count: int,
+                                                 priority: Priority = Priority.INTERACTIVE) -> List[dict]:
         """
-        Enhanced trivia with difficulty levels and genre selection
-        Usage: !trivia [easy/medium/hard/expert] [genre]
-        Examples: !trivia hard science, !trivia easy, !trivia medium history
+        Ask Gemini for `count` questions in one JSON array. Entries are returned as parsed;
+        the caller validates each one and replaces the bad ones
         """
-        # Normalize difficulty
+        if not self.llm.available:
+            raise RuntimeError("Gemini not configured")
+
+        diff_desc = TRIVIA_DIFFICULTY_GUIDE.get(difficulty.lower(), TRIVIA_DIFFICULTY_GUIDE["medium"])
+
+        prompt = f"""
+Create a JSON array of {count} multiple-choice trivia questions. Output ONLY valid JSON: an array of
+{count} objects, each with these fields:
+{{ "question": string, "options": [string,string,string,string], "answer": "A"|"B"|"C"|"D",
+  "explanation": string, "category": string, "difficulty": "{difficulty}", "hint": string }}
+
+Constraints:
+- Exactly {count} questions, all different from each other.
+- Exactly 4 options per question.
+- Answer must be one of "A","B","C","D"; vary which letter is correct.
+- Difficulty level: {difficulty} - {diff_desc}
+- Genre/Category: {genre}
+- Keep text concise and ensure the questions are appropriate for the difficulty level.
+- Make sure incorrect options are plausible but clearly wrong.
+"""
+
+        text = await self.llm.generate(prompt, model=LLM_LITE_MODEL, priority=priority, tag="trivia")
+
+        # The array itself, possibly inside a code block or surrounded by prose
+        first_bracket = text.find('[')
+        last_bracket = text.rfind(']')
+        if first_bracket == -1 or last_bracket <= first_bracket:
+            raise ValueError("No JSON array in Gemini response")
+        questions = json.loads(text[first_bracket:last_bracket + 1])
+        if not isinstance(questions, list):
+            raise ValueError("Gemini response is not a JSON array")
+        return questions
+
+    async def _generate_banked_trivia(self, difficulty: str, genre: str, priority: Priority) -> dict:
+        """Generate a question and keep it in the bank so it can be served again later"""
+        question = await self._generate_trivia_with_gemini(difficulty, genre, priority)
+        if self.trivia_bank and is_valid_question(question):
+            question = self.trivia_bank.add(difficulty, genre, question)
+        return question
+
+    async def _generate_banked_trivia_batch(self, difficulty: str, genre: str, count: int,
+                                            priority: Priority) -> List[dict]:
+        """Batch version of `_generate_banked_trivia`; invalid entries are passed through unbanked"""
+        questions = await self._generate_trivia_batch_with_gemini(difficulty, genre, count, priority)
+        if not self.trivia_bank:
+            return questions
+        return [self.trivia_bank.add(difficulty, genre, q) if is_valid_question(q) else q for q in questions]
+
+    async def _fetch_trivia(self, difficulty: str, genre: str, user_ids: List[int], count: int) -> List[dict]:
+        """
+        Up to `count` questions none of the players has seen recently: banked ones first,
+        freshly generated ones only for the shortfall
+        """
+        questions = self.trivia_bank.draw(difficulty, genre, user_ids, count) if self.trivia_bank else []
+
+        if not self.llm.available:
+            return questions
+        missing = count - len(questions)
+        if missing:
+            fresh = await self.trivia_pool.take(difficulty, genre, missing)
+            questions.extend(self.trivia_bank.claim(fresh, user_ids) if self.trivia_bank else fresh)
+        elif self.trivia_bank and any(self.trivia_bank.is_thin(difficulty, genre, uid) for uid in user_ids):
+            # Running low for a player; have new questions ready before the bank runs dry
+            self.trivia_pool.warm(difficulty, genre)
+        return questions
+
+    @staticmethod
+    def _parse_trivia_args(difficulty: str, genre: str) -> Tuple[str, str]:
+        """Normalize difficulty, accepting the genre first or no difficulty at all"""
         valid_difficulties = ["easy", "medium", "hard", "expert"]
         difficulty = difficulty.lower()
         if difficulty not in valid_difficulties:
@@ -252,16 +388,28 @@ Constraints:
                 # Use as genre and default difficulty
                 genre = difficulty + " " + genre if genre != "general" else difficulty
                 difficulty = "medium"
+        return difficulty, genre
+
+    @commands.command(name="trivia", help="Answer trivia questions! Usage: !trivia [difficulty] [genre]")
+    async def trivia(self, ctx: commands.Context, difficulty: str = "medium", *, genre: str = "general"):
+        """
+        Enhanced trivia with difficulty levels and genre selection
+        Usage: !trivia [easy/medium/hard/expert] [genre]
+        Examples: !trivia hard science, !trivia easy, !trivia medium history
+        """
+        difficulty, genre = self._parse_trivia_args(difficulty, genre)
 
         # Check if user already has a session
-        if ctx.author.id in self.active_trivia_sessions:
-            session = self.active_trivia_sessions[ctx.author.id]
-            await self._ask_trivia_question(ctx, session)
+        if ctx.author.id in self.trivia_sessions:
+            session = self.trivia_sessions.get(ctx.author.id)
+            await self._run_trivia_session(ctx, session)
         else:
             # Create new single-question session
             session = TriviaSession(ctx.author.id, difficulty, genre, False, 1)
-            self.active_trivia_sessions[ctx.author.id] = session
-            await self._ask_trivia_question(ctx, session)
+            if not self.trivia_sessions.add(ctx.author.id, session):
+                await ctx.send(TRIVIA_BUSY_MESSAGE)
+                return
+            await self._run_trivia_session(ctx, session)
 
     @commands.command(name="triviacomp", aliases=["triviacompetition", "tc"],
                       help="Start a 10-question trivia competition! Usage: !triviacomp [difficulty] [genre]")
@@ -270,24 +418,18 @@ Constraints:
         10-question trivia competition with scoring
         Usage: !triviacomp [easy/medium/hard/expert] [genre]
         """
-        # Normalize difficulty
-        valid_difficulties = ["easy", "medium", "hard", "expert"]
-        difficulty = difficulty.lower()
-        if difficulty not in valid_difficulties:
-            if genre != "general" and genre.lower() in valid_difficulties:
-                difficulty, genre = genre.lower(), difficulty
-            else:
-                genre = difficulty + " " + genre if genre != "general" else difficulty
-                difficulty = "medium"
+        difficulty, genre = self._parse_trivia_args(difficulty, genre)
 
         # Check if user already has an active session
-        if ctx.author.id in self.active_trivia_sessions:
+        if ctx.author.id in self.trivia_sessions:
             await ctx.send("❌ You already have an active trivia session! Finish it first or use `!triviaend` to end it.")
             return
 
         # Create competition session
         session = TriviaSession(ctx.author.id, difficulty, genre, True, 10)
-        self.active_trivia_sessions[ctx.author.id] = session
+        if not self.trivia_sessions.add(ctx.author.id, session):
+            await ctx.send(TRIVIA_BUSY_MESSAGE)
+            return
 
         embed = discord.Embed(
             title="🏆 Trivia Competition Started!",
@@ -303,19 +445,156 @@ Good luck! Question 1 coming up...
 """,
             color=discord.Color.gold()
         )
+        try:
+            await ctx.send(embed=embed)
+
+            # Fetch the whole set now so every question appears as soon as the previous one is answered
+            async with ctx.typing():
+                session.questions = await self._fetch_trivia(difficulty, genre, [ctx.author.id], session.total_questions)
+        except Exception:
+            self.trivia_sessions.remove(ctx.author.id, session)
+            raise
+
+        await self._run_trivia_session(ctx, session)
+
+    @commands.command(name="triviaround", aliases=["tround", "tr"],
+                      help="Start a trivia round for the whole channel! Usage: !triviaround [difficulty] [genre]")
+    async def trivia_round(self, ctx: commands.Context, difficulty: str = "medium", *, genre: str = "general"):
+        """
+        One question for everyone in the channel; faster correct answers score more
+        Usage: !triviaround [easy/medium/hard/expert] [genre]
+        """
+        difficulty, genre = self._parse_trivia_args(difficulty, genre)
+
+        answers: Dict[int, Tuple[int, float, str]] = {}  # user id -> (option index, seconds, name)
+        round_state = {"options": [], "started": 0.0}
+
+        def collect(message: discord.Message):
+            if message.author.bot or message.author.id in answers or not round_state["options"]:
+                return
+            selected_idx = _match_trivia_option(message.content, round_state["options"], partial=False)
+            if selected_idx is not None:
+                elapsed = asyncio.get_running_loop().time() - round_state["started"]
+                answers[message.author.id] = (selected_idx, elapsed, message.author.display_name)
+
+        if not self.game_input.listen_channel(ctx.channel.id, collect):
+            await ctx.send("❌ A trivia round is already running in this channel!")
+            return
+
+        try:
+            async with ctx.typing():
+                # Players are only known once they answer; draw against the starter's history
+                fetched = await self._fetch_trivia(difficulty, genre, [ctx.author.id], 1)
+            trivia_data = fetched[0] if fetched else self._get_fallback_trivia(difficulty, genre)
+            if not trivia_data or len(trivia_data.get("options", [])) < 4:
+                await ctx.send("❌ Failed to generate question. Please try again.")
+                return
+
+            options = trivia_data["options"][:4]
+            answer_letter = str(trivia_data.get("answer", "A")).strip().upper()
+            correct_idx = ANSWER_LETTERS.index(answer_letter) if answer_letter in ANSWER_LETTERS else 0
+            category = trivia_data.get("category", genre)
+            difficulty = trivia_data.get("difficulty", difficulty).lower()
+
+            desc_lines = [trivia_data.get("question", ""), ""]
+            desc_lines.extend(f"{ANSWER_LETTERS[i]}) {opt}" for i, opt in enumerate(options))
+            if trivia_data.get("hint"):
+                desc_lines.extend(["", f"💡 Hint: {trivia_data['hint']}"])
+
+            embed = discord.Embed(
+                title=f"👥 Trivia Round - {category} ({difficulty.title()})",
+                description="\n".join(desc_lines),
+                color=discord.Color.teal()
+            )
+            embed.set_footer(text=f"Everyone can answer! Type A/B/C/D — only your first answer counts, "
+                                  f"faster correct answers score more. {TRIVIA_ROUND_DURATION:.0f} seconds.")
+            await ctx.send(embed=embed)
+
+            round_state["options"] = options
+            round_state["started"] = asyncio.get_running_loop().time()
+            await asyncio.sleep(TRIVIA_ROUND_DURATION)
+        finally:
+            self.game_input.stop_listening(ctx.channel.id, collect)
+
+        # Score by response time: the full points for an instant answer, down to
+        # TRIVIA_ROUND_SLOWEST_SHARE of them for one at the buzzer
+        base_points = TRIVIA_POINTS.get(difficulty, 10)
+        results: List[Tuple[int, bool, int]] = []
+        winners: List[Tuple[float, str, int]] = []
+        for user_id, (selected_idx, elapsed, name) in answers.items():
+            correct = selected_idx == correct_idx
+            points = 0
+            if correct:
+                speed = 1 - min(elapsed / TRIVIA_ROUND_DURATION, 1.0)
+                share = TRIVIA_ROUND_SLOWEST_SHARE + (1 - TRIVIA_ROUND_SLOWEST_SHARE) * speed
+                points = max(1, round(base_points * share))
+                winners.append((elapsed, name, points))
+            results.append((user_id, correct, points))
+
+        # One write for the whole channel
+        self.game_stats_service.log_trivia_round(difficulty, results)
+        if self.trivia_bank and answers:
+            self.trivia_bank.mark_seen([trivia_data], list(answers))
+
+        embed = discord.Embed(
+            title="⏰ Round Over!",
+            description=(
+                f"The correct answer was **{ANSWER_LETTERS[correct_idx]}) {options[correct_idx]}**.\n"
+                f"**Explanation:** {trivia_data.get('explanation', '')}"
+            ),
+            color=discord.Color.gold()
+        )
+        if winners:
+            winners.sort()
+            medals = ["🥇", "🥈", "🥉"]
+            embed.add_field(
+                name=f"✅ Correct ({len(winners)}/{len(answers)})",
+                value="\n".join(
+                    f"{medals[i] if i < len(medals) else '•'} **{name}** - {elapsed:.1f}s (+{points} pts)"
+                    for i, (elapsed, name, points) in enumerate(winners[:10])
+                ),
+                inline=False
+            )
+        else:
+            embed.add_field(
+                name="😅 No Winners",
+                value=f"{len(answers)} answered, nobody got it right." if answers else "Nobody answered this time!",
+                inline=False
+            )
         await ctx.send(embed=embed)
-        await asyncio.sleep(2)
 
-        await self._ask_trivia_question(ctx, session)
+    @commands.command(name="triviaresume", aliases=["resumetrivia"],
+                      help="Resume a trivia session interrupted by a bot restart")
+    async def trivia_resume(self, ctx: commands.Context):
+        """Pick up a trivia session that was in progress when the bot restarted"""
+        if ctx.author.id in self.trivia_sessions:
+            await ctx.send("❌ You already have an active trivia session! Finish it first or use `!triviaend` to end it.")
+            return
+
+        state = self.trivia_sessions.take_resumable(ctx.author.id)
+        if not state:
+            await ctx.send("❌ You don't have an interrupted trivia session to resume.")
+            return
+
+        session = TriviaSession.from_dict(state)
+        if not self.trivia_sessions.add(ctx.author.id, session):
+            await ctx.send(TRIVIA_BUSY_MESSAGE)
+            return
+
+        await ctx.send(
+            f"▶️ Resuming your trivia session at question {session.current_question + 1}/{session.total_questions} "
+            f"({session.correct_answers} correct so far)."
+        )
+        await self._run_trivia_session(ctx, session)
 
     @commands.command(name="triviaend", aliases=["endtrivia"], help="End your current trivia session")
     async def trivia_end(self, ctx: commands.Context):
         """End an active trivia session"""
-        if ctx.author.id not in self.active_trivia_sessions:
+        if ctx.author.id not in self.trivia_sessions:
             await ctx.send("❌ You don't have an active trivia session.")
             return
 
-        session = self.active_trivia_sessions[ctx.author.id]
+        session = self.trivia_sessions.get(ctx.author.id)
 
         if session.is_competition:
             # Show partial results
@@ -326,7 +605,7 @@ Good luck! Question 1 coming up...
             )
             await ctx.send(embed=embed)
 
-        del self.active_trivia_sessions[ctx.author.id]
+        self.trivia_sessions.remove(ctx.author.id)
         await ctx.send("✅ Your trivia session has been ended.")
 
     @commands.command(name="triviahelp", aliases=["th"], help="Show trivia system help and options")
@@ -360,6 +639,16 @@ Good luck! Question 1 coming up...
             inline=False
         )
 
+        embed.add_field(
+            name="👥 Channel Rounds",
+            value="""
+`!triviaround` - One question for everyone in the channel
+`!tr hard science` - Hard science round (short alias)
+Fastest correct answers earn the most points
+            """.strip(),
+            inline=False
+        )
+
         embed.add_field(
             name="🎚️ Difficulty Levels",
             value="""
@@ -387,6 +676,7 @@ Good luck! Question 1 coming up...
             name="⚙️ Other Commands",
             value="""
 `!triviaend` - End current session
+`!triviaresume` - Continue a session interrupted by a bot restart
 `!triviastats [@user]` - View trivia stats
 `!trivialeaderboard [type]` - View leaderboards
             """.strip(),
@@ -534,19 +824,60 @@ Good luck! Question 1 coming up...
 
         await ctx.send(embed=embed)
 
-    async def _ask_trivia_question(self, ctx: commands.Context, session: TriviaSession):
-        """Ask a single trivia question within a session"""
-        # Points by difficulty
-        points_map = {"easy": 5, "medium": 10, "hard": 15, "expert": 20}
+    async def _run_trivia_session(self, ctx: commands.Context, session: TriviaSession):
+        """Ask the session's questions one after another, then show the summary"""
+        try:
+            while not session.is_complete():
+                if self.trivia_sessions.get(ctx.author.id) is not session:
+                    return  # ended with !triviaend, or expired
+                self.trivia_sessions.touch(ctx.author.id)
+                if not await self._ask_trivia_question(ctx, session):
+                    return  # the session was ended for lack of a question
+        except Exception:
+            # Don't leave the player locked out of trivia by a failed question
+            self.trivia_sessions.remove(ctx.author.id, session)
+            raise
 
-        # Try Gemini first if configured
+        # Log competition completion if applicable
+        if session.is_competition:
+            self.game_stats_service.log_trivia_competition(
+                user_id=ctx.author.id,
+                correct=session.correct_answers,
+                total=session.total_questions,
+                points=session.total_points,
+                difficulty=session.difficulty
+            )
+
+        # Show summary
+        embed = discord.Embed(
+            title="🏆 Competition Complete!" if session.is_competition else "✅ Trivia Complete!",
+            description=session.get_summary(),
+            color=discord.Color.gold()
+        )
+
+        # Add performance badges
+        accuracy = (session.correct_answers / session.total_questions * 100)
+        if accuracy == 100:
+            embed.add_field(name="🏅 Achievement", value="Perfect Score!", inline=False)
+        elif accuracy >= 80:
+            embed.add_field(name="🏅 Achievement", value="Excellent Performance!", inline=False)
+        elif accuracy >= 60:
+            embed.add_field(name="🏅 Achievement", value="Good Job!", inline=False)
+
+        await ctx.send(embed=embed)
+
+        # Clean up session
+        self.trivia_sessions.remove(ctx.author.id, session)
+
+    async def _ask_trivia_question(self, ctx: commands.Context, session: TriviaSession) -> bool:
+        """Ask a single trivia question within a session; False if none could be produced"""
+        # Prepared question, else an unseen one from the bank or pool
         trivia_data = None
-        if self.gemini_model:
-            try:
-                trivia_data = await self._generate_trivia_with_gemini(session.difficulty, session.genre)
-            except Exception as e:
-                log.warning("Gemini trivia generation failed: %s", e)
-                trivia_data = None
+        if session.current_question < len(session.questions):
+            trivia_data = session.questions[session.current_question]
+        else:
+            fetched = await self._fetch_trivia(session.difficulty, session.genre, [ctx.author.id], 1)
+            trivia_data = fetched[0] if fetched else None
 
         # Fallback to static questions if Gemini fails
         if not trivia_data:
@@ -554,9 +885,8 @@ Good luck! Question 1 coming up...
 
         if not trivia_data:
             await ctx.send("❌ Failed to generate question. Please try again.")
-            if ctx.author.id in self.active_trivia_sessions:
-                del self.active_trivia_sessions[ctx.author.id]
-            return
+            self.trivia_sessions.remove(ctx.author.id, session)
+            return False
 
         # Extract question data
         question = trivia_data.get("question", "No question generated.")
@@ -570,15 +900,13 @@ Good luck! Question 1 coming up...
         # Ensure we have 4 options
         if len(options) < 4:
             await ctx.send("❌ Generated question was invalid. Try again.")
-            if ctx.author.id in self.active_trivia_sessions:
-                del self.active_trivia_sessions[ctx.author.id]
-            return
+            self.trivia_sessions.remove(ctx.author.id, session)
+            return False
 
         # Build description with lettered options
-        letters = ["A", "B", "C", "D"]
         desc_lines = [question, ""]
         for i, opt in enumerate(options):
-            desc_lines.append(f"{letters[i]}) {opt}")
+            desc_lines.append(f"{ANSWER_LETTERS[i]}) {opt}")
         desc_lines.append("")
         if hint:
             desc_lines.append(f"💡 Hint: {hint}")
@@ -601,34 +929,20 @@ Good luck! Question 1 coming up...
 
         # Wait for answer
         def check(m):
-            return m.author == ctx.author and m.channel == ctx.channel and m.content.strip() != ""
+            return m.content.strip() != ""
 
         try:
-            user_msg = await self.bot.wait_for('message', timeout=30.0, check=check)
+            user_msg = await self.game_input.wait(ctx.channel.id, ctx.author.id, 30.0, check)
             user_ans = user_msg.content.strip()
 
             # Normalize answer
-            user_letter = user_ans.upper()
-            if user_letter in letters:
-                selected_idx = letters.index(user_letter)
-            else:
-                # Try matching to option text
-                selected_idx = None
-                normalized_user = re.sub(r'\s+', ' ', user_ans.strip().lower())
-                for i, opt in enumerate(options):
-                    if normalized_user == opt.strip().lower():
-                        selected_idx = i
-                        break
-                    # partial match
-                    if normalized_user in opt.strip().lower() or opt.strip().lower() in normalized_user:
-                        selected_idx = i
-                        break
-
-            correct_idx = letters.index(answer_letter) if answer_letter in letters else 0
+            selected_idx = _match_trivia_option(user_ans, options)
+
+            correct_idx = ANSWER_LETTERS.index(answer_letter) if answer_letter in ANSWER_LETTERS else 0
             is_correct = selected_idx is not None and selected_idx == correct_idx
 
             # Calculate points
-            pts = points_map.get(difficulty, 10)
+            pts = TRIVIA_POINTS.get(difficulty, 10)
 
             # Record answer in session
             session.record_answer(is_correct, pts if is_correct else 0)
@@ -646,10 +960,10 @@ Good luck! Question 1 coming up...
                 await ctx.send(f"✅ Correct! You earned {pts} points! ✨\n**Explanation:** {explanation}")
             else:
                 correct_option = options[correct_idx]
-                await ctx.send(f"❌ Wrong. The correct answer was **{letters[correct_idx]}) {correct_option}**.\n**Explanation:** {explanation}")
+                await ctx.send(f"❌ Wrong. The correct answer was **{ANSWER_LETTERS[correct_idx]}) {correct_option}**.\n**Explanation:** {explanation}")
 
         except asyncio.TimeoutError:
-            correct_idx = letters.index(answer_letter) if answer_letter in letters else 0
+            correct_idx = ANSWER_LETTERS.index(answer_letter) if answer_letter in ANSWER_LETTERS else 0
             correct_option = options[correct_idx]
             session.record_answer(False, 0)
 
@@ -661,51 +975,9 @@ Good luck! Question 1 coming up...
                 points=0
             )
 
-            await ctx.send(f"⏰ Time's up! The correct answer was **{letters[correct_idx]}) {correct_option}**.\n**Explanation:** {explanation}")
-
-        # Check if session is complete
-        if session.is_complete():
-            await asyncio.sleep(1)
-
-            # Log competition completion if applicable
-            if session.is_competition:
-                self.game_stats_service.log_trivia_competition(
-                    user_id=ctx.author.id,
-                    correct=session.correct_answers,
-                    total=session.total_questions,
-                    points=session.total_points,
-                    difficulty=session.difficulty
-                )
-
-            # Show summary
-            embed = discord.Embed(
-                title="🏆 Competition Complete!" if session.is_competition else "✅ Trivia Complete!",
-                description=session.get_summary(),
-                color=discord.Color.gold()
-            )
+            await ctx.send(f"⏰ Time's up! The correct answer was **{ANSWER_LETTERS[correct_idx]}) {correct_option}**.\n**Explanation:** {explanation}")
 
-            # Add performance badges
-            accuracy = (session.correct_answers / session.total_questions * 100)
-            if accuracy == 100:
-                embed.add_field(name="🏅 Achievement", value="Perfect Score!", inline=False)
-            elif accuracy >= 80:
-                embed.add_field(name="🏅 Achievement", value="Excellent Performance!", inline=False)
-            elif accuracy >= 60:
-                embed.add_field(name="🏅 Achievement", value="Good Job!", inline=False)
-
-            await ctx.send(embed=embed)
-
-            # Clean up session
-            del self.active_trivia_sessions[ctx.author.id]
-        elif session.is_competition:
-            # Ask next question in competition
-            await asyncio.sleep(2)
-            await ctx.send(f"**Next question coming up...** ({session.current_question + 1}/10)")
-            await asyncio.sleep(1)
-            await self._ask_trivia_question(ctx, session)
-        else:
-            # Clean up single question session
-            del self.active_trivia_sessions[ctx.author.id]
+        return True
 
     def _get_fallback_trivia(self, difficulty: str, genre: str) -> Optional[dict]:
         """Get a fallback trivia question when Gemini is unavailable"""
@@ -799,11 +1071,8 @@ Good luck! Question 1 coming up...
         embed.set_footer(text="You have 30 seconds! Type your answer below.")
         await ctx.send(embed=embed)
 
-        def check(m):
-            return m.author == ctx.author and m.channel == ctx.channel
-
         try:
-            msg = await self.bot.wait_for('message', timeout=30.0, check=check)
+            msg = await self.game_input.wait(ctx.channel.id, ctx.author.id, 30.0)
 
             if msg.content.lower() == word:
                 self.points_service.add_points(ctx.author.id, 8)
@@ -846,10 +1115,10 @@ Good luck! Question 1 coming up...
         await ctx.send(embed=embed)
 
         def check(m):
-            return m.author == ctx.author and m.channel == ctx.channel and m.content.lstrip('-').isdigit()
+            return m.content.lstrip('-').isdigit()
 
         try:
-            msg = await self.bot.wait_for('message', timeout=15.0, check=check)
+            msg = await self.game_input.wait(ctx.channel.id, ctx.author.id, 15.0, check)
 
             if int(msg.content) == answer:
                 self.points_service.add_points(ctx.author.id, 5)
@@ -871,11 +1140,8 @@ Good luck! Question 1 coming up...
         start_time = asyncio.get_event_loop().time()
         await ctx.send("🚀 **GO! Type anything NOW!**")
 
-        def check(m):
-            return m.author == ctx.author and m.channel == ctx.channel
-
         try:
-            msg = await self.bot.wait_for('message', timeout=5.0, check=check)
+            msg = await self.game_input.wait(ctx.channel.id, ctx.author.id, 5.0)
             end_time = asyncio.get_event_loop().time()
             reaction_time = round((end_time - start_time) * 1000)  # Convert to ms
 
@@ -937,14 +1203,12 @@ Good luck! Question 1 coming up...
         await ctx.send(embed=embed)
 
         def check(m):
-            return (m.author == ctx.author and
-                   m.channel == ctx.channel and
-                   m.content.lower() in ['hit', 'stand'])
+            return m.content.lower() in ['hit', 'stand']
 
         # Player's turn
         while player_total < 21:
             try:
-                msg = await self.bot.wait_for('message', timeout=30.0, check=check)
+                msg = await self.game_input.wait(ctx.channel.id, ctx.author.id, 30.0, check)
 
                 if msg.content.lower() == 'stand':
                     break
@@ -1070,4 +1334,5 @@ async def setup(bot: commands.Bot):
     # Get services from bot
     points_service = bot.points_service
     game_stats_service = bot.game_stats_service
-    await bot.add_cog(GameCommands(bot, points_service, game_stats_service))
+    await bot.add_cog(GameCommands(bot, points_service, game_stats_service, bot.llm_service,
+                                   bot.trivia_bank, bot.game_input, bot.trivia_sessions))
@@ -147,6 +147,8 @@ class CustomHelpCommand(commands.Cog):
                     "`!setintrochannel [#ch]` - Set/clear intro channel\n"
                     "`!getintrochannel` - View intro channel\n"
                     "`!reloadroles` - Reload roles\n"
+                    "`!reloadtriggers` - Reload chat triggers\n"
+                    "`!perfstats` - Performance metrics\n"
                     "`!testrole <msg>` - Test role assign\n"
                     "`!syncroles [file]` - Sync roles\n"
                     "`!syncchannels [file]` - Sync channels"
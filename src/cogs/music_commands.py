@@ -7,47 +7,15 @@ import asyncio
 from typing import List, Optional
 
 import discord
-import yt_dlp
 from discord.ext import commands
 
 from constants import MAX_QUEUE_SIZE, MAX_SEARCH_RESULTS, MUSIC_INACTIVITY_TIMEOUT
 from logger import get_logger
+from model.media_extractor import ExtractionCancelled, MediaExtractor
 
 log = get_logger(__name__)
 
 
-# YouTube DL options for audio extraction
-YTDL_OPTIONS = {
-    'format': 'bestaudio/best',
-    'extractaudio': True,
-    'audioformat': 'mp3',
-    'outtmpl': '%(extractor)s-%(id)s-%(title)s.%(ext)s',
-    'restrictfilenames': True,
-    'noplaylist': True,
-    'nocheckcertificate': True,
-    'ignoreerrors': False,
-    'logtostderr': False,
-    'quiet': True,
-    'no_warnings': True,
-    'default_search': 'ytsearch',
-    'source_address': '0.0.0.0',
-    # Add headers to avoid bot detection
-    'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-    'referer': 'https://www.youtube.com/',
-    # Age gate bypass
-    'age_limit': None,
-    # Cookie handling (optional - will try without first)
-    'cookiesfrombrowser': ('firefox',),  # Can be set to ('firefox',) or ('chrome',) if needed
-    # Additional options to avoid detection
-    'extractor_args': {
-        'youtube': {
-            'skip': ['hls', 'dash'],  # Skip DASH and HLS streams
-            'player_skip': ['webpage', 'configs'],
-            'player_client': ['android', 'web'],  # Try multiple clients
-        }
-    },
-}
-
 FFMPEG_OPTIONS = {
     'before_options': '-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5',
     'options': '-vn'
@@ -172,10 +140,11 @@ class MusicQueue:
 class MusicCommands(commands.Cog):
     """Music playback and queue management commands"""
 
-    def __init__(self, bot: commands.Bot):
+    def __init__(self, bot: commands.Bot, extractor: MediaExtractor):
         self.bot = bot
         self.queues: dict[int, MusicQueue] = {}
-        self.ytdl = yt_dlp.YoutubeDL(YTDL_OPTIONS)
+        # yt-dlp runs in worker processes, queued fairly per guild
+        self.extractor = extractor
 
     def get_queue(self, guild_id: int) -> MusicQueue:
         """Get or create a queue for a guild"""
@@ -183,19 +152,27 @@ class MusicCommands(commands.Cog):
             self.queues[guild_id] = MusicQueue(self.bot, guild_id)
         return self.queues[guild_id]
 
-    async def search_youtube(self, query: str, max_results: int = MAX_SEARCH_RESULTS) -> List[dict]:
-        """Search YouTube for songs"""
+    async def search_youtube(self, query: str, guild_id: int, requester_id: int = 0,
+                             max_results: int = MAX_SEARCH_RESULTS) -> List[dict]:
+        """
+        Search YouTube for songs. Raises ExtractionCancelled if a newer search
+        from the same member replaced this one
+        """
         try:
-            loop = asyncio.get_event_loop()
             # Search for multiple results
             search_query = f"ytsearch{max_results}:{query}"
-            data = await loop.run_in_executor(None, lambda: self.ytdl.extract_info(search_query, download=False))
+            data = await self.extractor.extract(search_query, guild_id, requester_id)
 
             if 'entries' in data:
                 # Filter out None entries (failed extractions)
                 valid_entries = [e for e in data['entries'] if e is not None]
                 return valid_entries
             return []
+        except ExtractionCancelled:
+            raise
+        except asyncio.TimeoutError:
+            log.error("YouTube search timed out: %s", query)
+            return []
         except Exception as e:
             error_msg = str(e)
             if 'Sign in to confirm' in error_msg or 'bot' in error_msg.lower():
@@ -203,16 +180,8 @@ class MusicCommands(commands.Cog):
                 log.debug("Full error: %s", error_msg)
                 # Try with a simpler search
                 try:
-                    # Create a new ytdl instance with different options
-                    simple_ytdl = yt_dlp.YoutubeDL({
-                        'format': 'bestaudio/best',
-                        'quiet': True,
-                        'no_warnings': True,
-                        'default_search': 'ytsearch',
-                        'extract_flat': True,  # Don't extract full info, just search results
-                    })
                     search_query = f"ytsearch{max_results}:{query}"
-                    data = await loop.run_in_executor(None, lambda: simple_ytdl.extract_info(search_query, download=False))
+                    data = await self.extractor.extract(search_query, guild_id, requester_id, profile="flat")
                     if 'entries' in data:
                         valid_entries = [e for e in data['entries'] if e is not None]
                         return valid_entries
@@ -222,38 +191,35 @@ class MusicCommands(commands.Cog):
                 log.error("Error searching YouTube: %s", error_msg)
             return []
 
-    async def get_song_info(self, url_or_query: str) -> Optional[dict]:
+    async def get_song_info(self, url_or_query: str, guild_id: int, requester_id: int = 0) -> Optional[dict]:
         """Get song information from URL or search query"""
         try:
-            loop = asyncio.get_event_loop()
-
             # Check if it's a URL
             if url_or_query.startswith(('http://', 'https://', 'www.')):
-                data = await loop.run_in_executor(None, lambda: self.ytdl.extract_info(url_or_query, download=False))
+                data = await self.extractor.extract(url_or_query, guild_id, requester_id)
             else:
                 # Search YouTube
-                data = await loop.run_in_executor(None, lambda: self.ytdl.extract_info(f"ytsearch1:{url_or_query}", download=False))
+                data = await self.extractor.extract(f"ytsearch1:{url_or_query}", guild_id, requester_id)
 
             if 'entries' in data:
                 return data['entries'][0] if data['entries'] else None
             return data
+        except ExtractionCancelled:
+            raise
+        except asyncio.TimeoutError:
+            log.error("Song info timed out: %s", url_or_query)
+            return None
         except Exception as e:
             error_msg = str(e)
             if 'Sign in to confirm' in error_msg or 'bot' in error_msg.lower():
                 log.warning("YouTube bot detection: %s", error_msg)
                 # Try with extract_flat to get basic info
                 try:
-                    simple_ytdl = yt_dlp.YoutubeDL({
-                        'format': 'bestaudio/best',
-                        'quiet': True,
-                        'no_warnings': True,
-                        'default_search': 'ytsearch',
-                        'extract_flat': True,
-                    })
                     if url_or_query.startswith(('http://', 'https://', 'www.')):
-                        data = await loop.run_in_executor(None, lambda: simple_ytdl.extract_info(url_or_query, download=False))
+                        data = await self.extractor.extract(url_or_query, guild_id, requester_id, profile="flat")
                     else:
-                        data = await loop.run_in_executor(None, lambda: simple_ytdl.extract_info(f"ytsearch1:{url_or_query}", download=False))
+                        data = await self.extractor.extract(f"ytsearch1:{url_or_query}", guild_id, requester_id,
+                                                            profile="flat")
 
                     if 'entries' in data:
                         return data['entries'][0] if data['entries'] else None
@@ -376,7 +342,13 @@ class MusicCommands(commands.Cog):
 
         async with ctx.typing():
             # Search for songs
-            results = await self.search_youtube(query)
+            try:
+                results = await self.search_youtube(query, ctx.guild.id, ctx.author.id)
+            except ExtractionCancelled as e:
+                # Superseded by a newer !music from this member needs no reply
+                if not e.superseded:
+                    await ctx.send("⏳ Too many music searches are queued in this server right now. Try again in a moment!")
+                return
 
             if not results:
                 error_embed = discord.Embed(
@@ -658,5 +630,5 @@ class MusicCommands(commands.Cog):
 
 async def setup(bot: commands.Bot):
     """Add the cog to the bot"""
-    await bot.add_cog(MusicCommands(bot))
+    await bot.add_cog(MusicCommands(bot, bot.media_extractor))
 
@@ -14,35 +14,21 @@ import yaml
 from discord.ext import commands
 
 from logger import get_logger
+from model.llm import LLMService
 
 log = get_logger(__name__)
 
-try:
-    import google.generativeai as genai
-
-    from constants import GEMINI_API_KEY
-except ImportError:
-    GEMINI_API_KEY = None
-    genai = None
-
 
 class TemplateManager(commands.Cog):
     """AI-powered template generation and management system"""
 
-    def __init__(self, bot: commands.Bot):
+    def __init__(self, bot: commands.Bot, llm: LLMService):
         self.bot = bot
+        self.llm = llm
         self.config_dir = Path(__file__).parent.parent / "config"
         self.backup_dir = self.config_dir / "backups"
         self.backup_dir.mkdir(exist_ok=True)
 
-        # Configure Gemini API
-        if not GEMINI_API_KEY or not genai:
-            log.warning("GEMINI_API_KEY not found or genai not available. Template generation limited.")
-            self.model = None
-        else:
-            genai.configure(api_key=GEMINI_API_KEY)
-            self.model = genai.GenerativeModel('gemini-2.5-flash')
-
         # Protected files that should never be overwritten
         self.protected_files = ['roles.yaml', 'channels.yaml']
 
@@ -116,7 +102,7 @@ class TemplateManager(commands.Cog):
 
     async def _generate_roles_template(self, description: str) -> Dict:
         """Generate a roles template using AI based on user description"""
-        if not self.model:
+        if not self.llm.available:
             raise Exception("AI service is not available. Please configure GEMINI_API_KEY.")
 
         prompt = f"""Generate a Discord server roles configuration in YAML format based on this description:
@@ -144,8 +130,7 @@ Guidelines:
 Output ONLY the YAML content, no explanations or markdown code blocks."""
 
         try:
-            response = await asyncio.to_thread(self.model.generate_content, prompt)
-            yaml_content = response.text.strip()
+            yaml_content = (await self.llm.generate(prompt, tag="template_roles")).strip()
 
             # Remove markdown code blocks if present
             if yaml_content.startswith('```'):
@@ -163,7 +148,7 @@ Output ONLY the YAML content, no explanations or markdown code blocks."""
 
     async def _generate_channels_template(self, description: str) -> Dict:
         """Generate a channels template using AI based on user description"""
-        if not self.model:
+        if not self.llm.available:
             raise Exception("AI service is not available. Please configure GEMINI_API_KEY.")
 
         prompt = f"""Generate a Discord server channels configuration in YAML format based on this description:
@@ -196,8 +181,7 @@ Guidelines:
 Output ONLY the YAML content, no explanations or markdown code blocks."""
 
         try:
-            response = await asyncio.to_thread(self.model.generate_content, prompt)
-            yaml_content = response.text.strip()
+            yaml_content = (await self.llm.generate(prompt, tag="template_channels")).strip()
 
             # Remove markdown code blocks if present
             if yaml_content.startswith('```'):
@@ -996,5 +980,5 @@ Output ONLY the YAML content, no explanations or markdown code blocks."""
 
 
 async def setup(bot: commands.Bot):
-    await bot.add_cog(TemplateManager(bot))
+    await bot.add_cog(TemplateManager(bot, bot.llm_service))
 
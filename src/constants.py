@@ -16,6 +16,7 @@ load_dotenv()
 
 DISCORD_TOKEN: Final[str | None] = os.getenv("DISCORD_TOKEN")
 GEMINI_API_KEY: Final[str | None] = os.getenv("GEMINI_API_KEY")
+LLM_BACKEND: Final[str] = os.getenv("LLM_BACKEND", "gemini").lower()  # "fake" runs offline
 
 
 # ============================================================================
@@ -23,8 +24,14 @@ GEMINI_API_KEY: Final[str | None] = os.getenv("GEMINI_API_KEY")
 # ============================================================================
 
 DATABASE_PATH: Final[str] = "data/jule.db"
+INTRO_CACHE_PATH: Final[str] = "data/intro_cache.json"
+AI_RESPONSE_CACHE_PATH: Final[str] = "data/ai_response_cache.json"
+WIKI_INDEX_DIR: Final[str] = "data/wiki_index"  # built with `python -m model.wiki_index`
+MUSIC_COOKIE_PATH: Final[str] = "data/yt_cookies.txt"  # browser cookies exported for yt-dlp
 CHANNELS_CONFIG_PATH: Final[str] = "config/channels.json"
 ROLES_CONFIG_PATH: Final[str] = "config/roles.json"
+ROLE_KEYWORDS_CONFIG_PATH: Final[str] = "config/role_keywords.json"
+TRIGGERS_CONFIG_PATH: Final[str] = "config/triggers.json"
 
 
 # ============================================================================
@@ -59,6 +66,75 @@ MAX_CLEAR_MESSAGES: Final[int] = 100
 MIN_INTRO_LENGTH: Final[int] = 50
 
 
+# ============================================================================
+# LLM
+# ============================================================================
+
+LLM_DEFAULT_MODEL: Final[str] = "gemini-2.5-flash"
+LLM_LITE_MODEL: Final[str] = "gemini-2.5-flash-lite"
+LLM_MAX_CONCURRENCY: Final[int] = 8  # simultaneous Gemini calls across the whole bot
+LLM_GLOBAL_RPM: Final[int] = 60  # requests per minute across all models
+LLM_MODEL_RPM: Final[dict[str, int]] = {
+    "gemini-2.5-flash": 10,
+    "gemini-2.5-flash-lite": 15,
+}
+LLM_TIMEOUT: Final[float] = 30.0  # seconds per call, and max wait for a free slot
+LLM_MAX_RETRIES: Final[int] = 2
+AI_RESPONSE_CACHE_SIZE: Final[int] = 1024  # answers kept for deterministic AI commands
+AI_RESPONSE_CACHE_TTL: Final[int] = 24 * 3600  # seconds
+AI_STREAM_EDIT_INTERVAL: Final[float] = 1.0  # min seconds between edits of a streaming reply
+SEMANTIC_CACHE_CAPACITY: Final[int] = 1024  # prompts indexed for near-duplicate lookup
+SEMANTIC_CACHE_DIM: Final[int] = 2048  # hashed feature vector size
+SEMANTIC_CACHE_THRESHOLD: Final[float] = 0.55  # min cosine similarity; content words must match too
+CONVERSATION_MAX_USERS: Final[int] = 500  # !ask histories kept in memory (LRU)
+CONVERSATION_IDLE_TTL: Final[int] = 3600  # seconds without !ask before a history is dropped
+CONVERSATION_TOKEN_BUDGET: Final[int] = 3000  # approx tokens of history replayed per prompt
+CONVERSATION_COMPACT_AT: Final[int] = 1500  # history size that triggers a background summary
+CONVERSATION_KEEP_RECENT: Final[int] = 4  # turns kept verbatim when older ones are summarized
+
+# Offline fake backend (LLM_BACKEND=fake), for load tests without quota or network
+FAKE_LLM_LATENCY_MS: Final[float] = float(os.getenv("FAKE_LLM_LATENCY_MS", "800"))  # median
+FAKE_LLM_LATENCY_SIGMA: Final[float] = float(os.getenv("FAKE_LLM_LATENCY_SIGMA", "0.5"))  # log-normal shape
+FAKE_LLM_ERROR_RATE: Final[float] = float(os.getenv("FAKE_LLM_ERROR_RATE", "0.0"))
+FAKE_LLM_CHUNK_CHARS: Final[int] = int(os.getenv("FAKE_LLM_CHUNK_CHARS", "40"))
+FAKE_LLM_CHUNK_INTERVAL_MS: Final[float] = float(os.getenv("FAKE_LLM_CHUNK_INTERVAL_MS", "50"))
+
+
+# ============================================================================
+# Wikipedia
+# ============================================================================
+
+WIKI_HTTP_POOL_SIZE: Final[int] = 10  # pooled keep-alive connections to the API
+WIKI_HTTP_TIMEOUT: Final[float] = 10.0  # seconds per API request
+WIKI_DNS_CACHE_TTL: Final[int] = 300  # seconds
+WIKI_CACHE_SIZE: Final[int] = 512  # !wiki results kept in memory
+WIKI_CACHE_TTL: Final[int] = 6 * 3600  # seconds
+WIKI_NEGATIVE_CACHE_TTL: Final[int] = 60  # seconds to remember "no results" for a query
+
+# ============================================================================
+# Role assignment
+# ============================================================================
+
+ROLE_ANALYSIS_CONCURRENCY: Final[int] = 4  # simultaneous Gemini intro analyses
+ROLE_ANALYSIS_TIMEOUT: Final[float] = 20.0  # seconds per Gemini call
+ROLE_ANALYSIS_RETRIES: Final[int] = 2
+ROLE_BATCH_SIZE: Final[int] = 8  # intros per Gemini call; 1 disables batching
+ROLE_BATCH_WINDOW: Final[float] = 2.0  # seconds to wait for more intros before a batch call
+ROLE_LOCAL_MATCH_THRESHOLD: Final[float] = 0.75  # min keyword score to accept a role locally
+ROLE_LOCAL_CONFIDENCE: Final[float] = 0.85  # min confidence to skip Gemini; above 1 disables
+ROLE_LOCAL_MAX_WORDS: Final[int] = 60  # longer intros lose confidence proportionally
+INTRO_CACHE_SIZE: Final[int] = 2048
+INTRO_CACHE_TTL: Final[int] = 7 * 24 * 3600  # seconds
+
+
+# ============================================================================
+# Diagnostics
+# ============================================================================
+
+LOOP_LAG_INTERVAL: Final[float] = 0.25  # seconds between loop lag probes
+LOOP_LAG_THRESHOLD: Final[float] = 0.5  # stall length that triggers a stack sample
+
+
 # ============================================================================
 # Music
 # ============================================================================
@@ -66,20 +142,17 @@ MIN_INTRO_LENGTH: Final[int] = 50
 MAX_QUEUE_SIZE: Final[int] = 50
 MAX_SEARCH_RESULTS: Final[int] = 5
 MUSIC_INACTIVITY_TIMEOUT: Final[int] = 300  # seconds
+MUSIC_EXTRACT_WORKERS: Final[int] = 2  # yt-dlp worker processes
+MUSIC_EXTRACT_TIMEOUT: Final[float] = 30.0  # seconds before a search or lookup gives up
+MUSIC_EXTRACT_MAX_PENDING: Final[int] = 3  # queued extractions per guild; older ones are dropped
+MUSIC_COOKIE_BROWSER: Final[str] = os.getenv("MUSIC_COOKIE_BROWSER", "firefox")  # "" plays without cookies
+MUSIC_COOKIE_REFRESH_HOURS: Final[float] = 6.0
 
 
 # ============================================================================
 # Fun responses
 # ============================================================================
 
-GREETINGS: Final[List[str]] = [
-    "Hey there! What's up?",
-    "Hello! How can I make your day better?",
-    "Hi! Great to see you!",
-    "Heya! Ready for some fun?",
-    "Greetings! How are you doing today?",
-]
-
 ENCOURAGEMENTS: Final[List[str]] = [
     "You're doing amazing!",
     "Keep being awesome!",
@@ -146,3 +219,17 @@ GUESS_MAX: Final[int] = 100
 GUESS_ATTEMPTS: Final[int] = 6
 GUESS_TIMEOUT: Final[float] = 30.0  # seconds
 GUESS_WIN_POINTS: Final[int] = 5
+
+TRIVIA_POOL_TARGET: Final[int] = 3  # ready questions kept per (difficulty, genre)
+TRIVIA_POOL_LOW_WATER: Final[int] = 2  # refill in the background below this many
+TRIVIA_POOL_MAX_KEYS: Final[int] = 32  # (difficulty, genre) pairs with a buffer
+TRIVIA_BANK_SEEN_DAYS: Final[int] = 30  # don't repeat a banked question to a player within this
+TRIVIA_BANK_MIN_UNSEEN: Final[int] = 10  # generate new questions once fewer unseen remain
+
+TRIVIA_MAX_SESSIONS: Final[int] = 500  # concurrent trivia sessions across all guilds
+TRIVIA_SESSION_IDLE_TTL: Final[float] = 600.0  # seconds without a question before a session is dropped
+TRIVIA_SESSION_RESUME_TTL: Final[float] = 86400.0  # how long after a restart !triviaresume works
+GAME_SESSION_SNAPSHOT_INTERVAL: Final[float] = 60.0  # seconds between session snapshots
+
+TRIVIA_ROUND_DURATION: Final[float] = 20.0  # seconds a channel round accepts answers
+TRIVIA_ROUND_SLOWEST_SHARE: Final[float] = 0.5  # share of the points a correct answer at the buzzer earns
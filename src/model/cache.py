@@ -0,0 +1,133 @@
+"""Size-bounded TTL + LRU cache with optional JSON persistence."""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from logger import get_logger
+
+log = get_logger(__name__)
+
+_MISSING = object()
+
+
+class TTLCache:
+    """LRU mapping whose entries also expire `ttl` seconds after they were set.
+
+    Expiry uses wall-clock time so entries keep their deadline across a
+    save/load round trip. Values must be JSON-serialisable to be persisted.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 3600.0) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        # {key: (expires_at, value)}, least recently used first
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._data.get(key)
+        return entry is not None and entry[0] > time.time()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING:
+            self.misses += 1
+            return default
+
+        expires_at, value = entry
+        if expires_at <= time.time():
+            del self._data[key]
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        self._data[key] = (time.time() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def keys(self) -> List[Hashable]:
+        """Unexpired keys, least recently used first. Does not count as access."""
+        now = time.time()
+        return [k for k, (expires_at, _) in self._data.items() if expires_at > now]
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def prune(self) -> int:
+        """Drop expired entries. Returns how many were removed."""
+        now = time.time()
+        expired = [k for k, (expires_at, _) in self._data.items() if expires_at <= now]
+        for key in expired:
+            del self._data[key]
+        return len(expired)
+
+    # ---------------------------------------------------------------- metrics
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def get_stats(self) -> Dict[str, float]:
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hit_ratio,
+        }
+
+    # ------------------------------------------------------------ persistence
+
+    def save(self, path: str) -> None:
+        """Write live entries to `path` atomically. String keys only."""
+        self.prune()
+        entries = [[k, expires_at, v] for k, (expires_at, v) in self._data.items()]
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            log.warning("Could not persist cache to %s: %s", path, e)
+
+    def load(self, path: str) -> int:
+        """Merge unexpired entries from `path`. Returns how many were loaded."""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return 0
+        except (OSError, json.JSONDecodeError) as e:
+            log.warning("Could not load cache from %s: %s", path, e)
+            return 0
+
+        now = time.time()
+        loaded = 0
+        for key, expires_at, value in entries:
+            if expires_at > now:
+                self._data[key] = (expires_at, value)
+                loaded += 1
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+        return loaded
@@ -0,0 +1,295 @@
+"""Per-user conversation memory for chat commands: idle expiry, LRU cap, token budget, rolling summaries."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+
+from logger import get_logger
+
+from .llm import LLMError, LLMService, Priority
+from .model import Database
+
+log = get_logger(__name__)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough Gemini token count (~4 characters per token); good enough for budgeting."""
+    return len(text) // 4 + 1
+
+
+class Conversation:
+    """One user's recent turns in Gemini content format, plus a summary of older ones."""
+
+    __slots__ = ("turns", "summary", "tokens", "last_used", "compacting")
+
+    def __init__(
+        self,
+        turns: Optional[List[Dict]] = None,
+        last_used: Optional[float] = None,
+        summary: Optional[str] = None,
+    ) -> None:
+        self.turns: List[Dict] = turns or []
+        self.summary = summary
+        self.last_used = last_used if last_used is not None else time.time()
+        self.compacting = False
+        self.recount()
+
+    def recount(self) -> None:
+        self.tokens = sum(_turn_tokens(t) for t in self.turns)
+        if self.summary:
+            self.tokens += estimate_tokens(self.summary)
+
+
+class ConversationMemory:
+    """Bounded store of chat histories keyed by user id.
+
+    Conversations idle for `idle_ttl` seconds are forgotten, at most
+    `max_users` are kept (least recently used evicted first), and each is
+    trimmed from the oldest turn until it fits `token_budget`. With a
+    `Database`, histories are written behind by `flush()` and reloaded on
+    first use after a restart.
+
+    With an `llm`, a conversation that grows past `compact_at` tokens has
+    everything but its `keep_recent` latest turns folded into a running
+    summary by a background-priority call, so long chats replay a short
+    note instead of raw turns. Hard trimming remains the fallback.
+    """
+
+    def __init__(
+        self,
+        db: Optional[Database] = None,
+        max_users: int = 500,
+        idle_ttl: float = 3600.0,
+        token_budget: int = 3000,
+        llm: Optional[LLMService] = None,
+        summary_model: Optional[str] = None,
+        compact_at: Optional[int] = None,
+        keep_recent: int = 4,
+    ) -> None:
+        self.db = db
+        self.max_users = max_users
+        self.idle_ttl = idle_ttl
+        self.token_budget = token_budget
+
+        self.llm = llm
+        self.summary_model = summary_model
+        self.compact_at = compact_at if compact_at is not None else token_budget // 2
+        self.keep_recent = keep_recent
+        self._tasks: Set[asyncio.Task] = set()
+
+        self._conversations: "OrderedDict[int, Conversation]" = OrderedDict()
+        self._dirty: Set[int] = set()
+        self.evictions = 0
+        self.compactions = 0
+
+    def __len__(self) -> int:
+        return len(self._conversations)
+
+    # ------------------------------------------------------------------ access
+
+    def history(self, user_id: int) -> List[Dict]:
+        """Turns to replay before the user's next prompt (a copy; may be empty)."""
+        conversation = self._get(user_id)
+        if not conversation:
+            return []
+        if not conversation.summary:
+            return list(conversation.turns)
+        return [
+            {"role": "user", "parts": [f"Summary of our conversation so far:\n{conversation.summary}"]},
+            {"role": "model", "parts": ["Understood, I'll keep that in mind."]},
+        ] + conversation.turns
+
+    def append(self, user_id: int, prompt: str, reply: str) -> None:
+        """Record one exchange and trim the conversation back under budget."""
+        conversation = self._get(user_id)
+        if conversation is None:
+            conversation = Conversation()
+            self._conversations[user_id] = conversation
+
+        for turn in ({"role": "user", "parts": [prompt]}, {"role": "model", "parts": [reply]}):
+            conversation.turns.append(turn)
+            conversation.tokens += _turn_tokens(turn)
+        conversation.last_used = time.time()
+        self._conversations.move_to_end(user_id)
+        self._trim(conversation)
+        self._dirty.add(user_id)
+        self._maybe_compact(user_id, conversation)
+
+        while len(self._conversations) > self.max_users:
+            evicted_id, evicted = self._conversations.popitem(last=False)
+            self.evictions += 1
+            if evicted_id in self._dirty:
+                self._dirty.discard(evicted_id)
+                self._persist(evicted_id, evicted)
+
+    def clear(self, user_id: int) -> bool:
+        """Forget a user's conversation. Returns whether there was one."""
+        existed = self._get(user_id) is not None
+        self._conversations.pop(user_id, None)
+        self._dirty.discard(user_id)
+        if self.db:
+            self.db.delete_conversation(user_id)
+        return existed
+
+    def _get(self, user_id: int) -> Optional[Conversation]:
+        conversation = self._conversations.get(user_id)
+        if conversation is None and self.db:
+            conversation = self._load(user_id)
+            if conversation:
+                self._conversations[user_id] = conversation
+
+        if conversation is None:
+            return None
+        if time.time() - conversation.last_used > self.idle_ttl:
+            del self._conversations[user_id]
+            self._dirty.discard(user_id)
+            return None
+
+        self._conversations.move_to_end(user_id)
+        return conversation
+
+    def _trim(self, conversation: Conversation) -> None:
+        # Drop whole exchanges so the history never starts with a model turn;
+        # the latest exchange is always kept.
+        while conversation.tokens > self.token_budget and len(conversation.turns) > 2:
+            for turn in conversation.turns[:2]:
+                conversation.tokens -= _turn_tokens(turn)
+            del conversation.turns[:2]
+        if conversation.tokens > self.token_budget and conversation.summary:
+            conversation.summary = None
+            conversation.recount()
+
+    # -------------------------------------------------------------- compaction
+
+    def _maybe_compact(self, user_id: int, conversation: Conversation) -> None:
+        if (
+            not self.llm
+            or not self.llm.available
+            or conversation.compacting
+            or conversation.tokens <= self.compact_at
+            or len(conversation.turns) <= self.keep_recent
+        ):
+            return
+
+        # Summarize whole exchanges only, leaving the latest ones verbatim.
+        cut = len(conversation.turns) - self.keep_recent
+        cut -= cut % 2
+        if cut <= 0:
+            return
+
+        conversation.compacting = True
+        task = asyncio.get_running_loop().create_task(
+            self._compact(user_id, conversation, conversation.turns[:cut])
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _compact(self, user_id: int, conversation: Conversation, older: List[Dict]) -> None:
+        try:
+            summary = await self.llm.generate(
+                _summary_prompt(conversation.summary, older),
+                model=self.summary_model,
+                priority=Priority.BACKGROUND,
+                tag="summary",
+            )
+        except LLMError as e:
+            log.warning("Conversation summary for user %s failed: %s", user_id, e)
+            return
+        finally:
+            conversation.compacting = False
+
+        # Turns may have been trimmed meanwhile; drop only those still present.
+        summarized = {id(turn) for turn in older}
+        conversation.turns = [t for t in conversation.turns if id(t) not in summarized]
+        conversation.summary = summary.strip()
+        conversation.recount()
+        self.compactions += 1
+        if user_id in self._conversations:
+            self._dirty.add(user_id)
+
+    # ------------------------------------------------------------- maintenance
+
+    def prune(self) -> int:
+        """Drop idle conversations. Returns how many were removed."""
+        cutoff = time.time() - self.idle_ttl
+        expired = [uid for uid, c in self._conversations.items() if c.last_used < cutoff]
+        for user_id in expired:
+            del self._conversations[user_id]
+            self._dirty.discard(user_id)
+        return len(expired)
+
+    def flush(self) -> int:
+        """Write changed conversations to the database and purge expired rows."""
+        self.prune()
+        if not self.db:
+            self._dirty.clear()
+            return 0
+
+        written = 0
+        for user_id in list(self._dirty):
+            conversation = self._conversations.get(user_id)
+            if conversation:
+                self._persist(user_id, conversation)
+                written += 1
+        self._dirty.clear()
+        self.db.delete_conversations_before(datetime.utcfromtimestamp(time.time() - self.idle_ttl))
+        return written
+
+    def _persist(self, user_id: int, conversation: Conversation) -> None:
+        if self.db:
+            self.db.save_conversation(
+                user_id,
+                json.dumps(conversation.turns),
+                datetime.utcfromtimestamp(conversation.last_used),
+                conversation.summary,
+            )
+
+    def _load(self, user_id: int) -> Optional[Conversation]:
+        row = self.db.get_conversation(user_id)
+        if not row:
+            return None
+        try:
+            turns = json.loads(row["turns"])
+        except json.JSONDecodeError as e:
+            log.warning("Discarding unreadable conversation for user %s: %s", user_id, e)
+            return None
+        last_used = (row["last_used"] - datetime(1970, 1, 1)).total_seconds()
+        return Conversation(turns, last_used, row["summary"])
+
+    # ----------------------------------------------------------------- metrics
+
+    def get_stats(self) -> Dict[str, float]:
+        tokens = [c.tokens for c in self._conversations.values()]
+        return {
+            "users": len(self._conversations),
+            "max_users": self.max_users,
+            "tokens": sum(tokens),
+            "max_tokens": max(tokens, default=0),
+            "evictions": self.evictions,
+            "compactions": self.compactions,
+        }
+
+
+def _summary_prompt(previous: Optional[str], turns: List[Dict]) -> str:
+    transcript = "\n".join(
+        f"{'User' if turn['role'] == 'user' else 'Assistant'}: {' '.join(turn['parts'])}"
+        for turn in turns
+    )
+    earlier = f"Summary of the conversation before this part:\n{previous}\n\n" if previous else ""
+    return f"""Condense the following conversation between a user and an assistant into a short note
+that lets the assistant continue the conversation naturally. Keep names, facts the user shared,
+open questions and decisions. Drop greetings and filler. Use at most 120 words.
+
+{earlier}Conversation:
+{transcript}
+
+Summary:"""
+
+
+def _turn_tokens(turn: Dict) -> int:
+    return sum(estimate_tokens(part) for part in turn.get("parts", []))
@@ -0,0 +1,177 @@
+"""Route chat messages to games waiting on a player's next message."""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+from typing import Callable, Dict, List, Optional, Tuple
+
+import discord
+
+from logger import get_logger
+
+log = get_logger(__name__)
+
+InputKey = Tuple[int, int]  # (channel_id, user_id)
+InputCheck = Callable[[discord.Message], bool]
+ChannelListener = Callable[[discord.Message], None]
+
+
+class _Waiter:
+    __slots__ = ("key", "check", "future", "deadline", "seq")
+
+    def __init__(self, key: InputKey, check: Optional[InputCheck], future: asyncio.Future,
+                 deadline: float, seq: int) -> None:
+        self.key = key
+        self.check = check
+        self.future = future
+        self.deadline = deadline
+        self.seq = seq
+
+
+class GameInputDispatcher:
+    """A drop-in for `bot.wait_for("message")` in games, at one dict lookup per message.
+
+    `bot.wait_for` runs every pending listener's check on every message the
+    bot sees, so the cost of a message grows with the number of games in
+    progress anywhere. Here a game waits on (channel, player) and `dispatch`
+    only looks at the waiters registered for the message's own channel and
+    author. Timeouts share a single deadline heap served by one loop timer,
+    re-armed for the earliest deadline, instead of a timer per wait.
+
+    Games open to a whole channel register one listener for the channel
+    instead, which sees every message posted there while it is registered.
+    """
+
+    def __init__(self) -> None:
+        self._waiters: Dict[InputKey, List[_Waiter]] = {}
+        self._channels: Dict[int, ChannelListener] = {}
+        self._deadlines: List[Tuple[float, int, _Waiter]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timer_at = float("inf")
+        self._seq = itertools.count()
+
+        self.dispatched = 0
+        self.timeouts = 0
+
+    async def wait(self, channel_id: int, user_id: int, timeout: float,
+                   check: Optional[InputCheck] = None) -> discord.Message:
+        """Next message from `user_id` in `channel_id` passing `check`.
+
+        Raises asyncio.TimeoutError after `timeout` seconds, like `wait_for`.
+        """
+        loop = asyncio.get_running_loop()
+        key = (channel_id, user_id)
+        waiter = _Waiter(key, check, loop.create_future(), loop.time() + timeout, next(self._seq))
+        self._waiters.setdefault(key, []).append(waiter)
+        heapq.heappush(self._deadlines, (waiter.deadline, waiter.seq, waiter))
+        if waiter.deadline < self._timer_at:
+            self._arm(loop, waiter.deadline)
+
+        try:
+            return await waiter.future
+        finally:
+            self._remove(waiter)
+
+    def listen_channel(self, channel_id: int, listener: ChannelListener) -> bool:
+        """Send every message in `channel_id` to `listener`. False if the channel already has one."""
+        if channel_id in self._channels:
+            return False
+        self._channels[channel_id] = listener
+        return True
+
+    def stop_listening(self, channel_id: int, listener: ChannelListener) -> None:
+        if self._channels.get(channel_id) is listener:
+            del self._channels[channel_id]
+
+    def dispatch(self, message: discord.Message) -> bool:
+        """Hand `message` to the games waiting on its channel and author. Returns whether any took it."""
+        listener = self._channels.get(message.channel.id)
+        if listener is not None:
+            try:
+                listener(message)
+            except Exception as e:
+                log.error("Channel game listener failed: %s", e)
+
+        waiters = self._waiters.get((message.channel.id, message.author.id))
+        if not waiters:
+            return False
+
+        taken = False
+        for waiter in list(waiters):
+            if waiter.future.done():
+                continue
+            try:
+                matches = waiter.check is None or waiter.check(message)
+            except Exception as e:
+                waiter.future.set_exception(e)
+                continue
+            if matches:
+                waiter.future.set_result(message)
+                taken = True
+        if taken:
+            self.dispatched += 1
+        return taken
+
+    def pending(self) -> int:
+        return sum(len(w) for w in self._waiters.values())
+
+    # ----------------------------------------------------------------- timeouts
+
+    def _arm(self, loop: asyncio.AbstractEventLoop, when: float) -> None:
+        if self._timer:
+            self._timer.cancel()
+        self._timer = loop.call_at(when, self._expire)
+        self._timer_at = when
+
+    def _expire(self) -> None:
+        self._timer = None
+        self._timer_at = float("inf")
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+
+        while self._deadlines and self._deadlines[0][0] <= now:
+            _, _, waiter = heapq.heappop(self._deadlines)
+            if not waiter.future.done():
+                waiter.future.set_exception(asyncio.TimeoutError())
+                self.timeouts += 1
+
+        self._drop_finished()
+        if self._deadlines:
+            self._arm(loop, self._deadlines[0][0])
+
+    def _drop_finished(self) -> None:
+        """Discard heap entries of waits that were answered or cancelled."""
+        if len(self._deadlines) > 2 * self.pending() + 16:
+            # Mostly dead weight (long timeouts answered early); rebuild rather than wait them out.
+            self._deadlines = [entry for entry in self._deadlines if not entry[2].future.done()]
+            heapq.heapify(self._deadlines)
+        while self._deadlines and self._deadlines[0][2].future.done():
+            heapq.heappop(self._deadlines)
+        if not self._deadlines and self._timer:
+            self._timer.cancel()
+            self._timer = None
+            self._timer_at = float("inf")
+
+    def _remove(self, waiter: _Waiter) -> None:
+        waiters = self._waiters.get(waiter.key)
+        if waiters is not None:
+            try:
+                waiters.remove(waiter)
+            except ValueError:
+                pass
+            if not waiters:
+                del self._waiters[waiter.key]
+        self._drop_finished()
+
+    # ----------------------------------------------------------------- metrics
+
+    def get_stats(self) -> Dict[str, float]:
+        return {
+            "waiting": self.pending(),
+            "channels": len(self._channels),
+            "deadlines": len(self._deadlines),
+            "dispatched": self.dispatched,
+            "timeouts": self.timeouts,
+        }
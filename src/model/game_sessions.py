@@ -0,0 +1,165 @@
+"""Registry of in-progress game sessions with idle expiry and restart snapshots."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from logger import get_logger
+
+from .model import Database
+
+log = get_logger(__name__)
+
+
+class GameSessionRegistry:
+    """Active sessions of one game, keyed by user id.
+
+    Sessions are any object with a `last_active` attribute (a
+    `time.monotonic()` timestamp the game bumps through `touch`) and a
+    `to_dict()` returning JSON-safe state. Sessions idle for longer than
+    `idle_ttl` seconds are dropped by `sweep`, so one that a crashed command
+    never cleaned up stops blocking its player. At most `max_sessions` run at
+    once; `add` sweeps and then refuses when still full.
+
+    `snapshot` writes every session to the database from a worker thread,
+    and `load` reads back those written in the last `resume_ttl` seconds as
+    resumable state for after a restart. Resumable state is kept in later
+    snapshots until it is taken or expires. A session that ends is deleted
+    from the database straight away, so it is never offered for resuming.
+    """
+
+    def __init__(
+        self,
+        db: Database,
+        game: str,
+        max_sessions: int = 500,
+        idle_ttl: float = 900.0,
+        resume_ttl: float = 86400.0,
+    ) -> None:
+        self.db = db
+        self.game = game
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.resume_ttl = timedelta(seconds=resume_ttl)
+
+        self._sessions: Dict[int, object] = {}
+        self._resumable: Dict[int, Tuple[str, datetime]] = {}
+        self._stored: Set[int] = set()  # users with a row from the last snapshot
+        self._writing = False
+        self._ended_while_writing: Set[int] = set()
+
+        self.expired = 0
+        self.rejected = 0
+        self.resumed = 0
+
+    # --------------------------------------------------------------- sessions
+
+    def get(self, user_id: int):
+        return self._sessions.get(user_id)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._sessions
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(list(self._sessions))
+
+    def add(self, user_id: int, session) -> bool:
+        """Register `session` for `user_id`. False if the registry is full."""
+        if user_id not in self._sessions and len(self._sessions) >= self.max_sessions:
+            self.sweep()
+            if len(self._sessions) >= self.max_sessions:
+                self.rejected += 1
+                return False
+        session.last_active = time.monotonic()
+        self._sessions[user_id] = session
+        self._resumable.pop(user_id, None)
+        return True
+
+    def touch(self, user_id: int) -> None:
+        session = self._sessions.get(user_id)
+        if session is not None:
+            session.last_active = time.monotonic()
+
+    def remove(self, user_id: int, session=None) -> None:
+        """Forget the user's session; with `session`, only if it is still that one."""
+        if session is not None and self._sessions.get(user_id) is not session:
+            return
+        if self._sessions.pop(user_id, None) is None:
+            return
+        if self._writing:
+            self._ended_while_writing.add(user_id)  # the running snapshot may write it back
+        elif user_id in self._stored:
+            self._stored.discard(user_id)
+            self.db.delete_game_session(self.game, user_id)
+
+    def sweep(self) -> List[int]:
+        """Drop sessions idle past the TTL and expired resumable state. Returns users dropped."""
+        cutoff = time.monotonic() - self.idle_ttl
+        idle = [uid for uid, s in self._sessions.items() if s.last_active < cutoff]
+        for uid in idle:
+            del self._sessions[uid]
+        self.expired += len(idle)
+        if idle:
+            log.info("Expired %s idle %s sessions", len(idle), self.game)
+
+        resume_cutoff = datetime.utcnow() - self.resume_ttl
+        for uid in [uid for uid, (_, saved) in self._resumable.items() if saved < resume_cutoff]:
+            del self._resumable[uid]
+        return idle
+
+    # ------------------------------------------------------------ persistence
+
+    async def snapshot(self) -> None:
+        """Persist active sessions, plus resumable state nobody has picked up yet."""
+        if self._writing:
+            return
+        now = datetime.utcnow()
+        rows = dict(self._resumable)
+        for user_id, session in self._sessions.items():
+            rows[user_id] = (json.dumps(session.to_dict()), now)
+
+        self._writing = True
+        try:
+            await asyncio.to_thread(self.db.replace_game_sessions, self.game, rows)
+            self._stored = set(rows)
+        finally:
+            self._writing = False
+            ended, self._ended_while_writing = self._ended_while_writing, set()
+            for user_id in ended & self._stored:
+                self._stored.discard(user_id)
+                self.db.delete_game_session(self.game, user_id)
+
+    def load(self) -> int:
+        """Read snapshots from before a restart. Returns how many can be resumed."""
+        self._resumable = self.db.get_game_sessions(self.game, datetime.utcnow() - self.resume_ttl)
+        self._stored = set(self._resumable)
+        if self._resumable:
+            log.info("%s %s sessions can be resumed", len(self._resumable), self.game)
+        return len(self._resumable)
+
+    def take_resumable(self, user_id: int) -> Optional[dict]:
+        """The user's saved state from before a restart, removed from the resumable set."""
+        saved = self._resumable.pop(user_id, None)
+        if saved is None:
+            return None
+        self.resumed += 1
+        return json.loads(saved[0])
+
+    # ----------------------------------------------------------------- metrics
+
+    def get_stats(self) -> Dict[str, float]:
+        return {
+            "active": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "resumable": len(self._resumable),
+            "expired": self.expired,
+            "rejected": self.rejected,
+            "resumed": self.resumed,
+        }
@@ -0,0 +1,604 @@
+"""Bot-wide Gemini client: pooled models, rate limiting, priorities, retries."""
+
+from __future__ import annotations
+
+import asyncio
+import bisect
+import hashlib
+import itertools
+import json
+import random
+import time
+from contextlib import aclosing
+from enum import IntEnum
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from google.api_core import exceptions as google_exceptions
+
+from logger import get_logger
+
+from .llm_backends import GeminiBackend, LLMBackend
+from .llm_usage import LLMUsageTracker
+from .metrics import LatencyTracker
+
+log = get_logger(__name__)
+
+
+# ============================================================================
+# Errors
+# ============================================================================
+
+class LLMError(Exception):
+    """Base class for every failure surfaced by `LLMService`."""
+
+
+class LLMUnavailableError(LLMError):
+    """No API key configured, so no model can be called."""
+
+
+class LLMTimeoutError(LLMError):
+    """The call (or the wait for a free slot) exceeded its deadline."""
+
+
+class LLMRateLimitError(LLMError):
+    """The upstream quota was still exhausted after all retries."""
+
+
+class LLMResponseError(LLMError):
+    """The model answered, but with nothing usable (empty or blocked)."""
+
+
+class LLMRequestError(LLMError):
+    """Any other upstream error."""
+
+
+# Failures worth another attempt after a backoff.
+_RETRYABLE = (
+    asyncio.TimeoutError,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded,
+)
+
+
+class Priority(IntEnum):
+    """Lower values are dispatched first."""
+
+    INTERACTIVE = 0  # a user is waiting on a command
+    BACKGROUND = 1  # intros, prefetching, summaries
+
+
+# ============================================================================
+# Rate limiting
+# ============================================================================
+
+class TokenBucket:
+    """Classic token bucket measured in requests per minute."""
+
+    def __init__(self, per_minute: float, burst: Optional[int] = None) -> None:
+        self.rate = per_minute / 60.0
+        self.capacity = float(burst if burst is not None else max(1, int(per_minute // 10)))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self, now: float) -> float:
+        """Seconds until one token is available (0 if one is available now)."""
+        self._refill(now)
+        if self._tokens >= 1:
+            return 0.0
+        return (1 - self._tokens) / self.rate if self.rate > 0 else float("inf")
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self._tokens -= 1
+
+
+# ============================================================================
+# Service
+# ============================================================================
+
+# (priority, sequence, model name, grant future)
+_Waiter = Tuple[int, int, str, asyncio.Future]
+
+
+class _SharedStream:
+    """One upstream stream's chunks, replayed to every caller reading it.
+
+    A reader that joins late first gets the chunks already received, then
+    follows along live. The producing task is cancelled once every reader
+    has gone.
+    """
+
+    def __init__(self) -> None:
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.readers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def publish(self, chunk: str) -> None:
+        self.chunks.append(chunk)
+        self._notify()
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        self.done = True
+        self.error = error
+        self._notify()
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def read(self) -> AsyncIterator[str]:
+        i = 0
+        while True:
+            while i < len(self.chunks):
+                yield self.chunks[i]
+                i += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await self._changed.wait()
+
+
+class LLMService:
+    """Single entry point for Gemini calls from every cog and service.
+
+    Requests wait in a priority queue until a concurrency slot and a token
+    from both the global and the per-model bucket are free, then call the
+    model's native async API with a timeout. Transient upstream errors are
+    retried with full-jitter backoff; everything else surfaces as an
+    `LLMError` subclass.
+
+    The timeout is one deadline for the whole request, slot waits and retries
+    included, so an interactive command never waits much longer than
+    `timeout`; a timed-out interactive call is not retried. Background work
+    may spend `timeout` on each of its attempts.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str],
+        default_model: str = "gemini-2.5-flash",
+        max_concurrency: int = 8,
+        global_rpm: float = 60,
+        model_rpm: Optional[Dict[str, float]] = None,
+        timeout: float = 30.0,
+        max_retries: int = 2,
+        retry_base_delay: float = 1.0,
+        usage: Optional[LLMUsageTracker] = None,
+        backend: Optional[LLMBackend] = None,
+    ) -> None:
+        self.default_model = default_model
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+
+        # Gemini unless a backend (e.g. the offline fake) is supplied.
+        self.backend = backend or GeminiBackend(api_key)
+        self.available = self.backend.available
+
+        self._global_bucket = TokenBucket(global_rpm)
+        self._model_rpm = dict(model_rpm or {})
+        self._model_buckets: Dict[str, TokenBucket] = {}
+
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._pump_handle: Optional[asyncio.TimerHandle] = None
+
+        self.latency = LatencyTracker()
+        self.first_chunk = LatencyTracker()  # time to first streamed text
+        self.errors = 0
+        self.timeouts = 0
+        self.retries = 0
+
+        # Identical concurrent generate() calls share one upstream request, as do identical streams.
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._streams: Dict[str, _SharedStream] = {}
+        self.coalesced = 0
+
+        # Per-command accounting; `tag` names the feature making each call.
+        self.usage = usage or LLMUsageTracker()
+
+    # ------------------------------------------------------------------ models
+
+    def _model(self, name: str):
+        return self.backend.model(name)
+
+    def _bucket(self, model_name: str) -> Optional[TokenBucket]:
+        if model_name not in self._model_rpm:
+            return None
+        bucket = self._model_buckets.get(model_name)
+        if bucket is None:
+            bucket = TokenBucket(self._model_rpm[model_name])
+            self._model_buckets[model_name] = bucket
+        return bucket
+
+    # -------------------------------------------------------------- scheduling
+
+    async def _acquire(self, model_name: str, priority: Priority) -> None:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        bisect.insort(self._waiters, (int(priority), next(self._seq), model_name, future))
+        self._pump()
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted a slot just as we were cancelled; hand it back.
+                self._release()
+            else:
+                future.cancel()
+                self._waiters = [w for w in self._waiters if w[3] is not future]
+            raise
+
+    def _release(self) -> None:
+        self._in_flight -= 1
+        self._pump()
+
+    def _pump(self) -> None:
+        """Grant slots to waiters in priority order while capacity and tokens allow."""
+        self._waiters = [w for w in self._waiters if not w[3].done()]
+        now = time.monotonic()
+        retry_in: Optional[float] = None
+
+        i = 0
+        while i < len(self._waiters) and self._in_flight < self.max_concurrency:
+            global_delay = self._global_bucket.delay(now)
+            if global_delay > 0:
+                retry_in = global_delay
+                break
+
+            _, _, model_name, future = self._waiters[i]
+            bucket = self._bucket(model_name)
+            model_delay = bucket.delay(now) if bucket else 0.0
+            if model_delay > 0:
+                # This model is throttled; let lower-priority work on other models through.
+                retry_in = model_delay if retry_in is None else min(retry_in, model_delay)
+                i += 1
+                continue
+
+            self._global_bucket.take(now)
+            if bucket:
+                bucket.take(now)
+            self._in_flight += 1
+            self._waiters.pop(i)
+            future.set_result(None)
+
+        if retry_in is not None and self._waiters and self._pump_handle is None:
+            self._pump_handle = asyncio.get_running_loop().call_later(retry_in, self._scheduled_pump)
+
+    def _scheduled_pump(self) -> None:
+        self._pump_handle = None
+        self._pump()
+
+    # ----------------------------------------------------------------- calling
+
+    def _prepare(
+        self,
+        prompt: str,
+        model: Optional[str],
+        history: Optional[List[Dict]],
+        timeout: Optional[float],
+        retries: Optional[int],
+    ) -> Tuple[str, List[Dict], float, int]:
+        if not self.available:
+            raise LLMUnavailableError("AI service is not available. Please configure GEMINI_API_KEY.")
+        return (
+            model or self.default_model,
+            list(history or []) + [{"role": "user", "parts": [prompt]}],
+            self.timeout if timeout is None else timeout,
+            self.max_retries if retries is None else retries,
+        )
+
+    def _deadline(self, priority: Priority, timeout: float, retries: int) -> float:
+        """When a request started now must be finished by, across slot waits and retries."""
+        budget = timeout if priority == Priority.INTERACTIVE else timeout * (retries + 1)
+        return time.monotonic() + budget
+
+    async def _acquire_within(self, model_name: str, priority: Priority, timeout: float, tag: str) -> None:
+        try:
+            if timeout <= 0:
+                raise asyncio.TimeoutError
+            await asyncio.wait_for(self._acquire(model_name, priority), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            self.usage.record_error(tag)
+            raise LLMTimeoutError("AI service is busy, please try again shortly.") from None
+
+    def _wrap_error(self, e: BaseException, timeout: float) -> LLMError:
+        """Count and convert an upstream failure into the matching `LLMError`."""
+        if isinstance(e, asyncio.TimeoutError):
+            self.timeouts += 1
+            return LLMTimeoutError(f"AI request timed out after {timeout:.0f}s.")
+        self.errors += 1
+        if isinstance(e, LLMError):
+            return e
+        if isinstance(e, google_exceptions.ResourceExhausted):
+            return LLMRateLimitError(f"AI quota exhausted: {e}")
+        if isinstance(e, _RETRYABLE):
+            return LLMRequestError(f"AI service error: {e}")
+        return LLMRequestError(f"AI request failed: {e}")
+
+    @staticmethod
+    def _retryable(e: BaseException, priority: Priority) -> bool:
+        if isinstance(e, asyncio.TimeoutError):
+            return priority != Priority.INTERACTIVE  # the user has already waited the full timeout
+        return isinstance(e, _RETRYABLE)
+
+    async def _backoff(self, attempt: int, retries: int, error: LLMError) -> None:
+        self.retries += 1
+        log.warning("LLM call failed (attempt %s/%s): %s", attempt + 1, retries + 1, error)
+        await asyncio.sleep(random.uniform(0, self.retry_base_delay * 2 ** attempt))
+
+    async def generate(
+        self,
+        prompt: str,
+        *,
+        model: Optional[str] = None,
+        history: Optional[List[Dict]] = None,
+        priority: Priority = Priority.INTERACTIVE,
+        timeout: Optional[float] = None,
+        retries: Optional[int] = None,
+        tag: str = "other",
+    ) -> str:
+        """Return the model's text for `prompt`, optionally continuing `history`.
+
+        `history` uses Gemini's content format: [{"role": "user"|"model", "parts": [str]}].
+        A call identical (model, contents and priority) to one already in flight
+        waits for that call's result instead of sending its own, still bounded by
+        its own `timeout`. Raises an `LLMError` subclass on failure. `tag` is the
+        command name usage is recorded under.
+        """
+        model_name, contents, timeout, retries = self._prepare(prompt, model, history, timeout, retries)
+        deadline = self._deadline(priority, timeout, retries)
+
+        key = _request_key(model_name, contents, priority)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._generate(model_name, contents, priority, timeout, retries, deadline, tag))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+            # Shielded so one caller giving up does not cancel the call for the others.
+            return await asyncio.shield(task)
+
+        self.coalesced += 1
+        self.usage.record_cache_hit(tag)
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout=deadline - time.monotonic())
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise LLMTimeoutError(f"AI request timed out after {timeout:.0f}s.") from None
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # retrieved here in case every caller was cancelled
+
+    async def _generate(
+        self,
+        model_name: str,
+        contents: List[Dict],
+        priority: Priority,
+        timeout: float,
+        retries: int,
+        deadline: float,
+        tag: str,
+    ) -> str:
+        for attempt in range(retries + 1):
+            await self._acquire_within(model_name, priority, min(timeout, deadline - time.monotonic()), tag)
+
+            started = time.monotonic()
+            try:
+                response = await asyncio.wait_for(
+                    self._model(model_name).generate_content_async(contents),
+                    timeout=min(timeout, deadline - started),
+                )
+                elapsed = time.monotonic() - started
+                self.latency.record(elapsed)
+                text = _response_text(response)
+                self.usage.record_call(tag, elapsed, *_token_counts(response))
+                return text
+            except Exception as e:
+                error = self._wrap_error(e, timeout)
+                retryable = self._retryable(e, priority)
+                if not retryable or attempt == retries or time.monotonic() >= deadline:
+                    self.usage.record_error(tag)  # once per failed request, not per attempt
+                if not retryable:
+                    if error is e:
+                        raise
+                    raise error from e
+            finally:
+                self._release()
+
+            if attempt == retries or time.monotonic() >= deadline:
+                break
+            await self._backoff(attempt, retries, error)
+
+        raise error
+
+    async def stream(
+        self,
+        prompt: str,
+        *,
+        model: Optional[str] = None,
+        history: Optional[List[Dict]] = None,
+        priority: Priority = Priority.INTERACTIVE,
+        timeout: Optional[float] = None,
+        retries: Optional[int] = None,
+        tag: str = "other",
+    ) -> AsyncIterator[str]:
+        """Yield the model's text for `prompt` in chunks as they are generated.
+
+        Until the first chunk, `timeout` is a deadline for the whole request as
+        in `generate`; after that it bounds the wait for each chunk rather than
+        the whole reply. Failures before the first chunk are retried like
+        `generate`; once text has been yielded, errors are raised to the
+        consumer as-is.
+
+        Like `generate`, a stream identical to one in flight reads that one:
+        the chunks received so far, then the rest as they arrive.
+        """
+        model_name, contents, timeout, retries = self._prepare(prompt, model, history, timeout, retries)
+
+        key = _request_key(model_name, contents, priority)
+        shared = self._streams.get(key)
+        if shared is None:
+            shared = self._streams[key] = _SharedStream()
+            upstream = self._stream(model_name, contents, priority, timeout, retries, tag)
+            shared.task = asyncio.ensure_future(self._broadcast(key, shared, upstream))
+        else:
+            self.coalesced += 1
+            self.usage.record_cache_hit(tag)
+
+        shared.readers += 1
+        try:
+            async for chunk in shared.read():
+                yield chunk
+        finally:
+            shared.readers -= 1
+            if shared.readers == 0 and not shared.done:
+                # Nobody is left to read it; stop the upstream call and free its slot
+                shared.task.cancel()
+                if self._streams.get(key) is shared:
+                    del self._streams[key]
+
+    async def _broadcast(self, key: str, shared: _SharedStream, upstream: AsyncIterator[str]) -> None:
+        error: Optional[BaseException] = None
+        try:
+            async with aclosing(upstream):
+                async for chunk in upstream:
+                    shared.publish(chunk)
+        except Exception as e:
+            error = e
+        finally:
+            if self._streams.get(key) is shared:
+                del self._streams[key]
+            shared.finish(error)
+
+    async def _stream(
+        self,
+        model_name: str,
+        contents: List[Dict],
+        priority: Priority,
+        timeout: float,
+        retries: int,
+        tag: str,
+    ) -> AsyncIterator[str]:
+        deadline = self._deadline(priority, timeout, retries)
+
+        for attempt in range(retries + 1):
+            await self._acquire_within(model_name, priority, min(timeout, deadline - time.monotonic()), tag)
+
+            started = time.monotonic()
+            emitted = False
+            tokens = (0, 0)
+            try:
+                response = await asyncio.wait_for(
+                    self._model(model_name).generate_content_async(contents, stream=True),
+                    timeout=min(timeout, deadline - started),
+                )
+                chunks = response.__aiter__()
+                while True:
+                    wait = timeout if emitted else min(timeout, deadline - time.monotonic())
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), timeout=wait)
+                    except StopAsyncIteration:
+                        break
+                    # Usage metadata is cumulative; the last chunk has the totals.
+                    tokens = _token_counts(chunk, tokens)
+                    text = _chunk_text(chunk)
+                    if not text:
+                        continue
+                    if not emitted:
+                        emitted = True
+                        self.first_chunk.record(time.monotonic() - started)
+                    yield text
+
+                if not emitted:
+                    raise LLMResponseError("AI returned an empty response.")
+                elapsed = time.monotonic() - started
+                self.latency.record(elapsed)
+                self.usage.record_call(tag, elapsed, *tokens)
+                return
+            except Exception as e:
+                error = self._wrap_error(e, timeout)
+                retryable = not emitted and self._retryable(e, priority)
+                if not retryable or attempt == retries or time.monotonic() >= deadline:
+                    self.usage.record_error(tag)  # once per failed request, not per attempt
+                if not retryable:
+                    if error is e:
+                        raise
+                    raise error from e
+            finally:
+                self._release()
+
+            if attempt == retries or time.monotonic() >= deadline:
+                break
+            await self._backoff(attempt, retries, error)
+
+        raise error
+
+    # ----------------------------------------------------------------- metrics
+
+    def get_stats(self) -> Dict[str, float]:
+        latency = self.latency.summary((50, 95))
+        return {
+            "queued": len(self._waiters),
+            "in_flight": self._in_flight,
+            "calls": latency["count"],
+            "p50": latency["p50"],
+            "p95": latency["p95"],
+            "first_chunk_p50": self.first_chunk.summary((50,))["p50"],
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "retries": self.retries,
+            "coalesced": self.coalesced,
+        }
+
+
+def _request_key(model_name: str, contents: List[Dict], priority: Priority) -> str:
+    payload = json.dumps([model_name, int(priority), contents], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _chunk_text(chunk) -> str:
+    """Text of one streamed chunk; the final chunk often carries only metadata."""
+    try:
+        return chunk.text or ""
+    except ValueError:
+        return ""
+
+
+def _token_counts(response, default: Tuple[int, int] = (0, 0)) -> Tuple[int, int]:
+    """(prompt, response) token counts from a reply's usage metadata, if present."""
+    metadata = getattr(response, "usage_metadata", None)
+    if not metadata or not getattr(metadata, "total_token_count", 0):
+        return default
+    return (
+        getattr(metadata, "prompt_token_count", 0) or 0,
+        getattr(metadata, "candidates_token_count", 0) or 0,
+    )
+
+
+def _response_text(response) -> str:
+    """Extract text, converting blocked/empty replies into `LLMResponseError`."""
+    try:
+        text = response.text if response else ""
+    except ValueError as e:
+        # .text raises when the candidate was blocked or has no parts.
+        raise LLMResponseError(f"AI returned no usable content: {e}") from e
+    if not text:
+        raise LLMResponseError("AI returned an empty response.")
+    return text
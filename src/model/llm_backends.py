@@ -0,0 +1,379 @@
+"""Model backends for `LLMService`: the real Gemini API and an offline fake for load tests."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import math
+import random
+import re
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+
+from logger import get_logger
+
+log = get_logger(__name__)
+
+
+class LLMBackend(ABC):
+    """Hands out model objects exposing Gemini's `generate_content_async`.
+
+    `LLMService` only ever calls `model(name).generate_content_async(contents)`
+    (optionally with `stream=True`) and reads `.text` / `.usage_metadata` from
+    what comes back, so a backend just has to reproduce that surface.
+    """
+
+    available: bool = False
+
+    @abstractmethod
+    def model(self, name: str):
+        """The model object for `name`; may be pooled."""
+
+
+# ============================================================================
+# Gemini
+# ============================================================================
+
+# Key last passed to genai.configure; the SDK keeps a single process-wide client config.
+_configured_key: Optional[str] = None
+
+
+class GeminiBackend(LLMBackend):
+    """google.generativeai models, one pooled instance per model name.
+
+    The SDK has no per-model credentials: `genai.configure` sets the key for
+    the whole process, so every GeminiBackend uses the key of the one
+    created last. The bot only ever creates one; a second with a different
+    key logs a warning.
+    """
+
+    def __init__(self, api_key: Optional[str]) -> None:
+        global _configured_key
+        self.available = bool(api_key)
+        if self.available:
+            if _configured_key is not None and _configured_key != api_key:
+                log.warning("Reconfiguring Gemini with a different API key; earlier backends now use it too")
+            genai.configure(api_key=api_key)
+            _configured_key = api_key
+        else:
+            log.warning("GEMINI_API_KEY not set; LLM features are disabled")
+        self._models: Dict[str, genai.GenerativeModel] = {}
+
+    def model(self, name: str) -> genai.GenerativeModel:
+        model = self._models.get(name)
+        if model is None:
+            model = genai.GenerativeModel(name)
+            self._models[name] = model
+        return model
+
+
+# ============================================================================
+# Fake
+# ============================================================================
+
+# (pattern matched against the prompt, builds the reply text)
+Responder = Tuple["re.Pattern[str]", Callable[[str, random.Random], str]]
+
+
+class FakeBackend(LLMBackend):
+    """Offline stand-in for Gemini with tunable latency, failures and streaming.
+
+    Latency is log-normal around `latency_ms` (median) with shape
+    `latency_sigma`; for streams that is the time to the first chunk, after
+    which `chunk_chars` characters arrive every `chunk_interval_ms`. A call
+    fails with probability `error_rate`, as a quota error for
+    `rate_limit_share` of failures and a 503 otherwise, so `LLMService`'s
+    retry handling is exercised too.
+
+    Replies come from the first responder whose pattern matches the prompt;
+    the defaults answer the bot's own prompts (trivia JSON, intro role
+    arrays, YAML templates) with output their parsers accept.
+    """
+
+    available = True
+
+    def __init__(
+        self,
+        latency_ms: float = 800.0,
+        latency_sigma: float = 0.5,
+        error_rate: float = 0.0,
+        rate_limit_share: float = 0.25,
+        chunk_chars: int = 40,
+        chunk_interval_ms: float = 50.0,
+        seed: Optional[int] = None,
+        responders: Optional[List[Responder]] = None,
+    ) -> None:
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.rate_limit_share = rate_limit_share
+        self.chunk_chars = max(1, chunk_chars)
+        self.chunk_interval_ms = chunk_interval_ms
+        self.responders = list(responders) if responders is not None else list(DEFAULT_RESPONDERS)
+        self.rng = random.Random(seed)
+
+        self.calls = 0
+        self.failures = 0
+
+    def model(self, name: str) -> "_FakeModel":
+        return _FakeModel(self, name)
+
+    # ---------------------------------------------------------------- behaviour
+
+    def latency(self) -> float:
+        """Seconds for one call (or to a stream's first chunk)."""
+        if self.latency_ms <= 0:
+            return 0.0
+        return self.rng.lognormvariate(math.log(self.latency_ms / 1000), self.latency_sigma)
+
+    def maybe_fail(self) -> None:
+        if self.rng.random() >= self.error_rate:
+            return
+        self.failures += 1
+        if self.rng.random() < self.rate_limit_share:
+            raise google_exceptions.ResourceExhausted("fake backend: quota exhausted")
+        raise google_exceptions.ServiceUnavailable("fake backend: service unavailable")
+
+    def reply(self, prompt: str) -> str:
+        for pattern, build in self.responders:
+            if pattern.search(prompt):
+                return build(prompt, self.rng)
+        return _prose(prompt, self.rng)
+
+
+class _FakeModel:
+    def __init__(self, backend: FakeBackend, name: str) -> None:
+        self.backend = backend
+        self.name = name
+
+    async def generate_content_async(self, contents, stream: bool = False):
+        backend = self.backend
+        backend.calls += 1
+        prompt = _prompt_text(contents)
+        await asyncio.sleep(backend.latency())
+        backend.maybe_fail()
+
+        text = backend.reply(prompt)
+        prompt_tokens = _tokens(json.dumps(contents) if not isinstance(contents, str) else contents)
+        if not stream:
+            return _FakeResponse(text, _Usage(prompt_tokens, _tokens(text)))
+        return _FakeStream(backend, text, prompt_tokens)
+
+
+class _FakeResponse:
+    def __init__(self, text: str, usage_metadata=None) -> None:
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class _FakeStream:
+    def __init__(self, backend: FakeBackend, text: str, prompt_tokens: int) -> None:
+        self.backend = backend
+        self.text = text
+        self.prompt_tokens = prompt_tokens
+
+    async def _chunks(self) -> AsyncIterator[_FakeResponse]:
+        size = self.backend.chunk_chars
+        for start in range(0, len(self.text), size):
+            if start:
+                await asyncio.sleep(self.backend.chunk_interval_ms / 1000)
+            yield _FakeResponse(self.text[start:start + size])
+        # Like Gemini, totals arrive on a trailing metadata-only chunk.
+        yield _FakeResponse("", _Usage(self.prompt_tokens, _tokens(self.text)))
+
+    def __aiter__(self) -> AsyncIterator[_FakeResponse]:
+        return self._chunks()
+
+
+class _Usage:
+    __slots__ = ("prompt_token_count", "candidates_token_count", "total_token_count")
+
+    def __init__(self, prompt: int, candidates: int) -> None:
+        self.prompt_token_count = prompt
+        self.candidates_token_count = candidates
+        self.total_token_count = prompt + candidates
+
+
+# ============================================================================
+# Canned replies
+# ============================================================================
+
+_TRIVIA = [
+    ("What is the chemical symbol for gold?", ["Au", "Ag", "Gd", "Go"], "A", "science"),
+    ("Which planet has the shortest day?", ["Mars", "Jupiter", "Venus", "Earth"], "B", "science"),
+    ("Who painted the ceiling of the Sistine Chapel?", ["Raphael", "Donatello", "Michelangelo", "Titian"], "C", "art"),
+    ("In which year did the Berlin Wall fall?", ["1987", "1991", "1985", "1989"], "D", "history"),
+    ("What is the largest organ of the human body?", ["Skin", "Liver", "Lungs", "Brain"], "A", "biology"),
+    ("Which language has the most native speakers?", ["English", "Mandarin", "Spanish", "Hindi"], "B", "geography"),
+    ("How many bits are in a byte?", ["4", "16", "8", "32"], "C", "technology"),
+    ("Which ocean is the deepest?", ["Atlantic", "Indian", "Arctic", "Pacific"], "D", "geography"),
+]
+
+_ROLES_YAML = """role_categories:
+  "interests":
+    description: "What members are into"
+    roles:
+      - name: "gamer"
+        color: "#5865F2"
+        mentionable: true
+      - name: "reader"
+        color: "#57F287"
+        mentionable: true
+      - name: "musician"
+        color: "#FEE75C"
+        mentionable: true
+  "regions":
+    description: "Where members are based"
+    roles:
+      - name: "europe"
+        color: "#EB459E"
+        mentionable: false
+      - name: "americas"
+        color: "#ED4245"
+        mentionable: false
+      - name: "asia"
+        color: "#F47B67"
+        mentionable: false
+  "pings":
+    description: "Opt-in notifications"
+    roles:
+      - name: "events"
+        color: "#3BA55C"
+        mentionable: true
+      - name: "announcements"
+        color: "#FAA61A"
+        mentionable: true
+      - name: "game nights"
+        color: "#9B59B6"
+        mentionable: true
+"""
+
+_CHANNELS_YAML = """categories:
+  "📢 Information":
+    channels:
+      - name: "announcements"
+        type: "text"
+        description: "Server news"
+      - name: "rules"
+        type: "text"
+        description: "Please read first"
+  "💬 Community":
+    channels:
+      - name: "general"
+        type: "text"
+        description: "Talk about anything"
+      - name: "introductions"
+        type: "text"
+        description: "Say hello"
+      - name: "Lounge"
+        type: "voice"
+        description: "Hang out"
+  "🎮 Gaming":
+    channels:
+      - name: "looking-for-group"
+        type: "text"
+        description: "Find teammates"
+      - name: "Game Night"
+        type: "voice"
+        description: "Weekly sessions"
+
+standalone:
+  - name: "bot-commands"
+    type: "text"
+    description: "Talk to the bots here"
+"""
+
+_WORDS = (
+    "the system works by combining several simple parts that each do one job well and "
+    "pass their results along so that the whole behaves predictably under load while "
+    "remaining easy to reason about for anyone reading it later"
+).split()
+
+
+def _trivia_question(prompt: str, entry) -> dict:
+    question, options, answer, category = entry
+    difficulty = re.search(r'"difficulty":\s*"(\w+)"', prompt)
+    return {
+        "question": question,
+        "options": options,
+        "answer": answer,
+        "explanation": f"The answer is {options['ABCD'.index(answer)]}.",
+        "category": category,
+        "difficulty": difficulty.group(1) if difficulty else "medium",
+        "hint": f"It starts with '{options['ABCD'.index(answer)][0]}'.",
+    }
+
+
+def _trivia(prompt: str, rng: random.Random) -> str:
+    return json.dumps(_trivia_question(prompt, rng.choice(_TRIVIA)))
+
+
+def _trivia_batch(prompt: str, rng: random.Random) -> str:
+    # Repeats once the canned set runs out, as a real model occasionally does
+    count = int(re.search(r"array of (\d+) multiple-choice", prompt).group(1))
+    entries = rng.sample(_TRIVIA, k=min(count, len(_TRIVIA)))
+    entries += rng.choices(_TRIVIA, k=count - len(entries))
+    return json.dumps([_trivia_question(prompt, e) for e in entries])
+
+
+def _available_roles(prompt: str) -> List[str]:
+    match = re.search(r"Available roles:\n(.*)\n", prompt)
+    return [r.strip() for r in match.group(1).split(",") if r.strip()] if match else []
+
+
+def _pick_roles(intro: str, roles: List[str], rng: random.Random) -> List[str]:
+    lowered = intro.lower()
+    mentioned = [r for r in roles if r in lowered]
+    if mentioned or not roles:
+        return mentioned
+    return rng.sample(roles, k=min(len(roles), rng.randint(0, 2)))
+
+
+def _intro_roles(prompt: str, rng: random.Random) -> str:
+    intro = re.search(r'User introduction:\n"(.*)"', prompt, re.DOTALL)
+    return json.dumps(_pick_roles(intro.group(1) if intro else "", _available_roles(prompt), rng))
+
+
+def _intro_roles_batch(prompt: str, rng: random.Random) -> str:
+    roles = _available_roles(prompt)
+    intros = re.findall(r'^\[(\d+)\] "(.*?)"$', prompt, re.MULTILINE | re.DOTALL)
+    return json.dumps({i: _pick_roles(text, roles, rng) for i, text in intros})
+
+
+def _prose(prompt: str, rng: random.Random) -> str:
+    sentences = []
+    for _ in range(rng.randint(4, 12)):
+        words = rng.sample(_WORDS, k=rng.randint(8, 16))
+        sentences.append(" ".join(words).capitalize() + ".")
+    return " ".join(sentences)
+
+
+DEFAULT_RESPONDERS: List[Responder] = [
+    (re.compile(r"mapping every id to an array of role names"), _intro_roles_batch),
+    (re.compile(r"JSON array of role names"), _intro_roles),
+    (re.compile(r"array of \d+ multiple-choice trivia questions"), _trivia_batch),
+    (re.compile(r"multiple-choice trivia question"), _trivia),
+    (re.compile(r"roles configuration in YAML"), lambda prompt, rng: _ROLES_YAML),
+    (re.compile(r"channels configuration in YAML"), lambda prompt, rng: _CHANNELS_YAML),
+]
+
+
+# ============================================================================
+# Helpers
+# ============================================================================
+
+def _prompt_text(contents) -> str:
+    """The latest user turn of a Gemini `contents` payload."""
+    if isinstance(contents, str):
+        return contents
+    for turn in reversed(contents):
+        if turn.get("role", "user") == "user":
+            return " ".join(str(p) for p in turn.get("parts", []))
+    return ""
+
+
+def _tokens(text: str) -> int:
+    return len(text) // 4 + 1
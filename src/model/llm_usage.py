@@ -0,0 +1,121 @@
+"""Per-command LLM usage accounting: calls, tokens, latency histogram, errors, cache hits."""
+
+from __future__ import annotations
+
+import bisect
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from .metrics import LatencyTracker
+from .model import Database
+
+# Upper bounds (ms) of the latency histogram buckets persisted with each rollup.
+# Fixed buckets let hourly rows be merged and still yield percentiles.
+LATENCY_BUCKETS_MS: List[int] = [100, 250, 500, 750, 1000, 1500, 2000, 3000, 5000, 8000, 13000, 20000, 30000]
+
+
+class CommandUsage:
+    """Counters for one command since the last flush."""
+
+    __slots__ = ("calls", "errors", "cache_hits", "prompt_tokens", "response_tokens",
+                 "latency_ms_total", "histogram")
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self.calls = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.prompt_tokens = 0
+        self.response_tokens = 0
+        self.latency_ms_total = 0.0
+        self.histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    @property
+    def empty(self) -> bool:
+        return not (self.calls or self.errors or self.cache_hits)
+
+
+class LLMUsageTracker:
+    """Collects usage per command tag in memory and rolls it up into hourly rows.
+
+    `record_call` / `record_error` are fed by `LLMService`; callers that answer
+    from a cache report that with `record_cache_hit`. `flush` adds the deltas
+    since the previous flush to the `llm_usage_rollups` table.
+    """
+
+    def __init__(self, db: Optional[Database] = None) -> None:
+        self.db = db
+        self._pending: Dict[str, CommandUsage] = {}
+        # Lifetime latency windows for !perfstats; not reset on flush.
+        self._latency: Dict[str, LatencyTracker] = {}
+
+    def _usage(self, tag: str) -> CommandUsage:
+        usage = self._pending.get(tag)
+        if usage is None:
+            usage = self._pending[tag] = CommandUsage()
+        return usage
+
+    def record_call(self, tag: str, seconds: float, prompt_tokens: int = 0, response_tokens: int = 0) -> None:
+        usage = self._usage(tag)
+        usage.calls += 1
+        usage.prompt_tokens += prompt_tokens
+        usage.response_tokens += response_tokens
+
+        ms = seconds * 1000
+        usage.latency_ms_total += ms
+        usage.histogram[bisect.bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self._latency.setdefault(tag, LatencyTracker(window=512)).record(seconds)
+
+    def record_error(self, tag: str) -> None:
+        self._usage(tag).errors += 1
+
+    def record_cache_hit(self, tag: str) -> None:
+        self._usage(tag).cache_hits += 1
+
+    def flush(self) -> int:
+        """Add pending counters to the current hour's rollup rows. Returns rows touched."""
+        if not self.db:
+            return 0
+
+        hour = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+        written = 0
+        for tag, usage in self._pending.items():
+            if usage.empty:
+                continue
+            self.db.add_llm_usage(
+                hour,
+                tag,
+                calls=usage.calls,
+                errors=usage.errors,
+                cache_hits=usage.cache_hits,
+                prompt_tokens=usage.prompt_tokens,
+                response_tokens=usage.response_tokens,
+                latency_ms_total=usage.latency_ms_total,
+                histogram=usage.histogram,
+            )
+            usage.reset()
+            written += 1
+        return written
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        """Live latency percentiles (seconds) per command since startup."""
+        return {tag: tracker.summary((50, 95)) for tag, tracker in sorted(self._latency.items())}
+
+
+def histogram_percentile(histogram: List[int], pct: float) -> float:
+    """Upper bound (ms) of the bucket holding the `pct` percentile; 0.0 when empty.
+
+    The overflow bucket reports the largest bound, i.e. "at least this slow".
+    """
+    total = sum(histogram)
+    if not total:
+        return 0.0
+    rank = pct / 100 * total
+    seen = 0
+    for i, count in enumerate(histogram):
+        seen += count
+        if seen >= rank:
+            break
+    return float(LATENCY_BUCKETS_MS[min(i, len(LATENCY_BUCKETS_MS) - 1)])
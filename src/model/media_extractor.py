@@ -0,0 +1,359 @@
+"""yt-dlp extraction in worker processes, scheduled fairly across guilds."""
+
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Deque, Dict, Optional, Tuple
+
+import yt_dlp
+from yt_dlp.cookies import YoutubeDLCookieJar, extract_cookies_from_browser
+
+from logger import get_logger
+
+from .metrics import LatencyTracker
+
+log = get_logger(__name__)
+
+RequestKey = Tuple[int, int]  # (guild_id, requester_id)
+
+# YouTube DL options for audio extraction
+YTDL_OPTIONS = {
+    'format': 'bestaudio/best',
+    'extractaudio': True,
+    'audioformat': 'mp3',
+    'outtmpl': '%(extractor)s-%(id)s-%(title)s.%(ext)s',
+    'restrictfilenames': True,
+    'noplaylist': True,
+    'nocheckcertificate': True,
+    'ignoreerrors': False,
+    'logtostderr': False,
+    'quiet': True,
+    'no_warnings': True,
+    'default_search': 'ytsearch',
+    'source_address': '0.0.0.0',
+    'socket_timeout': 15,  # so a stalled request frees its extraction worker
+    # Add headers to avoid bot detection
+    'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'referer': 'https://www.youtube.com/',
+    # Age gate bypass
+    'age_limit': None,
+    # Cookies come from MediaExtractor's shared jar, not from the browser per instance
+    # Additional options to avoid detection
+    'extractor_args': {
+        'youtube': {
+            'skip': ['hls', 'dash'],  # Skip DASH and HLS streams
+            'player_skip': ['webpage', 'configs'],
+            'player_client': ['android', 'web'],  # Try multiple clients
+        }
+    },
+}
+
+# Fallback when YouTube's bot detection trips: search results only, no full extraction
+YTDL_FLAT_OPTIONS = {
+    'format': 'bestaudio/best',
+    'quiet': True,
+    'no_warnings': True,
+    'default_search': 'ytsearch',
+    'extract_flat': True,  # Don't extract full info, just search results
+    'socket_timeout': 15,
+}
+
+
+PROFILES = {"default": YTDL_OPTIONS, "flat": YTDL_FLAT_OPTIONS}
+
+
+class ExtractionCancelled(Exception):
+    """A queued extraction was dropped before it ran (superseded, or its guild's queue overflowed)."""
+
+    def __init__(self, message: str, superseded: bool = False) -> None:
+        super().__init__(message)
+        self.superseded = superseded
+
+
+class _Job:
+    __slots__ = ("guild_id", "key", "profile", "query", "future", "started")
+
+    def __init__(self, guild_id: int, key: RequestKey, profile: str, query: str, future: asyncio.Future) -> None:
+        self.guild_id = guild_id
+        self.key = key
+        self.profile = profile
+        self.query = query
+        self.future = future
+        self.started = False
+
+
+class MediaExtractor:
+    """Runs `YoutubeDL.extract_info` in a small process pool.
+
+    Extraction is mostly pure-Python parsing, so in a thread it holds the GIL
+    and stalls the gateway loop; in worker processes it only costs the bot a
+    pickle round trip. At most `workers` extractions run at once. Waiting
+    requests are queued per guild and started round-robin, so a guild
+    spamming `!play` waits behind its own requests rather than everyone's.
+
+    A new request from the same member in the same guild drops their older
+    one if it hasn't started, and a guild keeps at most `max_pending_per_guild`
+    queued requests (the oldest is dropped); dropped callers get
+    `ExtractionCancelled`. Callers give up with `asyncio.TimeoutError` after
+    `timeout` seconds; a worker still busy with an abandoned request keeps
+    its slot until yt-dlp returns, bounded by its own `socket_timeout`.
+
+    `profiles` maps a name to YoutubeDL options; requests pick one by name.
+    Each worker builds one YoutubeDL per profile when it starts and reuses it
+    for every request. Browser cookies are read once per `refresh_cookies`
+    into `cookie_file`; every instance in a worker shares one jar loaded from
+    that file, reloaded when the file changes.
+
+    Workers are forked, so call `start` before the bot's event loop and its
+    threads are running; a pool rebuilt after a worker crash is forked from
+    wherever the bot is by then.
+    """
+
+    def __init__(
+        self,
+        profiles: Optional[Dict[str, dict]] = None,
+        workers: int = 2,
+        timeout: float = 30.0,
+        max_pending_per_guild: int = 3,
+        cookie_browser: Optional[str] = None,
+        cookie_file: Optional[str] = None,
+    ) -> None:
+        self.profiles = profiles if profiles is not None else PROFILES
+        self.workers = workers
+        self.timeout = timeout
+        self.max_pending_per_guild = max_pending_per_guild
+        self.cookie_browser = cookie_browser
+        self.cookie_file = cookie_file
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._queues: "OrderedDict[int, Deque[_Job]]" = OrderedDict()
+        self._latest: Dict[RequestKey, _Job] = {}
+        self._running = 0
+
+        self.latency = LatencyTracker()
+        self.completed = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.superseded = 0
+        self.overflowed = 0
+        self.cookies = 0
+        self.cookie_refreshes = 0
+        self.cookie_errors = 0
+
+    async def extract(self, query: str, guild_id: int, requester_id: int = 0, profile: str = "default") -> dict:
+        """`extract_info(query, download=False)` with the named profile, as a plain dict."""
+        loop = asyncio.get_running_loop()
+        key = (guild_id, requester_id)
+        job = _Job(guild_id, key, profile, query, loop.create_future())
+
+        stale = self._latest.get(key)
+        if requester_id and stale and not stale.started and not stale.future.done():
+            stale.future.set_exception(ExtractionCancelled("superseded by a newer request", superseded=True))
+            self.superseded += 1
+        self._latest[key] = job
+
+        queue = self._queues.setdefault(guild_id, deque())
+        queue.append(job)
+        while len(queue) > self.max_pending_per_guild:
+            dropped = queue.popleft()
+            if not dropped.future.done():
+                dropped.future.set_exception(ExtractionCancelled("too many requests queued for this server"))
+                self.overflowed += 1
+        self._pump()
+
+        started = loop.time()
+        try:
+            return await asyncio.wait_for(asyncio.shield(job.future), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            log.warning("Extraction timed out after %.0fs: %s", self.timeout, query)
+            raise
+        finally:
+            self.latency.record(loop.time() - started)
+            if self._latest.get(key) is job:
+                del self._latest[key]
+            if not job.future.done():
+                job.future.cancel()  # skipped if still queued; result dropped if running
+
+    def start(self) -> None:
+        """Fork the workers now rather than on the first request."""
+        self._pool().submit(_ping).result()
+
+    def close(self) -> None:
+        for queue in self._queues.values():
+            for job in queue:
+                if not job.future.done():
+                    job.future.cancel()
+        self._queues.clear()
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    # ----------------------------------------------------------------- cookies
+
+    def refresh_cookies(self) -> bool:
+        """Export the browser's cookies to `cookie_file` for the workers. Blocking; False on failure."""
+        if not self.cookie_browser or not self.cookie_file:
+            return False
+        try:
+            jar = extract_cookies_from_browser(self.cookie_browser)
+            os.makedirs(os.path.dirname(self.cookie_file) or ".", exist_ok=True)
+            # Workers reload on mtime, so swap in a complete file rather than write in place
+            tmp_path = self.cookie_file + ".tmp"
+            jar.save(tmp_path)
+            os.replace(tmp_path, self.cookie_file)
+        except Exception as e:
+            self.cookie_errors += 1
+            log.warning("Could not export %s cookies for yt-dlp: %s", self.cookie_browser, e)
+            return False
+        self.cookies = len(jar)
+        self.cookie_refreshes += 1
+        log.info("Exported %s %s cookies for yt-dlp", self.cookies, self.cookie_browser)
+        return True
+
+    # -------------------------------------------------------------- scheduling
+
+    def _pump(self) -> None:
+        """Start queued jobs, one guild at a time in turn, while slots are free."""
+        while self._running < self.workers and self._queues:
+            guild_id, queue = next(iter(self._queues.items()))
+            job = queue.popleft()
+            if queue:
+                self._queues.move_to_end(guild_id)
+            else:
+                del self._queues[guild_id]
+            if job.future.done():
+                continue  # superseded, dropped or abandoned while waiting
+            self._start(job)
+
+    def _start(self, job: _Job) -> None:
+        job.started = True
+        try:
+            try:
+                work = self._pool().submit(_extract, job.profile, job.query)
+            except BrokenProcessPool:
+                self._executor = None
+                work = self._pool().submit(_extract, job.profile, job.query)
+        except Exception as e:
+            # Can't even start a fresh pool; fail this job now rather than leave it to time out
+            log.error("Could not start extraction: %s", e)
+            self._executor = None
+            self.errors += 1
+            job.future.set_exception(e)
+            return
+        self._running += 1
+        work.add_done_callback(lambda f: self._hand_back(job, f))
+
+    def _hand_back(self, job: _Job, work: Future) -> None:
+        """Executor thread -> loop: report a finished extraction."""
+        try:
+            job.future.get_loop().call_soon_threadsafe(self._finished, job, work)
+        except RuntimeError:
+            pass  # loop already closed during shutdown; nobody is waiting
+
+    def _finished(self, job: _Job, work: Future) -> None:
+        self._running -= 1
+        error = None if work.cancelled() else work.exception()
+        if isinstance(error, BrokenProcessPool):
+            log.error("Extraction worker died; restarting the pool")
+            self._executor = None
+
+        if not job.future.done():
+            if work.cancelled():
+                job.future.set_exception(ExtractionCancelled("extractor shut down"))
+            elif error is not None:
+                self.errors += 1
+                job.future.set_exception(error)
+            else:
+                self.completed += 1
+                job.future.set_result(work.result())
+        self._pump()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # fork rather than spawn: a spawned worker re-imports bot.py and
+            # would build every service the bot builds at import time
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=_init_worker,
+                initargs=(self.profiles, self.cookie_file),
+            )
+        return self._executor
+
+    # ----------------------------------------------------------------- metrics
+
+    def get_stats(self) -> Dict[str, float]:
+        latency = self.latency.summary((50, 95))
+        return {
+            "queued": sum(len(q) for q in self._queues.values()),
+            "guilds_waiting": len(self._queues),
+            "running": self._running,
+            "workers": self.workers,
+            "completed": self.completed,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "superseded": self.superseded,
+            "overflowed": self.overflowed,
+            "cookies": self.cookies,
+            "cookie_refreshes": self.cookie_refreshes,
+            "cookie_errors": self.cookie_errors,
+            "p50": latency["p50"],
+            "p95": latency["p95"],
+        }
+
+
+# ============================================================================
+# Worker process
+# ============================================================================
+
+_instances: Dict[str, yt_dlp.YoutubeDL] = {}
+_cookies: Optional[YoutubeDLCookieJar] = None
+_cookies_mtime = 0.0
+
+
+def _init_worker(profiles: Dict[str, dict], cookie_file: Optional[str]) -> None:
+    global _cookies
+    if cookie_file:
+        _cookies = YoutubeDLCookieJar(cookie_file)
+        _reload_cookies()
+    for name, options in profiles.items():
+        ytdl = yt_dlp.YoutubeDL(options)
+        if _cookies is not None:
+            ytdl.cookiejar = _cookies  # before first use, so its request handlers get this jar
+        _instances[name] = ytdl
+
+
+def _reload_cookies() -> None:
+    """Reload the shared jar if the exported cookie file changed since the last load."""
+    global _cookies_mtime
+    try:
+        mtime = os.stat(_cookies.filename).st_mtime
+    except OSError:
+        return
+    if mtime == _cookies_mtime:
+        return
+    try:
+        _cookies.clear()
+        _cookies.load()
+    except Exception as e:
+        log.warning("Could not load yt-dlp cookies from %s: %s", _cookies.filename, e)
+    _cookies_mtime = mtime
+
+
+def _ping() -> None:
+    pass
+
+
+def _extract(profile: str, query: str) -> dict:
+    if _cookies is not None:
+        _reload_cookies()
+    ytdl = _instances[profile]
+    info = ytdl.extract_info(query, download=False)
+    # Only plain data crosses back to the bot process
+    return ytdl.sanitize_info(info)
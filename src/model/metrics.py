@@ -0,0 +1,47 @@
+"""Small in-process metric primitives shared by the bot's services."""
+
+from __future__ import annotations
+
+import math
+from collections import deque
+from typing import Deque, Dict, Iterable, List
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list. Returns 0.0 when empty."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+class LatencyTracker:
+    """Rolling window of duration samples (seconds) with percentile summaries."""
+
+    def __init__(self, window: int = 1024) -> None:
+        self._samples: Deque[float] = deque(maxlen=window)
+        self.count = 0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+        self.count += 1
+        if seconds > self.max:
+            self.max = seconds
+
+    def extend(self, samples: Iterable[float]) -> None:
+        for s in samples:
+            self.record(s)
+
+    def summary(self, percentiles: Iterable[float] = (50, 95, 99)) -> Dict[str, float]:
+        """Return {"count", "max", "p50", "p95", ...} over the current window."""
+        ordered = sorted(self._samples)
+        data: Dict[str, float] = {"count": self.count, "max": self.max}
+        for pct in percentiles:
+            data[f"p{pct:g}"] = percentile(ordered, pct)
+        return data
+
+    def reset(self) -> None:
+        self._samples.clear()
+        self.count = 0
+        self.max = 0.0
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import json
 import os
 from contextlib import contextmanager
 from datetime import datetime, timedelta
@@ -238,6 +239,80 @@ class TriviaStats(Base):
     last_updated = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
 
+class TriviaQuestion(Base):
+    __tablename__ = "trivia_questions"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    text_hash = Column(String(40), nullable=False, unique=True)  # of the normalized question text
+    difficulty = Column(String(20), nullable=False)
+    genre = Column(String(100), nullable=False)  # normalized, as requested
+
+    question = Column(Text, nullable=False)
+    options = Column(Text, nullable=False)  # JSON list of four strings
+    answer = Column(String(1), nullable=False)
+    explanation = Column(Text, nullable=True)
+    category = Column(String(100), nullable=True)
+    hint = Column(Text, nullable=True)
+
+    times_served = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_served = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_trivia_questions_difficulty_genre", "difficulty", "genre"),
+    )
+
+
+class TriviaQuestionView(Base):
+    __tablename__ = "trivia_question_views"
+
+    user_id = Column(BigInteger, primary_key=True)
+    question_id = Column(Integer, primary_key=True)
+    seen_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("ix_trivia_question_views_seen_at", "seen_at"),
+    )
+
+
+class ConversationHistory(Base):
+    __tablename__ = "conversation_history"
+
+    user_id = Column(BigInteger, primary_key=True)
+    turns = Column(Text, nullable=False)  # JSON list of Gemini content turns
+    summary = Column(Text, nullable=True)  # rolling summary of turns no longer kept
+    last_used = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class GameSessionSnapshot(Base):
+    __tablename__ = "game_session_snapshots"
+
+    game = Column(String(30), primary_key=True)
+    user_id = Column(BigInteger, primary_key=True)
+    data = Column(Text, nullable=False)  # JSON from the session's to_dict()
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class LLMUsageRollup(Base):
+    __tablename__ = "llm_usage_rollups"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    hour = Column(DateTime, nullable=False)
+    command = Column(String(50), nullable=False)
+
+    calls = Column(Integer, default=0, nullable=False)
+    errors = Column(Integer, default=0, nullable=False)
+    cache_hits = Column(Integer, default=0, nullable=False)
+    prompt_tokens = Column(BigInteger, default=0, nullable=False)
+    response_tokens = Column(BigInteger, default=0, nullable=False)
+    latency_ms_total = Column(Float, default=0.0, nullable=False)
+    latency_histogram = Column(Text, nullable=False)  # JSON bucket counts, see model.llm_usage
+
+    __table_args__ = (
+        UniqueConstraint("hour", "command", name="uq_llm_usage_hour_command"),
+    )
+
+
 # ============================================================================
 # Constants
 # ============================================================================
@@ -525,6 +600,129 @@ class Database:
                 for r in rows
             }
 
+    # ---------------------------------------------------- conversation history
+
+    def save_conversation(
+        self,
+        user_id: int,
+        turns: str,
+        last_used: datetime,
+        summary: Optional[str] = None,
+    ) -> None:
+        with self.session_scope() as s:
+            row = s.query(ConversationHistory).filter_by(user_id=user_id).first()
+            if row:
+                row.turns = turns
+                row.last_used = last_used
+                row.summary = summary
+            else:
+                s.add(ConversationHistory(user_id=user_id, turns=turns, last_used=last_used, summary=summary))
+
+    def get_conversation(self, user_id: int) -> Optional[Dict]:
+        with self.session_scope(commit=False) as s:
+            row = s.query(ConversationHistory).filter_by(user_id=user_id).first()
+            if not row:
+                return None
+            return {"turns": row.turns, "last_used": row.last_used, "summary": row.summary}
+
+    def delete_conversation(self, user_id: int) -> None:
+        with self.session_scope() as s:
+            s.query(ConversationHistory).filter_by(user_id=user_id).delete()
+
+    def delete_conversations_before(self, cutoff: datetime) -> None:
+        with self.session_scope() as s:
+            s.query(ConversationHistory).filter(ConversationHistory.last_used < cutoff).delete()
+
+    # ------------------------------------------------------- game sessions
+
+    def replace_game_sessions(self, game: str, sessions: Dict[int, Tuple[str, datetime]]) -> None:
+        """Make `sessions` (user id -> (JSON, updated_at)) the only snapshots stored for `game`."""
+        with self.session_scope() as s:
+            s.query(GameSessionSnapshot).filter_by(game=game).delete()
+            s.add_all(
+                GameSessionSnapshot(game=game, user_id=user_id, data=data, updated_at=updated_at)
+                for user_id, (data, updated_at) in sessions.items()
+            )
+
+    def get_game_sessions(self, game: str, since: datetime) -> Dict[int, Tuple[str, datetime]]:
+        with self.session_scope(commit=False) as s:
+            rows = s.query(GameSessionSnapshot).filter(
+                GameSessionSnapshot.game == game,
+                GameSessionSnapshot.updated_at >= since,
+            )
+            return {r.user_id: (r.data, r.updated_at) for r in rows}
+
+    def delete_game_session(self, game: str, user_id: int) -> None:
+        with self.session_scope() as s:
+            s.query(GameSessionSnapshot).filter_by(game=game, user_id=user_id).delete()
+
+    # --------------------------------------------------------------- llm usage
+
+    def add_llm_usage(
+        self,
+        hour: datetime,
+        command: str,
+        calls: int,
+        errors: int,
+        cache_hits: int,
+        prompt_tokens: int,
+        response_tokens: int,
+        latency_ms_total: float,
+        histogram: List[int],
+    ) -> None:
+        with self.session_scope() as s:
+            row = s.query(LLMUsageRollup).filter_by(hour=hour, command=command).first()
+            if not row:
+                s.add(LLMUsageRollup(
+                    hour=hour,
+                    command=command,
+                    calls=calls,
+                    errors=errors,
+                    cache_hits=cache_hits,
+                    prompt_tokens=prompt_tokens,
+                    response_tokens=response_tokens,
+                    latency_ms_total=latency_ms_total,
+                    latency_histogram=json.dumps(histogram),
+                ))
+                return
+            row.calls += calls
+            row.errors += errors
+            row.cache_hits += cache_hits
+            row.prompt_tokens += prompt_tokens
+            row.response_tokens += response_tokens
+            row.latency_ms_total += latency_ms_total
+            merged = json.loads(row.latency_histogram)
+            row.latency_histogram = json.dumps([a + b for a, b in zip(merged, histogram)])
+
+    def get_llm_usage(self, since: datetime) -> List[Dict]:
+        """Rollup rows since `since`, summed per command, histograms merged."""
+        totals: Dict[str, Dict] = {}
+        with self.session_scope(commit=False) as s:
+            rows = s.query(LLMUsageRollup).filter(LLMUsageRollup.hour >= since).all()
+            for r in rows:
+                entry = totals.setdefault(r.command, {
+                    "command": r.command,
+                    "calls": 0,
+                    "errors": 0,
+                    "cache_hits": 0,
+                    "prompt_tokens": 0,
+                    "response_tokens": 0,
+                    "latency_ms_total": 0.0,
+                    "histogram": None,
+                })
+                entry["calls"] += r.calls
+                entry["errors"] += r.errors
+                entry["cache_hits"] += r.cache_hits
+                entry["prompt_tokens"] += r.prompt_tokens
+                entry["response_tokens"] += r.response_tokens
+                entry["latency_ms_total"] += r.latency_ms_total
+                histogram = json.loads(r.latency_histogram)
+                entry["histogram"] = (
+                    histogram if entry["histogram"] is None
+                    else [a + b for a, b in zip(entry["histogram"], histogram)]
+                )
+        return sorted(totals.values(), key=lambda e: e["calls"], reverse=True)
+
     # ------------------------------------------------------------- music stats
 
     def log_music_play(
@@ -729,40 +927,120 @@ class Database:
                 return [(r.user_id, r.best_win_streak) for r in rows]
             return [(r.user_id, r.highest_score or 0) for r in rows]
 
-    # ------------------------------------------------------------ trivia stats
+    # ------------------------------------------------------------- trivia bank
 
-    def log_trivia_answer(self, user_id: int, correct: bool, difficulty: str, points: int = 0) -> None:
+    def add_trivia_question(self, text_hash: str, difficulty: str, genre: str, data: Dict) -> Tuple[int, bool]:
+        """Store a question unless its hash is known. Returns (id, whether it was new)."""
         with self.session_scope() as s:
-            row = s.query(TriviaStats).filter_by(user_id=user_id).first()
-            now = datetime.utcnow()
+            existing = s.query(TriviaQuestion.id).filter_by(text_hash=text_hash).first()
+            if existing:
+                return existing.id, False
 
-            if row is None:
-                row = TriviaStats(
-                    user_id=user_id,
-                    total_questions=1,
-                    correct_answers=1 if correct else 0,
-                    wrong_answers=0 if correct else 1,
-                    total_points=points,
-                    current_streak=1 if correct else 0,
-                    best_streak=1 if correct else 0,
-                    last_played=now,
+            row = TriviaQuestion(
+                text_hash=text_hash,
+                difficulty=difficulty,
+                genre=genre,
+                question=data["question"],
+                options=json.dumps(data["options"]),
+                answer=data["answer"],
+                explanation=data.get("explanation"),
+                category=data.get("category"),
+                hint=data.get("hint"),
+            )
+            s.add(row)
+            s.flush()
+            return row.id, True
+
+    def draw_trivia_questions(
+        self,
+        difficulty: str,
+        genre: str,
+        user_ids: List[int],
+        limit: int,
+        seen_since: datetime,
+    ) -> List[Dict]:
+        """Least-served questions none of `user_ids` has seen since `seen_since`; marks them seen."""
+        with self.session_scope() as s:
+            seen = s.query(TriviaQuestionView.question_id).filter(
+                TriviaQuestionView.user_id.in_(user_ids),
+                TriviaQuestionView.seen_at >= seen_since,
+            )
+            rows = (
+                s.query(TriviaQuestion)
+                .filter_by(difficulty=difficulty, genre=genre)
+                .filter(~TriviaQuestion.id.in_(seen))
+                .order_by(TriviaQuestion.times_served, func.random())
+                .limit(limit)
+                .all()
+            )
+            _mark_trivia_served(s, rows, user_ids)
+            return [_trivia_question_to_dict(r) for r in rows]
+
+    def claim_trivia_questions(self, question_ids: List[int], user_ids: List[int], seen_since: datetime) -> List[int]:
+        """Mark the given questions seen, skipping any a user saw since `seen_since`. Returns ids kept."""
+        with self.session_scope() as s:
+            seen = {
+                v.question_id
+                for v in s.query(TriviaQuestionView.question_id).filter(
+                    TriviaQuestionView.user_id.in_(user_ids),
+                    TriviaQuestionView.question_id.in_(question_ids),
+                    TriviaQuestionView.seen_at >= seen_since,
                 )
-                _apply_trivia_difficulty(row, difficulty, correct)
-                s.add(row)
-                return
+            }
+            rows = s.query(TriviaQuestion).filter(TriviaQuestion.id.in_(set(question_ids) - seen)).all()
+            _mark_trivia_served(s, rows, user_ids)
+            kept = {r.id for r in rows}
+            return [qid for qid in question_ids if qid in kept]
+
+    def record_trivia_views(self, question_ids: List[int], user_ids: List[int]) -> None:
+        """Mark the given questions seen by `user_ids` now, without counting another serve."""
+        if not question_ids or not user_ids:
+            return
+        with self.session_scope() as s:
+            _record_trivia_views(s, question_ids, user_ids, datetime.utcnow())
 
-            row.total_questions += 1
-            if correct:
-                row.correct_answers += 1
-                row.current_streak += 1
-                row.best_streak = max(row.best_streak, row.current_streak)
-            else:
-                row.wrong_answers += 1
-                row.current_streak = 0
+    def count_unseen_trivia_questions(self, difficulty: str, genre: str, user_id: int, seen_since: datetime) -> int:
+        with self.session_scope(commit=False) as s:
+            seen = s.query(TriviaQuestionView.question_id).filter(
+                TriviaQuestionView.user_id == user_id,
+                TriviaQuestionView.seen_at >= seen_since,
+            )
+            return (
+                s.query(func.count(TriviaQuestion.id))
+                .filter_by(difficulty=difficulty, genre=genre)
+                .filter(~TriviaQuestion.id.in_(seen))
+                .scalar()
+            ) or 0
+
+    def delete_trivia_views_before(self, cutoff: datetime) -> None:
+        with self.session_scope() as s:
+            s.query(TriviaQuestionView).filter(TriviaQuestionView.seen_at < cutoff).delete()
+
+    # ------------------------------------------------------------ trivia stats
+
+    def log_trivia_answer(self, user_id: int, correct: bool, difficulty: str, points: int = 0) -> None:
+        with self.session_scope() as s:
+            row = s.query(TriviaStats).filter_by(user_id=user_id).first()
+            _record_trivia_answer(s, row, user_id, correct, difficulty, points)
 
-            row.total_points += points
-            row.last_played = now
-            _apply_trivia_difficulty(row, difficulty, correct)
+    def log_trivia_round(self, difficulty: str, results: List[Tuple[int, bool, int]]) -> None:
+        """Record every (user_id, correct, points) of a multiplayer round and award the points, in one transaction."""
+        if not results:
+            return
+        user_ids = [user_id for user_id, _, _ in results]
+        with self.session_scope() as s:
+            stats = {r.user_id: r for r in s.query(TriviaStats).filter(TriviaStats.user_id.in_(user_ids))}
+            balances = {r.user_id: r for r in s.query(UserPoints).filter(UserPoints.user_id.in_(user_ids))}
+
+            for user_id, correct, points in results:
+                _record_trivia_answer(s, stats.get(user_id), user_id, correct, difficulty, points)
+                if not points:
+                    continue
+                balance = balances.get(user_id)
+                if balance:
+                    balance.points += points
+                else:
+                    s.add(UserPoints(user_id=user_id, points=points, message_count=1))
 
     def log_trivia_competition(
         self,
@@ -853,6 +1131,87 @@ def _apply_trivia_difficulty(row: TriviaStats, difficulty: str, correct: bool) -
         setattr(row, correct_field, getattr(row, correct_field) + 1)
 
 
+def _record_trivia_answer(
+    s: Session,
+    row: Optional[TriviaStats],
+    user_id: int,
+    correct: bool,
+    difficulty: str,
+    points: int,
+) -> None:
+    now = datetime.utcnow()
+    if row is None:
+        # Column defaults only apply at flush, so the per-difficulty counters
+        # must start at 0 here for _apply_trivia_difficulty to add to them
+        row = TriviaStats(
+            user_id=user_id,
+            **{field: 0 for fields in _DIFFICULTY_FIELDS.values() for field in fields},
+            total_questions=1,
+            correct_answers=1 if correct else 0,
+            wrong_answers=0 if correct else 1,
+            total_points=points,
+            current_streak=1 if correct else 0,
+            best_streak=1 if correct else 0,
+            last_played=now,
+        )
+        _apply_trivia_difficulty(row, difficulty, correct)
+        s.add(row)
+        return
+
+    row.total_questions += 1
+    if correct:
+        row.correct_answers += 1
+        row.current_streak += 1
+        row.best_streak = max(row.best_streak, row.current_streak)
+    else:
+        row.wrong_answers += 1
+        row.current_streak = 0
+
+    row.total_points += points
+    row.last_played = now
+    _apply_trivia_difficulty(row, difficulty, correct)
+
+
+def _mark_trivia_served(s: Session, rows: List[TriviaQuestion], user_ids: List[int]) -> None:
+    if not rows:
+        return
+    now = datetime.utcnow()
+    for row in rows:
+        row.times_served += 1
+        row.last_served = now
+    _record_trivia_views(s, [r.id for r in rows], user_ids, now)
+
+
+def _record_trivia_views(s: Session, ids: List[int], user_ids: List[int], now: datetime) -> None:
+    views = {
+        (v.user_id, v.question_id): v
+        for v in s.query(TriviaQuestionView).filter(
+            TriviaQuestionView.user_id.in_(user_ids),
+            TriviaQuestionView.question_id.in_(ids),
+        )
+    }
+    for user_id in user_ids:
+        for question_id in ids:
+            view = views.get((user_id, question_id))
+            if view:
+                view.seen_at = now
+            else:
+                s.add(TriviaQuestionView(user_id=user_id, question_id=question_id, seen_at=now))
+
+
+def _trivia_question_to_dict(row: TriviaQuestion) -> Dict:
+    return {
+        "id": row.id,
+        "question": row.question,
+        "options": json.loads(row.options),
+        "answer": row.answer,
+        "explanation": row.explanation or "",
+        "category": row.category or row.genre.title(),
+        "difficulty": row.difficulty,
+        "hint": row.hint or "",
+    }
+
+
 def _game_stats_to_dict(row: UserGameStats, include_type: bool = False) -> Dict:
     win_rate = (row.total_wins / row.total_played * 100) if row.total_played > 0 else 0
     data = {
@@ -2,34 +2,84 @@
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import json
-import os
-from typing import Dict, List, Tuple
-
-import google.generativeai as genai
-from dotenv import load_dotenv
+import re
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 from logger import get_logger
 
-load_dotenv()
-log = get_logger(__name__)
+from .cache import TTLCache
+from .llm import LLMError, LLMService, LLMTimeoutError, Priority
+from .metrics import LatencyTracker
+from .role_classifier import KeywordRoleClassifier
 
-_MODEL_NAME = "gemini-2.5-flash"
+log = get_logger(__name__)
 
 
 class RoleAssigner:
     """Analyze user introductions and map them to configured Discord role IDs."""
 
-    def __init__(self, roles_config_path: str = "config/roles.json") -> None:
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            raise ValueError("GEMINI_API_KEY not found in environment variables")
-
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel(_MODEL_NAME)
-
+    def __init__(
+        self,
+        llm: LLMService,
+        roles_config_path: str = "config/roles.json",
+        max_concurrency: int = 4,
+        timeout: float = 20.0,
+        max_retries: int = 2,
+        batch_size: int = 1,
+        batch_window: float = 2.0,
+        keywords_path: Optional[str] = "config/role_keywords.json",
+        local_match_threshold: float = 0.75,
+        local_confidence: float = 0.85,
+        local_max_words: int = 60,
+        cache_path: Optional[str] = None,
+        cache_size: int = 2048,
+        cache_ttl: float = 7 * 24 * 3600,
+    ) -> None:
+        self.llm = llm
         self.roles_config_path = roles_config_path
         self.role_mappings: Dict[str, int] = self._load_role_mappings()
+        self.roles_version = _mappings_version(self.role_mappings)
+
+        # Previous Gemini answers keyed by role-set version + normalized intro.
+        self.cache_path = cache_path
+        self.cache = TTLCache(max_size=cache_size, ttl=cache_ttl)
+        if cache_path:
+            self.cache.load(cache_path)
+
+        # Obvious intros ("I'm a developer and gamer") are answered locally.
+        self.classifier = KeywordRoleClassifier(
+            keywords_path,
+            match_threshold=local_match_threshold,
+            confidence_threshold=local_confidence,
+            max_words=local_max_words,
+        )
+        self.classifier.rebuild(self.role_mappings.keys())
+        self.local_decisions = 0
+        self.llm_decisions = 0
+
+        # Calls go through the shared LLM service at background priority; the
+        # local cap keeps an intro wave from taking every slot it has.
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._queued = 0
+        self._in_flight = 0
+        self.latency = LatencyTracker()
+        self.timeouts = 0
+        self.errors = 0
+
+        # Intros waiting to be classified together in one prompt (batch_size > 1).
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._batch_tasks: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.batched_intros = 0
 
     # ------------------------------------------------------------ mappings IO
 
@@ -46,6 +96,17 @@ class RoleAssigner:
 
     def reload_role_mappings(self) -> None:
         self.role_mappings = self._load_role_mappings()
+        self.classifier.rebuild(self.role_mappings.keys())
+
+        version = _mappings_version(self.role_mappings)
+        if version != self.roles_version:
+            self.roles_version = version
+            self.cache.clear()
+            log.info("Role set changed; cleared intro analysis cache")
+
+    def save_cache(self) -> None:
+        if self.cache_path:
+            self.cache.save(self.cache_path)
 
     # ----------------------------------------------------------- Gemini prompt
 
@@ -69,10 +130,39 @@ Return an empty array if no roles match.
 
 Example format: ["developer", "gamer", "tech enthusiast"]
 
+Your response:"""
+
+    def _build_batch_prompt(self, intros: List[str], available_roles: List[str]) -> str:
+        labelled = "\n\n".join(f'[{i}] "{text}"' for i, text in enumerate(intros, 1))
+        return f"""You are a helpful assistant that analyzes user introductions on a Discord server and suggests appropriate roles.
+
+Available roles:
+{', '.join(available_roles)}
+
+User introductions (each labelled with an id):
+{labelled}
+
+For each introduction, determine which roles are most appropriate for that user. Consider:
+- Their interests and hobbies
+- Their profession or skills
+- What they mention wanting to do or learn
+- Their background and experience
+
+Return ONLY a JSON object mapping every id to an array of role names. Use lowercase for role names.
+Use an empty array for an introduction when no roles match.
+
+Example format: {{"1": ["developer", "gamer"], "2": []}}
+
 Your response:"""
 
     async def analyze_intro(self, intro_text: str) -> List[str]:
-        """Ask Gemini which configured roles fit the intro. Returns validated role names."""
+        """Ask Gemini which configured roles fit the intro. Returns validated role names.
+
+        Repeated intros are served from the cache, and intros the local keyword
+        classifier is confident about never reach Gemini. With batching enabled
+        the rest are queued and classified together with any others that arrive
+        within `batch_window` seconds.
+        """
         if not intro_text or not intro_text.strip():
             return []
 
@@ -81,31 +171,77 @@ Your response:"""
             log.warning("No roles configured")
             return []
 
-        prompt = self._build_prompt(intro_text, available_roles)
-
-        try:
-            response = self.model.generate_content(prompt)
-        except Exception as e:
-            log.error("Gemini request failed: %s", e)
+        cache_key = f"{self.roles_version}:{_intro_hash(intro_text)}"
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            self.llm.usage.record_cache_hit("intro")
+            return list(cached)
+
+        local_roles, confidence = self.classifier.classify(intro_text)
+        if local_roles is not None:
+            self.local_decisions += 1
+            log.info("Assigned roles locally (confidence %.2f): %s", confidence, local_roles)
+            return local_roles
+        if not self.llm.available:
             return []
+        self.llm_decisions += 1
 
-        if not response or not response.text:
-            log.warning("Empty response from Gemini")
-            return []
+        if self.batch_size > 1:
+            roles = await self._enqueue_for_batch(intro_text)
+        else:
+            roles = await self._analyze_single(intro_text, available_roles)
 
-        response_text = response.text.strip()
-        start = response_text.find("[")
-        end = response_text.rfind("]")
-        if start == -1 or end == -1:
-            log.warning("No JSON array found in response: %s", response_text)
+        # None means the call failed; only cache real answers.
+        if roles is None:
             return []
-
-        try:
-            suggested = json.loads(response_text[start:end + 1])
-        except json.JSONDecodeError as e:
-            log.error("Error parsing Gemini response as JSON: %s | response=%s", e, response_text)
-            return []
-
+        # Skip caching if the role set was reloaded while this call was in flight.
+        if cache_key.startswith(f"{self.roles_version}:"):
+            self.cache.set(cache_key, roles)
+        return roles
+
+    async def _analyze_single(self, intro_text: str, available_roles: List[str]) -> Optional[List[str]]:
+        response_text = await self._generate(self._build_prompt(intro_text, available_roles))
+        if not response_text:
+            return None
+
+        suggested = _extract_json(response_text, "[", "]")
+        if not isinstance(suggested, list):
+            return None
+        return self._validate_roles(suggested, available_roles)
+
+    async def _analyze_batch(
+        self,
+        intros: List[str],
+        available_roles: List[str],
+    ) -> List[Optional[List[str]]]:
+        response_text = await self._generate(self._build_batch_prompt(intros, available_roles))
+        if not response_text:
+            return [None for _ in intros]
+
+        suggested = _extract_json(response_text, "{", "}")
+        if not isinstance(suggested, dict):
+            return [None for _ in intros]
+
+        results: List[Optional[List[str]]] = []
+        missing: List[int] = []
+        for i in range(len(intros)):
+            roles = suggested.get(str(i + 1))
+            if isinstance(roles, list):
+                results.append(self._validate_roles(roles, available_roles))
+            else:
+                results.append(None)
+                missing.append(i)
+
+        # The model occasionally drops an id; classify just those on their own.
+        if missing:
+            log.warning("Batch response missing %s of %s intros; retrying individually", len(missing), len(intros))
+            retried = await asyncio.gather(*(self._analyze_single(intros[i], available_roles) for i in missing))
+            for i, roles in zip(missing, retried):
+                results[i] = roles
+        return results
+
+    @staticmethod
+    def _validate_roles(suggested: List, available_roles: List[str]) -> List[str]:
         valid: List[str] = []
         for role in suggested:
             lowered = str(role).lower().strip()
@@ -115,6 +251,102 @@ Your response:"""
                 log.warning("Suggested role '%s' not in available roles", role)
         return valid
 
+    # ----------------------------------------------------------------- batching
+
+    async def _enqueue_for_batch(self, intro_text: str) -> Optional[List[str]]:
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future = loop.create_future()
+        self._pending.append((intro_text, future))
+
+        if len(self._pending) >= self.batch_size:
+            self._flush_batch()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_window, self._flush_batch)
+
+        return await future
+
+    def _flush_batch(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        task = asyncio.get_running_loop().create_task(self._run_batch(batch))
+        self._batch_tasks.add(task)
+        task.add_done_callback(self._batch_tasks.discard)
+
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        intros = [text for text, _ in batch]
+        available_roles = list(self.role_mappings.keys())
+        try:
+            if len(intros) == 1:
+                results = [await self._analyze_single(intros[0], available_roles)]
+            else:
+                self.batches += 1
+                self.batched_intros += len(intros)
+                results = await self._analyze_batch(intros, available_roles)
+        except Exception as e:
+            log.error("Batched intro analysis failed: %s", e)
+            results = [None for _ in intros]
+
+        for (_, future), roles in zip(batch, results):
+            if not future.done():
+                future.set_result(roles)
+
+    async def _generate(self, prompt: str) -> Optional[str]:
+        """Call Gemini at background priority, at most `max_concurrency` intro calls at a time."""
+        self._queued += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._queued -= 1
+
+        self._in_flight += 1
+        started = time.monotonic()
+        try:
+            text = await self.llm.generate(
+                prompt,
+                priority=Priority.BACKGROUND,
+                timeout=self.timeout,
+                retries=self.max_retries,
+                tag="intro",
+            )
+            self.latency.record(time.monotonic() - started)
+            return text
+        except LLMTimeoutError as e:
+            self.timeouts += 1
+            log.warning("Gemini intro analysis timed out: %s", e)
+        except LLMError as e:
+            self.errors += 1
+            log.warning("Gemini intro analysis failed: %s", e)
+        finally:
+            self._in_flight -= 1
+            self._semaphore.release()
+        return None
+
+    def get_stats(self) -> Dict[str, float]:
+        """Queue depth, in-flight calls and latency percentiles (seconds) for intro analysis."""
+        latency = self.latency.summary((50, 95))
+        return {
+            "queued": self._queued,
+            "batching": len(self._pending),  # waiting for the batch window to close
+            "in_flight": self._in_flight,
+            "calls": latency["count"],
+            "p50": latency["p50"],
+            "p95": latency["p95"],
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "batches": self.batches,
+            "batched_intros": self.batched_intros,
+            "local_decisions": self.local_decisions,
+            "llm_decisions": self.llm_decisions,
+            "cache_hits": self.cache.hits,
+            "cache_hit_ratio": self.cache.hit_ratio,
+        }
+
     # ---------------------------------------------------------- public helpers
 
     def get_role_ids(self, role_names: List[str]) -> List[int]:
@@ -130,3 +362,34 @@ Your response:"""
     async def assign_roles_from_intro(self, intro_text: str) -> Tuple[List[str], List[int]]:
         role_names = await self.analyze_intro(intro_text)
         return role_names, self.get_role_ids(role_names)
+
+
+# ============================================================================
+# Helpers
+# ============================================================================
+
+def _mappings_version(role_mappings: Dict[str, int]) -> str:
+    """Short stable hash of the role set; part of every cache key."""
+    payload = json.dumps(role_mappings, sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:12]
+
+
+def _intro_hash(intro_text: str) -> str:
+    """Hash of the intro with case, punctuation and whitespace differences removed."""
+    normalized = " ".join(re.findall(r"\w+", intro_text.lower()))
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def _extract_json(text: str, open_char: str, close_char: str) -> Any:
+    """Parse the outermost `open_char`...`close_char` span of a model reply. Returns None on failure."""
+    text = text.strip()
+    start = text.find(open_char)
+    end = text.rfind(close_char)
+    if start == -1 or end == -1 or end < start:
+        log.warning("No JSON %s...%s found in response: %s", open_char, close_char, text)
+        return None
+    try:
+        return json.loads(text[start:end + 1])
+    except json.JSONDecodeError as e:
+        log.error("Error parsing Gemini response as JSON: %s | response=%s", e, text)
+        return None
@@ -0,0 +1,138 @@
+"""Local keyword/synonym pre-classifier for intro role assignment."""
+
+from __future__ import annotations
+
+import re
+from typing import Dict, Iterable, List, Optional, Pattern, Tuple
+
+from logger import get_logger
+from utils import load_json_config
+
+log = get_logger(__name__)
+
+# Match strengths: the role's own name, a configured strong synonym, a weak hint.
+_NAME_STRENGTH = 1.0
+_STRONG_STRENGTH = 0.9
+_WEAK_STRENGTH = 0.5
+
+# Qualifier words dropped when deriving weak hints from multi-word role names.
+_GENERIC_WORDS = frozenset({"fan", "enthusiast", "lover", "practitioner", "creator", "any"})
+
+_NEGATIONS = frozenset({"not", "no", "never", "don't", "dont", "isn't", "aren't", "hardly"})
+_NEGATION_WINDOW = 3
+
+# "I'm 25", "25 years old", "25yo" -- age roles need the LLM to bucket correctly.
+_AGE_PATTERN = re.compile(r"\b(?:i'?m|i am|age|aged)\s+\d{1,2}\b|\b\d{1,2}\s*(?:yo|y/o|years? old)\b")
+
+_TOKEN_PATTERN = re.compile(r"[\w'/+-]+")
+
+
+class KeywordRoleClassifier:
+    """Score an intro against configured role names and synonym lists.
+
+    Synonym config (JSON) maps role names to phrase lists::
+
+        {"developer": {"strong": ["software engineer", "coder"], "weak": ["tech"]}}
+
+    `classify` returns role names only when it is confident enough that the
+    LLM would add nothing; otherwise it returns None and the caller should
+    fall back to Gemini.
+    """
+
+    def __init__(
+        self,
+        keywords_path: str = "config/role_keywords.json",
+        match_threshold: float = 0.75,
+        confidence_threshold: float = 0.85,
+        max_words: int = 60,
+    ) -> None:
+        self.keywords_path = keywords_path
+        self.match_threshold = match_threshold
+        self.confidence_threshold = confidence_threshold
+        self.max_words = max_words
+
+        self._pattern: Optional[Pattern[str]] = None
+        # {phrase: [(role, strength), ...]}
+        self._phrases: Dict[str, List[Tuple[str, float]]] = {}
+
+    def rebuild(self, role_names: Iterable[str]) -> None:
+        """Recompile the phrase index for the current set of role names."""
+        synonyms = load_json_config(self.keywords_path) if self.keywords_path else {}
+        phrases: Dict[str, List[Tuple[str, float]]] = {}
+
+        def add(phrase: str, role: str, strength: float) -> None:
+            phrase = phrase.lower().strip()
+            if not phrase:
+                return
+            entries = phrases.setdefault(phrase, [])
+            for i, (existing_role, existing_strength) in enumerate(entries):
+                if existing_role == role:
+                    entries[i] = (role, max(strength, existing_strength))
+                    return
+            entries.append((role, strength))
+
+        for role in role_names:
+            role = role.lower()
+            add(role, role, _NAME_STRENGTH)
+
+            words = role.split()
+            if len(words) > 1:
+                for word in words:
+                    if word not in _GENERIC_WORDS:
+                        add(word, role, _WEAK_STRENGTH)
+
+            entry = synonyms.get(role, {})
+            for phrase in entry.get("strong", []):
+                add(phrase, role, _STRONG_STRENGTH)
+            for phrase in entry.get("weak", []):
+                add(phrase, role, _WEAK_STRENGTH)
+
+        self._phrases = phrases
+        ordered = sorted(phrases, key=len, reverse=True)
+        self._pattern = (
+            re.compile(r"(?<![\w])(?:" + "|".join(re.escape(p) for p in ordered) + r")s?(?![\w])")
+            if ordered else None
+        )
+
+    def classify(self, intro_text: str) -> Tuple[Optional[List[str]], float]:
+        """Return (role_names or None, confidence). None means "ask the LLM"."""
+        if self._pattern is None:
+            return None, 0.0
+
+        text = intro_text.lower()
+        if _AGE_PATTERN.search(text):
+            return None, 0.0
+
+        scores: Dict[str, float] = {}
+        uncertain = 0.0
+        for m in self._pattern.finditer(text):
+            phrase = m.group(0)
+            entries = self._phrases.get(phrase) or self._phrases.get(phrase[:-1], [])
+            negated = _is_negated(text, m.start())
+            for role, strength in entries:
+                if negated:
+                    uncertain += strength
+                elif strength > scores.get(role, 0.0):
+                    scores[role] = strength
+
+        accepted = [role for role, score in scores.items() if score >= self.match_threshold]
+        if not accepted:
+            return None, 0.0
+
+        certain = sum(scores[role] for role in accepted)
+        uncertain += sum(score for role, score in scores.items() if role not in accepted)
+        confidence = certain / (certain + uncertain)
+
+        # Long intros usually carry interests no keyword list anticipates.
+        words = len(_TOKEN_PATTERN.findall(text))
+        if words > self.max_words:
+            confidence *= self.max_words / words
+
+        if confidence < self.confidence_threshold:
+            return None, confidence
+        return accepted, confidence
+
+
+def _is_negated(text: str, offset: int) -> bool:
+    preceding = _TOKEN_PATTERN.findall(text[:offset])[-_NEGATION_WINDOW:]
+    return any(token in _NEGATIONS or token.endswith("n't") for token in preceding)
@@ -0,0 +1,172 @@
+"""Local near-duplicate lookup for cached AI answers (hashed char n-grams + cosine search)."""
+
+from __future__ import annotations
+
+import re
+import time
+import zlib
+from difflib import SequenceMatcher
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+
+from .metrics import LatencyTracker
+
+# Words that change the phrasing of a question but not what it asks about.
+_STOP_WORDS = frozenset({
+    "a", "an", "the", "is", "are", "was", "were", "be", "what", "whats", "who", "how", "why",
+    "do", "does", "did", "of", "to", "in", "on", "for", "about", "me", "please", "explain",
+    "describe", "tell", "define", "can", "you", "i", "it", "and", "or", "this", "that",
+})
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+[+#]*")  # keep "c++" and "c#" apart from "c"
+
+_WORD_WEIGHT = 2.0
+_NUMBER_WEIGHT = 6.0
+
+# Candidates above the threshold checked word by word before giving up
+_CANDIDATES = 5
+# How alike two words must be to count as one misspelled as the other
+_TYPO_MIN_LENGTH = 5
+_TYPO_RATIO = 0.85
+
+
+class SemanticIndex:
+    """Bounded matrix of hashed prompt vectors searched by cosine similarity.
+
+    Each entry maps a (namespace, text) pair to an exact-cache key, so answers
+    live in one place and this index only decides which cached answer a
+    differently worded question should reuse. When full, the oldest entry is
+    overwritten.
+
+    Similarity alone lets one extra word through ("tie a tie" vs "tie a bow
+    tie"), so a match must also use the same content words as the query,
+    allowing for plurals and misspellings of longer words.
+    """
+
+    def __init__(self, capacity: int = 1024, dim: int = 2048, threshold: float = 0.9) -> None:
+        self.capacity = capacity
+        self.dim = dim
+        self.threshold = threshold
+
+        self._matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self._namespaces = np.full(capacity, -1, dtype=np.int32)
+        self._keys: List[Optional[str]] = [None] * capacity
+        self._words: List[FrozenSet[str]] = [frozenset()] * capacity
+        self._slots: Dict[str, int] = {}
+        self._namespace_ids: Dict[str, int] = {}
+        self._next = 0
+
+        self.search_time = LatencyTracker()
+        self.lookups = 0
+        self.hits = 0
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def add(self, namespace: str, text: str, key: str) -> None:
+        words = _content_words(text)
+        vector = self._vectorize(words)
+        if vector is None:
+            return
+
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._next
+            self._next = (self._next + 1) % self.capacity
+            previous = self._keys[slot]
+            if previous is not None:
+                del self._slots[previous]
+            self._slots[key] = slot
+            self._keys[slot] = key
+
+        self._matrix[slot] = vector
+        self._words[slot] = frozenset(words)
+        self._namespaces[slot] = self._namespace_ids.setdefault(namespace, len(self._namespace_ids))
+
+    def lookup(self, namespace: str, text: str) -> Optional[str]:
+        """Key of the most similar entry in `namespace` at or above the threshold, else None."""
+        namespace_id = self._namespace_ids.get(namespace)
+        words = _content_words(text)
+        vector = self._vectorize(words)
+        if namespace_id is None or vector is None:
+            return None
+
+        started = time.perf_counter()
+        self.lookups += 1
+        scores = self._matrix @ vector
+        scores[self._namespaces != namespace_id] = -1.0
+        top = np.argpartition(-scores, min(_CANDIDATES, self.capacity) - 1)[:_CANDIDATES]
+        top = top[np.argsort(-scores[top])]
+        self.search_time.record(time.perf_counter() - started)
+
+        query = frozenset(words)
+        for slot in top:
+            if scores[slot] < self.threshold:
+                break
+            if _same_words(query, self._words[slot]):
+                self.hits += 1
+                return self._keys[slot]
+        return None
+
+    def discard(self, key: str) -> None:
+        slot = self._slots.pop(key, None)
+        if slot is not None:
+            self._keys[slot] = None
+            self._words[slot] = frozenset()
+            self._namespaces[slot] = -1
+            self._matrix[slot] = 0.0
+
+    def _vectorize(self, words: List[str]) -> Optional[np.ndarray]:
+        if not words:
+            return None
+
+        # Character trigrams let spelling variants overlap; whole words, and
+        # numbers especially ("world war 1" vs "2"), carry more weight.
+        features: List[Tuple[str, float]] = []
+        for word in words:
+            features.append((word, _NUMBER_WEIGHT if word.isdigit() else _WORD_WEIGHT))
+            padded = f" {word} "
+            features.extend((padded[i:i + 3], 1.0) for i in range(len(padded) - 2))
+
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature, weight in features:
+            h = zlib.crc32(feature.encode("utf-8"))
+            vector[h % self.dim] += weight if (h >> 31) & 1 else -weight
+
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else None
+
+    def get_stats(self) -> Dict[str, float]:
+        return {
+            "size": len(self._slots),
+            "capacity": self.capacity,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "search_p50_ms": self.search_time.summary((50,))["p50"] * 1000,
+        }
+
+
+def _content_words(text: str) -> List[str]:
+    return [_stem(w) for w in _WORD_PATTERN.findall(text.lower()) if w not in _STOP_WORDS]
+
+
+def _same_words(a: FrozenSet[str], b: FrozenSet[str]) -> bool:
+    """Whether every word of each set is in the other, or is a misspelling of one that is."""
+    return all(_has_counterpart(w, b) for w in a - b) and all(_has_counterpart(w, a) for w in b - a)
+
+
+def _has_counterpart(word: str, others: FrozenSet[str]) -> bool:
+    if len(word) < _TYPO_MIN_LENGTH or not word.isalpha():
+        return False  # short words and numbers must match exactly
+    return any(
+        len(other) >= _TYPO_MIN_LENGTH and SequenceMatcher(None, word, other).ratio() >= _TYPO_RATIO
+        for other in others
+    )
+
+
+def _stem(word: str) -> str:
+    """Fold simple plurals so "holes" and "hole" hash the same."""
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
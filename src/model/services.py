@@ -286,6 +286,10 @@ class GameStatsService:
     def log_trivia_answer(self, user_id: int, correct: bool, difficulty: str, points: int = 0) -> None:
         self.db.log_trivia_answer(user_id, correct, difficulty, points)
 
+    def log_trivia_round(self, difficulty: str, results: List[Tuple[int, bool, int]]) -> None:
+        """Log a multiplayer round's (user_id, correct, points) answers and award the points at once."""
+        self.db.log_trivia_round(difficulty, results)
+
     def log_trivia_competition(
         self,
         user_id: int,
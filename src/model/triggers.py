@@ -0,0 +1,184 @@
+"""Config-driven chit-chat triggers compiled into a single regex per guild."""
+
+from __future__ import annotations
+
+import random
+import re
+import time
+from typing import Dict, Iterable, List, Optional, Pattern, Tuple
+
+from logger import get_logger
+from utils import load_json_config
+
+log = get_logger(__name__)
+
+
+class Trigger:
+    """One natural-language trigger: phrases to look for and how to respond."""
+
+    __slots__ = ("name", "phrases", "responses", "action", "priority", "cooldown", "skip_if_mentions")
+
+    def __init__(
+        self,
+        name: str,
+        phrases: Iterable[str],
+        responses: Optional[List[str]] = None,
+        action: Optional[str] = None,
+        priority: int = 0,
+        cooldown: float = 0.0,
+        skip_if_mentions: bool = False,
+    ) -> None:
+        self.name = name
+        self.phrases = [p.lower() for p in phrases if p and p.strip()]
+        self.responses = responses or []
+        self.action = action
+        self.priority = priority
+        self.cooldown = cooldown
+        self.skip_if_mentions = skip_if_mentions
+
+    @classmethod
+    def from_config(cls, data: Dict) -> "Trigger":
+        return cls(
+            name=str(data["name"]),
+            phrases=data.get("phrases", []),
+            responses=list(data.get("responses", [])),
+            action=data.get("action"),
+            priority=int(data.get("priority", 0)),
+            cooldown=float(data.get("cooldown", 0)),
+            skip_if_mentions=bool(data.get("skip_if_mentions", False)),
+        )
+
+    def pick_response(self) -> Optional[str]:
+        return random.choice(self.responses) if self.responses else None
+
+
+class _CompiledTriggers:
+    """All phrases of one trigger set folded into one alternation."""
+
+    __slots__ = ("pattern", "by_phrase")
+
+    def __init__(self, triggers: List[Trigger]) -> None:
+        self.by_phrase: Dict[str, List[Trigger]] = {}
+        for trigger in triggers:
+            for phrase in trigger.phrases:
+                self.by_phrase.setdefault(phrase, []).append(trigger)
+
+        phrases = sorted(self.by_phrase, key=len, reverse=True)
+        self.pattern: Optional[Pattern[str]] = (
+            re.compile("|".join(re.escape(p) for p in phrases)) if phrases else None
+        )
+
+
+class TriggerEngine:
+    """Match messages against configured triggers, screened by a single regex pass.
+
+    Config layout (JSON)::
+
+        {
+          "triggers": [{"name": ..., "phrases": [...], "responses": [...],
+                        "action": null, "priority": 0, "cooldown": 0,
+                        "skip_if_mentions": false}, ...],
+          "guilds": {"<guild_id>": [<trigger>, ...]}
+        }
+
+    Guild triggers are added on top of the global ones; a guild trigger with
+    the same name as a global one replaces it for that guild.
+    """
+
+    def __init__(self, config_path: str = "config/triggers.json") -> None:
+        self.config_path = config_path
+        self._global: List[Trigger] = []
+        self._guild: Dict[int, List[Trigger]] = {}
+        self._compiled: Dict[Optional[int], _CompiledTriggers] = {}
+        # {(trigger_name, channel_id): monotonic time its cooldown ends}
+        self._cooldowns: Dict[Tuple[str, int], float] = {}
+        self.reload()
+
+    # ------------------------------------------------------------- config IO
+
+    def reload(self) -> None:
+        config = load_json_config(self.config_path)
+
+        self._global = self._parse(config.get("triggers", []))
+        self._guild = {}
+        for guild_id, entries in config.get("guilds", {}).items():
+            try:
+                self._guild[int(guild_id)] = self._parse(entries)
+            except ValueError:
+                log.warning("Ignoring triggers for invalid guild id %r", guild_id)
+
+        self._compiled.clear()
+        self._cooldowns.clear()
+        log.info(
+            "Loaded %s global triggers and %s guild trigger sets",
+            len(self._global), len(self._guild),
+        )
+
+    @staticmethod
+    def _parse(entries: List[Dict]) -> List[Trigger]:
+        triggers: List[Trigger] = []
+        for entry in entries:
+            try:
+                triggers.append(Trigger.from_config(entry))
+            except (KeyError, TypeError, ValueError) as e:
+                log.warning("Skipping invalid trigger %r: %s", entry, e)
+        return triggers
+
+    def _compiled_for(self, guild_id: Optional[int]) -> _CompiledTriggers:
+        key = guild_id if guild_id in self._guild else None
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            triggers = self._global
+            if key is not None:
+                overrides = {t.name for t in self._guild[key]}
+                triggers = [t for t in self._global if t.name not in overrides] + self._guild[key]
+            compiled = _CompiledTriggers(triggers)
+            self._compiled[key] = compiled
+        return compiled
+
+    # --------------------------------------------------------------- matching
+
+    def match(
+        self,
+        content: str,
+        guild_id: Optional[int] = None,
+        channel_id: int = 0,
+        has_mentions: bool = False,
+    ) -> Optional[Trigger]:
+        """Return the highest-priority trigger found in `content` that is off cooldown."""
+        compiled = self._compiled_for(guild_id)
+        if compiled.pattern is None:
+            return None
+
+        text = content.lower()
+        if not compiled.pattern.search(text):
+            return None
+
+        # The regex only screens out the messages that hit nothing. Its matches
+        # never overlap, so a phrase inside or across another match would be
+        # missed; check each phrase on its own instead.
+        candidates: Dict[str, Trigger] = {}
+        for phrase, triggers in compiled.by_phrase.items():
+            if phrase in text:
+                for trigger in triggers:
+                    candidates[trigger.name] = trigger
+
+        now = time.monotonic()
+        for trigger in sorted(candidates.values(), key=lambda t: t.priority, reverse=True):
+            if trigger.skip_if_mentions and has_mentions:
+                continue
+            key = (trigger.name, channel_id)
+            if trigger.cooldown and now < self._cooldowns.get(key, float("-inf")):
+                continue
+            if trigger.cooldown:
+                self._cooldowns[key] = now + trigger.cooldown
+            return trigger
+        return None
+
+    def prune(self) -> int:
+        """Forget cooldowns that have run out. Returns how many were dropped."""
+        now = time.monotonic()
+        expired = [key for key, until in self._cooldowns.items() if until <= now]
+        for key in expired:
+            del self._cooldowns[key]
+        return len(expired)
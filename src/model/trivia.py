@@ -0,0 +1,321 @@
+"""Trivia question supply: validation, a persistent question bank and a prefetch pool."""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import re
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from logger import get_logger
+
+from .llm import Priority
+from .model import Database
+
+log = get_logger(__name__)
+
+ANSWER_LETTERS = ("A", "B", "C", "D")
+
+# (difficulty, genre, priority) -> question dict; may raise on failure
+TriviaGenerator = Callable[[str, str, Priority], Awaitable[dict]]
+# (difficulty, genre, count, priority) -> up to `count` question dicts, not yet validated
+TriviaBatchGenerator = Callable[[str, str, int, Priority], Awaitable[List[dict]]]
+
+PoolKey = Tuple[str, str]
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def is_valid_question(data) -> bool:
+    """Whether `data` is a playable question: text, four distinct options, answer A-D."""
+    if not isinstance(data, dict):
+        return False
+    options = data.get("options")
+    return (
+        isinstance(data.get("question"), str)
+        and bool(data["question"].strip())
+        and isinstance(options, list)
+        and len(options) == 4
+        and all(isinstance(o, str) and o.strip() for o in options)
+        and len({o.strip().lower() for o in options}) == 4
+        and str(data.get("answer", "")).strip().upper() in ANSWER_LETTERS
+    )
+
+
+def normalize_genre(genre: str) -> str:
+    return " ".join(genre.lower().split())
+
+
+def question_hash(question: str) -> str:
+    """Hash of the question text ignoring case, punctuation and spacing, for deduplication."""
+    normalized = " ".join(_NON_WORD.split(question.lower())).strip()
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+class TriviaBank:
+    """Every generated question, kept in the database and served again.
+
+    Questions are deduplicated by `question_hash` and served least-used
+    first, skipping any the player saw in the last `seen_window_days`. A
+    (difficulty, genre) counts as thin for a player while fewer than
+    `min_unseen` unseen questions remain; only then is generating new ones
+    worthwhile.
+    """
+
+    def __init__(self, db: Database, seen_window_days: int = 30, min_unseen: int = 10) -> None:
+        self.db = db
+        self.seen_window = timedelta(days=seen_window_days)
+        self.min_unseen = min_unseen
+
+        self.served = 0
+        self.added = 0
+        self.duplicates = 0
+
+    def _seen_since(self) -> datetime:
+        return datetime.utcnow() - self.seen_window
+
+    def add(self, difficulty: str, genre: str, question: dict) -> dict:
+        """Store `question` (if new) and return it tagged with its bank id."""
+        question_id, created = self.db.add_trivia_question(
+            question_hash(question["question"]),
+            difficulty.lower(),
+            normalize_genre(genre),
+            {**question, "answer": str(question["answer"]).strip().upper()},
+        )
+        if created:
+            self.added += 1
+        else:
+            self.duplicates += 1
+        return {**question, "id": question_id}
+
+    def draw(self, difficulty: str, genre: str, user_ids: List[int], count: int) -> List[dict]:
+        """Up to `count` questions none of `user_ids` has seen recently, marked as seen."""
+        questions = self.db.draw_trivia_questions(
+            difficulty.lower(), normalize_genre(genre), user_ids, count, self._seen_since()
+        )
+        self.served += len(questions)
+        return questions
+
+    def claim(self, questions: List[dict], user_ids: List[int]) -> List[dict]:
+        """Mark banked questions served from elsewhere as seen; drops ones a player already saw."""
+        ids = [q["id"] for q in questions if "id" in q]
+        kept = set(self.db.claim_trivia_questions(ids, user_ids, self._seen_since())) if ids else set()
+        claimed = [q for q in questions if "id" not in q or q["id"] in kept]
+        self.served += len(claimed)
+        return claimed
+
+    def mark_seen(self, questions: List[dict], user_ids: List[int]) -> None:
+        """Record that `user_ids` saw these banked questions, e.g. everyone who played a round."""
+        self.db.record_trivia_views([q["id"] for q in questions if "id" in q], user_ids)
+
+    def is_thin(self, difficulty: str, genre: str, user_id: int) -> bool:
+        unseen = self.db.count_unseen_trivia_questions(
+            difficulty.lower(), normalize_genre(genre), user_id, self._seen_since()
+        )
+        return unseen < self.min_unseen
+
+    def prune(self) -> None:
+        """Forget views older than the exclusion window."""
+        self.db.delete_trivia_views_before(self._seen_since())
+
+    def get_stats(self) -> Dict[str, float]:
+        return {"served": self.served, "added": self.added, "duplicates": self.duplicates}
+
+
+class TriviaPool:
+    """Small buffers of ready questions per (difficulty, genre).
+
+    Taking a question leaves the buffer to be topped back up to `target` by a
+    background-priority task once it falls below `low_water`, so the next
+    question is usually already there. Only the `max_keys` most recently used
+    (difficulty, genre) pairs keep a buffer, since genres are free text.
+
+    With `generate_batch`, a take that is short by more than one question asks
+    for all of them in a single call and only regenerates the entries that
+    come back invalid or duplicated.
+    """
+
+    def __init__(
+        self,
+        generate: TriviaGenerator,
+        target: int = 3,
+        low_water: int = 2,
+        max_keys: int = 32,
+        generate_batch: Optional[TriviaBatchGenerator] = None,
+    ) -> None:
+        self._generate = generate
+        self._generate_batch = generate_batch
+        self.target = target
+        self.low_water = low_water
+        self.max_keys = max_keys
+
+        self._buffers: "OrderedDict[PoolKey, Deque[dict]]" = OrderedDict()
+        self._refilling: Dict[PoolKey, asyncio.Task] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self.failures = 0
+        self.batches = 0
+        self.duplicates = 0
+
+    @staticmethod
+    def key(difficulty: str, genre: str) -> PoolKey:
+        return difficulty.lower(), normalize_genre(genre)
+
+    async def get(self, difficulty: str, genre: str) -> Optional[dict]:
+        """One question, from the buffer if possible. None if generation failed."""
+        questions = await self.take(difficulty, genre, 1)
+        return questions[0] if questions else None
+
+    async def take(self, difficulty: str, genre: str, count: int) -> List[dict]:
+        """Up to `count` questions: buffered ones first, the rest generated concurrently."""
+        key = self.key(difficulty, genre)
+        buffer = self._buffer(key)
+
+        questions = [buffer.popleft() for _ in range(min(count, len(buffer)))]
+        self.hits += len(questions)
+        missing = count - len(questions)
+        if missing:
+            self.misses += missing
+            taken = {question_hash(q["question"]) for q in questions}
+            questions.extend(await self._generate_many(key, missing, Priority.INTERACTIVE, taken))
+
+        self._maybe_refill(key)
+        return questions
+
+    def warm(self, difficulty: str, genre: str) -> None:
+        """Start filling the buffer for a pair that is about to be played."""
+        key = self.key(difficulty, genre)
+        self._buffer(key)
+        self._maybe_refill(key)
+
+    def close(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+
+    # ---------------------------------------------------------------- refilling
+
+    def _buffer(self, key: PoolKey) -> Deque[dict]:
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            buffer = self._buffers[key] = deque()
+            while len(self._buffers) > self.max_keys:
+                evicted, _ = self._buffers.popitem(last=False)
+                task = self._refilling.pop(evicted, None)
+                if task:
+                    task.cancel()
+        self._buffers.move_to_end(key)
+        return buffer
+
+    def _maybe_refill(self, key: PoolKey) -> None:
+        buffer = self._buffers.get(key)
+        if buffer is None or key in self._refilling or len(buffer) >= self.low_water:
+            return
+        task = asyncio.get_running_loop().create_task(self._refill(key, buffer))
+        self._refilling[key] = task
+        self._tasks.add(task)
+        task.add_done_callback(lambda t: self._refilled(key, t))
+
+    def _refilled(self, key: PoolKey, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if self._refilling.get(key) is task:
+            del self._refilling[key]
+
+    async def _refill(self, key: PoolKey, buffer: Deque[dict]) -> None:
+        repeats = 0
+        while len(buffer) < self.target and self._buffers.get(key) is buffer:
+            question = await self._generate_one(key, Priority.BACKGROUND)
+            if question is None:
+                return  # leave it for the next take rather than hammer a failing model
+            if question_hash(question["question"]) in {question_hash(q["question"]) for q in buffer}:
+                self.duplicates += 1
+                repeats += 1
+                if repeats >= self.target:
+                    return  # the model keeps repeating itself for this pair
+                continue
+            buffer.append(question)
+
+    async def _generate_many(
+        self, key: PoolKey, count: int, priority: Priority, exclude: Optional[Set[str]] = None
+    ) -> List[dict]:
+        """`count` questions distinct from each other and from the `exclude` hashes.
+
+        Comes from one batch call where possible, topping up the rejects one by one.
+        """
+        questions: List[dict] = []
+        hashes: Set[str] = set(exclude or ())
+        if self._generate_batch and count > 1:
+            self.batches += 1
+            try:
+                batch = await self._generate_batch(key[0], key[1], count, priority)
+            except Exception as e:
+                log.warning("Trivia batch for %s/%s failed: %s", key[0], key[1], e)
+                batch = []
+
+            for question in batch:
+                if not is_valid_question(question):
+                    continue
+                digest = question_hash(question["question"])
+                if digest not in hashes and len(questions) < count:
+                    hashes.add(digest)
+                    questions.append(question)
+            self.generated += len(questions)
+            self.failures += count - len(questions)
+            if len(questions) < count:
+                log.info("Trivia batch for %s/%s returned %s/%s usable questions",
+                         key[0], key[1], len(questions), count)
+
+        # Top up the rest singly. These can repeat the batch or each other, so
+        # duplicates get one more try before the take comes up short.
+        for _ in range(2):
+            missing = count - len(questions)
+            if not missing:
+                break
+            generated = await asyncio.gather(*(self._generate_one(key, priority) for _ in range(missing)))
+            repeats = 0
+            for question in generated:
+                if question is None:
+                    continue
+                digest = question_hash(question["question"])
+                if digest in hashes:
+                    repeats += 1
+                    continue
+                hashes.add(digest)
+                questions.append(question)
+            self.duplicates += repeats
+            if not repeats:
+                break
+        return questions
+
+    async def _generate_one(self, key: PoolKey, priority: Priority) -> Optional[dict]:
+        try:
+            question = await self._generate(key[0], key[1], priority)
+        except Exception as e:
+            self.failures += 1
+            log.warning("Trivia generation for %s/%s failed: %s", key[0], key[1], e)
+            return None
+        if not is_valid_question(question):
+            self.failures += 1
+            log.warning("Discarding invalid trivia question for %s/%s", key[0], key[1])
+            return None
+        self.generated += 1
+        return question
+
+    # ----------------------------------------------------------------- metrics
+
+    def get_stats(self) -> Dict[str, float]:
+        return {
+            "buffered": sum(len(b) for b in self._buffers.values()),
+            "keys": len(self._buffers),
+            "refilling": len(self._refilling),
+            "hits": self.hits,
+            "misses": self.misses,
+            "generated": self.generated,
+            "failures": self.failures,
+            "batches": self.batches,
+            "duplicates": self.duplicates,
+        }
@@ -0,0 +1,121 @@
+"""Event-loop lag watchdog: measures scheduling delay and reports blocking call sites."""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from typing import Dict, Optional
+
+from logger import get_logger
+
+from .metrics import LatencyTracker
+
+log = get_logger(__name__)
+
+
+class LoopWatchdog:
+    """Measure event-loop lag and log the main-thread stack when the loop stalls.
+
+    A coroutine on the loop wakes every `interval` seconds and records how late
+    it was scheduled. A helper thread watches the coroutine's heartbeat; if the
+    loop has not ticked for `threshold` seconds it grabs the loop thread's
+    current frame, so the log shows what was blocking while it still blocks.
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.25,
+        threshold: float = 0.5,
+        max_frames: int = 12,
+        window: int = 2048,
+    ) -> None:
+        self.interval = interval
+        self.threshold = threshold
+        self.max_frames = max_frames
+
+        self.lag = LatencyTracker(window)
+        self.stalls = 0
+
+        self._last_beat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # ------------------------------------------------------------- lifecycle
+
+    def start(self) -> None:
+        """Start measuring. Must be called from the running loop; no-op if already running."""
+        if self._task and not self._task.done():
+            return
+
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        # A fresh event per run: a monitor thread from before a stop() may not
+        # have noticed its event yet, and clearing it would keep it alive.
+        self._stop = threading.Event()
+        self._task = asyncio.get_running_loop().create_task(self._tick())
+
+        self._thread = threading.Thread(
+            target=self._monitor, args=(self._stop,), name="loop-watchdog", daemon=True
+        )
+        self._thread.start()
+        log.info("Loop watchdog started (interval=%.2fs, threshold=%.2fs)", self.interval, self.threshold)
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    # -------------------------------------------------------------- sampling
+
+    async def _tick(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self.lag.record(max(0.0, now - expected))
+            self._last_beat = now
+
+    def _monitor(self, stop: threading.Event) -> None:
+        reported_beat = None
+        while not stop.wait(self.interval / 2):
+            beat = self._last_beat
+            # A healthy loop beats every `interval`; only time past the next due beat is lag
+            overdue = time.monotonic() - beat - self.interval
+            if overdue < self.threshold or beat == reported_beat:
+                continue
+
+            # One report per stall; the next heartbeat re-arms it.
+            reported_beat = beat
+            self.stalls += 1
+            log.warning(
+                "Event loop blocked for %.0fms; loop thread is at:\n%s",
+                overdue * 1000,
+                self._format_loop_stack(),
+            )
+
+    def _format_loop_stack(self) -> str:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return "  <loop thread frame unavailable>"
+        stack = traceback.extract_stack(frame)[-self.max_frames:]
+        return "".join(traceback.format_list(stack)).rstrip()
+
+    # --------------------------------------------------------------- metrics
+
+    def get_stats(self) -> Dict[str, float]:
+        """Lag percentiles in milliseconds plus the number of reported stalls."""
+        summary = self.lag.summary((50, 95, 99))
+        return {
+            "samples": summary["count"],
+            "p50_ms": summary["p50"] * 1000,
+            "p95_ms": summary["p95"] * 1000,
+            "p99_ms": summary["p99"] * 1000,
+            "max_ms": summary["max"] * 1000,
+            "stalls": self.stalls,
+        }
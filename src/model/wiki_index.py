@@ -0,0 +1,280 @@
+"""Offline Wikipedia abstracts: a sorted, memory-mapped title index over an abstracts blob.
+
+Build once from a Wikipedia abstracts dump (``enwiki-latest-abstract.xml[.gz]``):
+
+    python -m model.wiki_index <dump> data/wiki_index
+
+which writes two files into the output directory:
+
+- ``titles.idx``: header, fixed-width entries sorted by normalized title,
+  then the normalized titles themselves. Each entry points at its title in
+  the key region and at its record in the blob.
+- ``abstracts.bin``: records of ``title\\nurl\\nabstract`` in dump order,
+  addressed by (offset, length).
+
+Lookups binary-search the mapped entries, so opening the index costs
+nothing and only the pages touched by a search are read from disk.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import mmap
+import os
+import re
+import struct
+import unicodedata
+import xml.etree.ElementTree as ET
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from logger import get_logger
+
+log = get_logger(__name__)
+
+INDEX_FILE = "titles.idx"
+BLOB_FILE = "abstracts.bin"
+
+_MAGIC = b"JWIKIDX2"  # 2: keys fold accents
+_HEADER = struct.Struct("<8sQ")  # magic, entry count
+_ENTRY = struct.Struct("<IHQI")  # key offset, key length, record offset, record length
+
+# Abstracts that are template debris or disambiguation stubs; the API does better.
+_JUNK_PREFIXES = ("|", "{", "}", "!", "=")
+_MIN_ABSTRACT_CHARS = 40
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(])")
+# Words ending in a period that rarely end a sentence
+_ABBREVIATIONS = frozenset({
+    "dr", "mr", "mrs", "ms", "prof", "st", "mt", "ft", "jr", "sr", "gen", "col", "lt", "sgt",
+    "rev", "gov", "sen", "rep", "no", "vs", "etc", "approx", "ca", "c", "e.g", "i.e", "u.s", "u.k",
+})
+
+
+class WikiIndex:
+    """Read-only view over a built index directory."""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self._index_file = open(os.path.join(directory, INDEX_FILE), "rb")
+        self._blob_file = open(os.path.join(directory, BLOB_FILE), "rb")
+        self._index = mmap.mmap(self._index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._blob = (
+            mmap.mmap(self._blob_file.fileno(), 0, access=mmap.ACCESS_READ)
+            if os.fstat(self._blob_file.fileno()).st_size else b""
+        )
+
+        magic, self.count = _HEADER.unpack_from(self._index, 0)
+        if magic != _MAGIC:
+            self.close()
+            raise ValueError(f"{directory} is not a current wiki index; rebuild it")
+        self._keys_start = _HEADER.size + self.count * _ENTRY.size
+
+        self.lookups = 0
+        self.hits = 0
+
+    @classmethod
+    def open(cls, directory: str) -> Optional["WikiIndex"]:
+        """Open the index in `directory`, or return None when it has not been built."""
+        if not os.path.exists(os.path.join(directory, INDEX_FILE)):
+            return None
+        try:
+            index = cls(directory)
+        except (OSError, ValueError, struct.error) as e:
+            log.warning("Could not open Wikipedia index at %s: %s", directory, e)
+            return None
+        log.info("Loaded offline Wikipedia index with %s articles", index.count)
+        return index
+
+    def __len__(self) -> int:
+        return self.count
+
+    def close(self) -> None:
+        for handle in (self._index, self._blob, self._index_file, self._blob_file):
+            if hasattr(handle, "close"):
+                handle.close()
+
+    # ----------------------------------------------------------------- search
+
+    def _entry(self, i: int) -> Tuple[int, int, int, int]:
+        return _ENTRY.unpack_from(self._index, _HEADER.size + i * _ENTRY.size)
+
+    def _key(self, i: int) -> bytes:
+        key_offset, key_len, _, _ = self._entry(i)
+        start = self._keys_start + key_offset
+        return self._index[start:start + key_len]
+
+    def _lower_bound(self, key: bytes) -> int:
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _record(self, i: int) -> Dict[str, str]:
+        _, _, offset, length = self._entry(i)
+        title, url, abstract = bytes(self._blob[offset:offset + length]).decode("utf-8").split("\n", 2)
+        return {"title": title, "url": url, "abstract": abstract}
+
+    def get(self, title: str) -> Optional[Dict[str, str]]:
+        """Article whose title matches exactly (ignoring case and spacing)."""
+        key = _normalize(title).encode("utf-8")
+        i = self._lower_bound(key)
+        if i < self.count and self._key(i) == key:
+            return self._record(i)
+        return None
+
+    def prefix(self, prefix: str, limit: int = 10) -> List[str]:
+        """Up to `limit` titles starting with `prefix`, in sorted order."""
+        key = _normalize(prefix).encode("utf-8")
+        titles: List[str] = []
+        i = self._lower_bound(key)
+        while i < self.count and len(titles) < limit and self._key(i).startswith(key):
+            titles.append(self._record(i)["title"])
+            i += 1
+        return titles
+
+    def lookup(self, query: str, sentences: int = 3) -> Optional[dict]:
+        """The article titled `query`, ignoring case, accents and spacing.
+
+        Returns the same shape as `AICommands.search_wikipedia`, or None on a
+        miss. Anything short of a title match is left to the API's search,
+        which ranks by relevance rather than by spelling.
+        """
+        self.lookups += 1
+        key = _normalize(query).encode("utf-8")
+        if not key:
+            return None
+
+        i = self._lower_bound(key)
+        if i >= self.count or self._key(i) != key:
+            return None
+
+        self.hits += 1
+        record = self._record(i)
+        return {
+            "title": record["title"],
+            "extract": _first_sentences(record["abstract"], sentences),
+            "url": record["url"],
+            "image": None,
+        }
+
+    def get_stats(self) -> Dict[str, float]:
+        return {"articles": self.count, "lookups": self.lookups, "hits": self.hits}
+
+
+# ============================================================================
+# Build
+# ============================================================================
+
+def build_index(dump_path: str, out_dir: str) -> int:
+    """Build `out_dir` from an abstracts dump (plain or gzipped XML). Returns articles indexed."""
+    os.makedirs(out_dir, exist_ok=True)
+    entries: List[Tuple[bytes, int, int]] = []
+    seen = set()
+
+    # Write next to the final files and swap in at the end, so a bot that has
+    # the old index open never sees a half-written one.
+    blob_tmp = os.path.join(out_dir, BLOB_FILE + ".tmp")
+    index_tmp = os.path.join(out_dir, INDEX_FILE + ".tmp")
+
+    with _open_dump(dump_path) as dump, open(blob_tmp, "wb") as blob:
+        offset = 0
+        for title, url, abstract in _iter_abstracts(dump):
+            key = _normalize(title).encode("utf-8")
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            record = f"{title}\n{url}\n{abstract}".encode("utf-8")
+            blob.write(record)
+            entries.append((key, offset, len(record)))
+            offset += len(record)
+
+    entries.sort(key=lambda e: e[0])
+    with open(index_tmp, "wb") as index:
+        index.write(_HEADER.pack(_MAGIC, len(entries)))
+        key_offset = 0
+        for key, record_offset, record_len in entries:
+            index.write(_ENTRY.pack(key_offset, len(key), record_offset, record_len))
+            key_offset += len(key)
+        for key, _, _ in entries:
+            index.write(key)
+
+    os.replace(blob_tmp, os.path.join(out_dir, BLOB_FILE))
+    os.replace(index_tmp, os.path.join(out_dir, INDEX_FILE))
+    log.info("Indexed %s Wikipedia abstracts into %s", len(entries), out_dir)
+    return len(entries)
+
+
+def _open_dump(path: str) -> BinaryIO:
+    return gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+
+
+def _iter_abstracts(dump: BinaryIO) -> Iterator[Tuple[str, str, str]]:
+    """(title, url, abstract) for every usable <doc> in the dump, streamed."""
+    root = None
+    for event, element in ET.iterparse(dump, events=("start", "end")):
+        if root is None:
+            root = element
+        if event != "end" or element.tag != "doc":
+            continue
+        title = (element.findtext("title") or "").strip()
+        url = (element.findtext("url") or "").strip()
+        abstract = " ".join((element.findtext("abstract") or "").split())
+        root.clear()  # drop finished docs so memory stays flat over the whole dump
+
+        if title.startswith("Wikipedia: "):
+            title = title[len("Wikipedia: "):]
+        if (
+            not title
+            or "\n" in title
+            or len(abstract) < _MIN_ABSTRACT_CHARS
+            or abstract.startswith(_JUNK_PREFIXES)
+            or abstract.endswith("may refer to:")
+        ):
+            continue
+        if not url:
+            url = f"https://en.wikipedia.org/wiki/{title.replace(' ', '_')}"
+        yield title, url, abstract
+
+
+# ============================================================================
+# Helpers
+# ============================================================================
+
+def _normalize(text: str) -> str:
+    """Title key: case, accents, underscores and runs of spaces don't matter."""
+    decomposed = unicodedata.normalize("NFKD", text.replace("_", " ").casefold())
+    folded = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(folded.split())
+
+
+def _first_sentences(text: str, count: int) -> str:
+    sentences: List[str] = []
+    for part in _SENTENCE_END.split(text):
+        if sentences and _ends_with_abbreviation(sentences[-1]):
+            sentences[-1] += " " + part
+            continue
+        if len(sentences) == count:
+            break
+        sentences.append(part)
+    return " ".join(sentences)
+
+
+def _ends_with_abbreviation(sentence: str) -> bool:
+    """Whether the final period belongs to "Dr.", "e.g.", an initial like "J." and so on."""
+    if not sentence.endswith("."):
+        return False
+    word = sentence[:-1].rsplit(None, 1)[-1].lstrip("(\"'").lower()
+    return word in _ABBREVIATIONS or (len(word) == 1 and word.isalpha())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the offline Wikipedia abstracts index.")
+    parser.add_argument("dump", help="enwiki-*-abstract.xml or .xml.gz")
+    parser.add_argument("out_dir", help="directory to write the index into, e.g. data/wiki_index")
+    args = parser.parse_args()
+    print(f"Indexed {build_index(args.dump, args.out_dir)} articles")
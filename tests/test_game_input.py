@@ -0,0 +1,171 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("discord")
+
+from model.game_input import GameInputDispatcher  # noqa: E402
+
+
+def message(channel_id: int, user_id: int, content: str = "hi"):
+    return SimpleNamespace(
+        channel=SimpleNamespace(id=channel_id),
+        author=SimpleNamespace(id=user_id),
+        content=content,
+    )
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_message_reaches_only_the_waiter_for_its_channel_and_author():
+    async def main():
+        inputs = GameInputDispatcher()
+        mine = asyncio.ensure_future(inputs.wait(1, 10, timeout=1))
+        other_user = asyncio.ensure_future(inputs.wait(1, 11, timeout=1))
+        other_channel = asyncio.ensure_future(inputs.wait(2, 10, timeout=1))
+        await asyncio.sleep(0)
+
+        msg = message(1, 10)
+        assert inputs.dispatch(msg)
+        assert await mine is msg
+        assert not other_user.done() and not other_channel.done()
+        assert not inputs.dispatch(message(3, 10))
+
+        other_user.cancel()
+        other_channel.cancel()
+        await asyncio.gather(other_user, other_channel, return_exceptions=True)
+        return inputs
+
+    inputs = run(main())
+    assert inputs.get_stats() == {"waiting": 0, "channels": 0, "deadlines": 0, "dispatched": 1, "timeouts": 0}
+
+
+def test_timeouts_fire_in_deadline_order_whatever_the_wait_order():
+    async def main():
+        inputs = GameInputDispatcher()
+        expired = []
+
+        async def wait(user_id, timeout):
+            try:
+                await inputs.wait(1, user_id, timeout=timeout)
+            except asyncio.TimeoutError:
+                expired.append(user_id)
+
+        waits = [
+            asyncio.ensure_future(wait(3, 0.15)),
+            asyncio.ensure_future(wait(1, 0.05)),
+            asyncio.ensure_future(wait(2, 0.10)),
+        ]
+        await asyncio.sleep(0.07)
+        assert expired == [1]
+        await asyncio.gather(*waits)
+        return inputs, expired
+
+    inputs, expired = run(main())
+    assert expired == [1, 2, 3]
+    assert inputs.timeouts == 3
+    assert inputs.get_stats()["deadlines"] == 0
+
+
+def test_answered_wait_does_not_expire_a_later_wait_on_the_same_key():
+    async def main():
+        inputs = GameInputDispatcher()
+        first = asyncio.ensure_future(inputs.wait(1, 10, timeout=0.05))
+        await asyncio.sleep(0)
+        inputs.dispatch(message(1, 10, "first"))
+        assert (await first).content == "first"
+
+        # The same player's next wait replaces the answered one and keeps its own deadline.
+        second = asyncio.ensure_future(inputs.wait(1, 10, timeout=0.2))
+        await asyncio.sleep(0.1)
+        assert not second.done()
+        inputs.dispatch(message(1, 10, "second"))
+        return inputs, await second
+
+    inputs, reply = run(main())
+    assert reply.content == "second"
+    assert inputs.timeouts == 0
+
+
+def test_waits_on_the_same_key_each_apply_their_own_check():
+    async def main():
+        inputs = GameInputDispatcher()
+        numbers = asyncio.ensure_future(inputs.wait(1, 10, timeout=1, check=lambda m: m.content.isdigit()))
+        words = asyncio.ensure_future(inputs.wait(1, 10, timeout=1, check=lambda m: m.content.isalpha()))
+        await asyncio.sleep(0)
+
+        assert inputs.dispatch(message(1, 10, "abc"))
+        assert (await words).content == "abc"
+        assert not numbers.done()
+        assert inputs.pending() == 1
+
+        assert not inputs.dispatch(message(1, 10, "a1"))
+        assert inputs.dispatch(message(1, 10, "42"))
+        return await numbers
+
+    assert run(main()).content == "42"
+
+
+def test_cancelled_wait_leaves_nothing_behind():
+    async def main():
+        inputs = GameInputDispatcher()
+        task = asyncio.ensure_future(inputs.wait(1, 10, timeout=300))
+        await asyncio.sleep(0)
+        assert inputs.get_stats()["deadlines"] == 1
+
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return inputs
+
+    inputs = run(main())
+    assert inputs.pending() == 0
+    assert inputs.get_stats()["deadlines"] == 0
+    assert inputs._timer is None
+    assert not inputs.dispatch(message(1, 10))
+
+
+def test_answered_long_waits_do_not_pile_up_in_the_heap():
+    async def main():
+        inputs = GameInputDispatcher()
+        for _ in range(100):
+            task = asyncio.ensure_future(inputs.wait(1, 10, timeout=300))
+            await asyncio.sleep(0)
+            inputs.dispatch(message(1, 10))
+            await task
+        # One game still waiting keeps its entry.
+        pending = asyncio.ensure_future(inputs.wait(1, 11, timeout=300))
+        await asyncio.sleep(0)
+        deadlines = inputs.get_stats()["deadlines"]
+        pending.cancel()
+        await asyncio.gather(pending, return_exceptions=True)
+        return deadlines
+
+    assert run(main()) == 1
+
+
+def test_channel_listener_sees_each_members_reply():
+    async def main():
+        inputs = GameInputDispatcher()
+        answers = {}
+
+        def listener(msg):
+            answers.setdefault(msg.author.id, msg.content)  # first answer per member counts
+
+        assert inputs.listen_channel(1, listener)
+        assert not inputs.listen_channel(1, lambda msg: None)
+
+        for user_id, content in [(10, "a"), (11, "b"), (10, "c")]:
+            assert not inputs.dispatch(message(1, user_id, content))
+        inputs.dispatch(message(2, 12, "elsewhere"))
+
+        inputs.stop_listening(1, listener)
+        inputs.dispatch(message(1, 13, "late"))
+        return inputs, answers
+
+    inputs, answers = run(main())
+    assert answers == {10: "a", 11: "b"}
+    assert inputs.get_stats()["channels"] == 0
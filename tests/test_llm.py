@@ -0,0 +1,209 @@
+import asyncio
+import re
+import time
+
+import pytest
+
+pytest.importorskip("google.generativeai")
+
+from google.api_core import exceptions as google_exceptions  # noqa: E402
+
+from model.llm import (  # noqa: E402
+    LLMRateLimitError,
+    LLMService,
+    LLMTimeoutError,
+    Priority,
+    TokenBucket,
+)
+from model.llm_backends import FakeBackend  # noqa: E402
+
+ECHO = [(re.compile(""), lambda prompt, rng: prompt)]
+
+
+class ScriptedBackend(FakeBackend):
+    """Fails the first calls with the given exceptions, then answers normally."""
+
+    def __init__(self, failures, **kwargs) -> None:
+        super().__init__(responders=ECHO, **kwargs)
+        self.script = list(failures)
+
+    def maybe_fail(self) -> None:
+        if self.script:
+            self.failures += 1
+            raise self.script.pop(0)
+
+
+def service(backend=None, **kwargs) -> LLMService:
+    kwargs.setdefault("global_rpm", 6000)
+    kwargs.setdefault("retry_base_delay", 0.001)
+    backend = backend or FakeBackend(latency_ms=50, latency_sigma=0.0, responders=ECHO)
+    return LLMService(None, default_model="fake", backend=backend, **kwargs)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+# ---- scheduling
+
+def test_interactive_requests_overtake_queued_background_work():
+    async def main():
+        llm = service(max_concurrency=1)
+        finished = []
+
+        async def ask(prompt, priority):
+            finished.append(await llm.generate(prompt, priority=priority))
+
+        first = asyncio.ensure_future(ask("first", Priority.INTERACTIVE))
+        await asyncio.sleep(0)  # holds the only slot
+        queued = [
+            asyncio.ensure_future(ask("background 1", Priority.BACKGROUND)),
+            asyncio.ensure_future(ask("background 2", Priority.BACKGROUND)),
+            asyncio.ensure_future(ask("interactive", Priority.INTERACTIVE)),
+        ]
+        await asyncio.gather(first, *queued)
+        return finished
+
+    assert run(main()) == ["first", "interactive", "background 1", "background 2"]
+
+
+def test_token_bucket_allows_a_burst_then_refills_at_the_rate():
+    bucket = TokenBucket(per_minute=60, burst=2)
+    now = time.monotonic()
+    for _ in range(2):
+        assert bucket.delay(now) == 0
+        bucket.take(now)
+    assert bucket.delay(now) == pytest.approx(1.0)
+    assert bucket.delay(now + 0.5) == pytest.approx(0.5)
+    assert bucket.delay(now + 1.0) == 0
+
+
+def test_throttled_model_waits_without_blocking_other_models():
+    async def main():
+        # 120 rpm: a burst of 12, then one more every half second
+        llm = service(model_rpm={"slow": 120}, backend=FakeBackend(latency_ms=0, responders=ECHO))
+        started = time.monotonic()
+        slow = [asyncio.ensure_future(llm.generate(f"q{i}", model="slow")) for i in range(13)]
+        await llm.generate("other", model="fast")
+        other_done = time.monotonic() - started
+        done_at = []
+        for task in slow:
+            await task
+            done_at.append(time.monotonic() - started)
+        return other_done, done_at
+
+    other_done, done_at = run(main())
+    assert other_done < 0.2
+    assert max(done_at[:12]) < 0.2
+    assert 0.4 < done_at[12] < 1.0
+
+
+# ---- retries and deadlines
+
+@pytest.mark.parametrize("error", [
+    google_exceptions.ResourceExhausted("429"),
+    google_exceptions.ServiceUnavailable("503"),
+])
+def test_transient_errors_are_retried(error):
+    backend = ScriptedBackend([error, error], latency_ms=0)
+    llm = service(backend, max_retries=2)
+
+    assert run(llm.generate("hello")) == "hello"
+    assert backend.calls == 3
+    assert llm.retries == 2
+    assert llm.errors == 2
+
+
+def test_quota_error_surfaces_after_the_last_retry():
+    backend = ScriptedBackend([google_exceptions.ResourceExhausted("429")] * 3, latency_ms=0)
+    llm = service(backend, max_retries=2)
+
+    with pytest.raises(LLMRateLimitError):
+        run(llm.generate("hello", tag="ask"))
+    assert backend.calls == 3
+    assert llm.usage._pending["ask"].errors == 1  # once per request, not per attempt
+
+
+def test_interactive_timeout_is_not_retried():
+    backend = FakeBackend(latency_ms=300, latency_sigma=0.0, responders=ECHO)
+    llm = service(backend, timeout=0.1, max_retries=2)
+
+    with pytest.raises(LLMTimeoutError):
+        run(llm.generate("slow"))
+    assert backend.calls == 1
+    assert llm.retries == 0
+
+
+def test_background_timeouts_are_retried():
+    backend = FakeBackend(latency_ms=300, latency_sigma=0.0, responders=ECHO)
+    llm = service(backend, timeout=0.1, max_retries=1)
+
+    with pytest.raises(LLMTimeoutError):
+        run(llm.generate("slow", priority=Priority.BACKGROUND))
+    assert backend.calls == 2
+    assert llm.retries == 1
+
+
+def test_deadline_covers_every_attempt_only_for_background_work():
+    llm = service()
+    now = time.monotonic()
+    assert llm._deadline(Priority.INTERACTIVE, 10, 2) - now == pytest.approx(10, abs=0.1)
+    assert llm._deadline(Priority.BACKGROUND, 10, 2) - now == pytest.approx(30, abs=0.1)
+
+
+# ---- coalescing
+
+def test_identical_concurrent_requests_share_one_call():
+    async def main():
+        llm = service()
+        replies = await asyncio.gather(*(llm.generate("same") for _ in range(3)))
+        return llm, replies
+
+    llm, replies = run(main())
+    assert replies == ["same"] * 3
+    assert llm.backend.calls == 1
+    assert llm.coalesced == 2
+
+
+def test_different_priorities_are_not_coalesced():
+    async def main():
+        llm = service()
+        await asyncio.gather(
+            llm.generate("same", priority=Priority.INTERACTIVE),
+            llm.generate("same", priority=Priority.BACKGROUND),
+        )
+        return llm
+
+    assert run(main()).backend.calls == 2
+
+
+def test_follower_times_out_while_the_leader_finishes():
+    async def main():
+        llm = service(FakeBackend(latency_ms=300, latency_sigma=0.0, responders=ECHO))
+        leader = asyncio.ensure_future(llm.generate("same", timeout=5))
+        await asyncio.sleep(0)
+        with pytest.raises(LLMTimeoutError):
+            await llm.generate("same", timeout=0.1)
+        return llm, await leader
+
+    llm, reply = run(main())
+    assert reply == "same"
+    assert llm.backend.calls == 1
+    assert llm.coalesced == 1
+
+
+def test_identical_streams_share_one_call():
+    async def main():
+        llm = service(FakeBackend(latency_ms=10, latency_sigma=0.0, chunk_chars=2,
+                                  chunk_interval_ms=5, responders=ECHO))
+
+        async def read():
+            return "".join([chunk async for chunk in llm.stream("a longer prompt")])
+
+        replies = await asyncio.gather(read(), read())
+        return llm, replies
+
+    llm, replies = run(main())
+    assert replies == ["a longer prompt"] * 2
+    assert llm.backend.calls == 1
+    assert llm.coalesced == 1
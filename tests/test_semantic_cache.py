@@ -0,0 +1,57 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from constants import SEMANTIC_CACHE_THRESHOLD  # noqa: E402
+from model.semantic_cache import SemanticIndex  # noqa: E402
+
+
+def reuses(cached: str, query: str) -> bool:
+    """Whether `query` would be answered with the answer cached for `cached`."""
+    index = SemanticIndex(threshold=SEMANTIC_CACHE_THRESHOLD)
+    index.add("ask", cached, "key")
+    return index.lookup("ask", query) == "key"
+
+
+@pytest.mark.parametrize("cached, query", [
+    # symbols
+    ("c vs rust", "c++ vs rust"),
+    ("explain c", "explain c#"),
+    ("c++ vs java", "c# vs java"),
+    # numbers
+    ("world war 1", "world war 2"),
+    # one extra content word, either way round
+    ("how to tie a bow tie", "how to tie a tie"),
+    ("how to tie a tie", "how to tie a bow tie"),
+    ("photosynthesis", "photosynthesis in plants"),
+    ("history of ancient rome", "history of rome"),
+])
+def test_different_questions_miss(cached, query):
+    assert not reuses(cached, query)
+
+
+@pytest.mark.parametrize("cached, query", [
+    ("what is a black hole", "what are black holes"),
+    ("how to tie a tie", "how do i tie a tie"),
+    ("how to bake bread?", "How do you bake bread"),
+    ("explain photosynthesis", "explain photosynthesys"),
+    ("quantum entanglement", "quantum entanglment"),
+])
+def test_rephrasings_hit(cached, query):
+    assert reuses(cached, query)
+
+
+def test_best_scoring_entry_with_other_words_is_skipped():
+    index = SemanticIndex(threshold=SEMANTIC_CACHE_THRESHOLD)
+    index.add("howto", "how to tie a bow tie", "bow")
+    index.add("howto", "tie a tie", "tie")
+    assert index.lookup("howto", "how do I tie a tie") == "tie"
+    assert index.lookup("howto", "tie a bow tie") == "bow"
+
+
+def test_namespaces_and_discard():
+    index = SemanticIndex(threshold=SEMANTIC_CACHE_THRESHOLD)
+    index.add("ask", "c vs rust", "key-c")
+    assert index.lookup("explain", "c vs rust") is None
+    index.discard("key-c")
+    assert index.lookup("ask", "c vs rust") is None
@@ -0,0 +1,91 @@
+import json
+import time
+
+import pytest
+
+pytest.importorskip("discord")  # via utils
+
+from model.triggers import TriggerEngine  # noqa: E402
+
+
+def engine(tmp_path, triggers, guilds=None) -> TriggerEngine:
+    path = tmp_path / "triggers.json"
+    path.write_text(json.dumps({"triggers": triggers, "guilds": guilds or {}}))
+    return TriggerEngine(str(path))
+
+
+def name(trigger):
+    return trigger.name if trigger else None
+
+
+@pytest.mark.parametrize("content", [
+    "see you later alligator",  # the low-priority phrase contains the high one
+    "oh no, god night",         # the two share "god"
+])
+def test_higher_priority_phrase_wins_even_when_matches_overlap(tmp_path, content):
+    triggers = engine(tmp_path, [
+        {"name": "chatter", "phrases": ["see you later", "oh no, god"], "priority": 1},
+        {"name": "goodbye", "phrases": ["see you", "god night"], "priority": 5},
+    ])
+    assert name(triggers.match(content)) == "goodbye"
+
+
+def test_no_phrase_no_match(tmp_path):
+    triggers = engine(tmp_path, [{"name": "hello", "phrases": ["hello"]}])
+    assert triggers.match("nothing to see here") is None
+    assert name(triggers.match("Well HELLO there")) == "hello"
+
+
+def test_skip_if_mentions_falls_through_to_the_next_trigger(tmp_path):
+    triggers = engine(tmp_path, [
+        {"name": "chat", "phrases": ["thanks"], "priority": 5, "skip_if_mentions": True},
+        {"name": "ack", "phrases": ["thanks"], "priority": 1},
+    ])
+    assert name(triggers.match("thanks")) == "chat"
+    assert name(triggers.match("thanks", has_mentions=True)) == "ack"
+
+
+def test_cooldown_is_per_channel(tmp_path):
+    triggers = engine(tmp_path, [
+        {"name": "hype", "phrases": ["lets go"], "priority": 5, "cooldown": 60},
+        {"name": "fallback", "phrases": ["go"]},
+    ])
+    assert name(triggers.match("lets go", channel_id=1)) == "hype"
+    # On cooldown in channel 1, so the lower-priority trigger answers instead.
+    assert name(triggers.match("lets go", channel_id=1)) == "fallback"
+    assert name(triggers.match("lets go", channel_id=2)) == "hype"
+
+
+def test_guild_trigger_replaces_the_global_one_with_its_name(tmp_path):
+    triggers = engine(
+        tmp_path,
+        [{"name": "hello", "phrases": ["hello"], "responses": ["hi"]},
+         {"name": "bye", "phrases": ["bye"]}],
+        guilds={"42": [{"name": "hello", "phrases": ["howdy"], "responses": ["yeehaw"]},
+                       {"name": "local", "phrases": ["local"]}]},
+    )
+    assert triggers.match("hello", guild_id=42) is None
+    assert triggers.match("howdy", guild_id=42).responses == ["yeehaw"]
+    assert name(triggers.match("bye", guild_id=42)) == "bye"
+    assert name(triggers.match("local", guild_id=42)) == "local"
+
+    assert triggers.match("hello", guild_id=7).responses == ["hi"]
+    assert triggers.match("local") is None
+
+
+def test_prune_drops_only_expired_cooldowns(tmp_path, monkeypatch):
+    triggers = engine(tmp_path, [
+        {"name": "short", "phrases": ["short"], "cooldown": 10},
+        {"name": "long", "phrases": ["long"], "cooldown": 100},
+    ])
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now)
+    triggers.match("short", channel_id=1)
+    triggers.match("short", channel_id=2)
+    triggers.match("long", channel_id=1)
+
+    monkeypatch.setattr(time, "monotonic", lambda: now + 50)
+    assert triggers.prune() == 2
+    assert triggers.prune() == 0
+    assert name(triggers.match("short", channel_id=1)) == "short"
+    assert triggers.match("long", channel_id=1) is None
@@ -0,0 +1,109 @@
+import gzip
+
+import pytest
+
+from model.wiki_index import WikiIndex, _first_sentences, build_index
+
+DUMP = """<feed>
+<doc>
+<title>Wikipedia: Black hole</title>
+<url>https://en.wikipedia.org/wiki/Black_hole</url>
+<abstract>A black hole is a region of spacetime where gravity is so strong that nothing can escape. It was first predicted by general relativity. Its boundary is the event horizon.</abstract>
+</doc>
+<doc>
+<title>Wikipedia: Black</title>
+<url>https://en.wikipedia.org/wiki/Black</url>
+<abstract>Black is a color that results from the absence or complete absorption of visible light.</abstract>
+</doc>
+<doc>
+<title>Wikipedia: Albert Einstein</title>
+<url>https://en.wikipedia.org/wiki/Albert_Einstein</url>
+<abstract>Albert Einstein was a German-born theoretical physicist. He developed the theory of relativity. He received the Nobel Prize in 1921.</abstract>
+</doc>
+<doc>
+<title>Wikipedia: Einstein (crater)</title>
+<url>https://en.wikipedia.org/wiki/Einstein_(crater)</url>
+<abstract>Einstein is a large lunar impact crater located along the western limb of the Moon.</abstract>
+</doc>
+<doc>
+<title>Wikipedia: Éclair</title>
+<url></url>
+<abstract>An éclair is a pastry made with choux dough filled with a cream and topped with a flavored icing.</abstract>
+</doc>
+<doc>
+<title>Wikipedia: Mercury (disambiguation)</title>
+<url>https://en.wikipedia.org/wiki/Mercury</url>
+<abstract>Mercury may refer to:</abstract>
+</doc>
+<doc>
+<title>Wikipedia: Template junk</title>
+<url>https://en.wikipedia.org/wiki/Template_junk</url>
+<abstract>| name = something long enough to pass the length check easily</abstract>
+</doc>
+</feed>
+"""
+
+
+@pytest.fixture(scope="module")
+def index(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("wiki")
+    dump = directory / "abstracts.xml.gz"
+    with gzip.open(dump, "wt", encoding="utf-8") as f:
+        f.write(DUMP)
+    assert build_index(str(dump), str(directory / "index")) == 5
+
+    index = WikiIndex.open(str(directory / "index"))
+    yield index
+    index.close()
+
+
+def test_exact_title_ignores_case_spacing_and_underscores(index):
+    assert index.lookup("black  HOLE")["title"] == "Black hole"
+    assert index.lookup("Albert_Einstein")["url"] == "https://en.wikipedia.org/wiki/Albert_Einstein"
+
+
+def test_accents_are_folded(index):
+    result = index.lookup("eclair")
+    assert result["title"] == "Éclair"
+    assert result["url"] == "https://en.wikipedia.org/wiki/Éclair"
+
+
+def test_partial_titles_fall_through(index):
+    # Only a title match is trusted; "einstein" must not resolve to whatever sorts first
+    assert index.lookup("einstein") is None
+    assert index.lookup("black ho") is None
+    assert index.lookup("") is None
+    assert index.lookup("black")["title"] == "Black"
+
+
+def test_junk_and_disambiguation_are_skipped(index):
+    assert index.lookup("mercury (disambiguation)") is None
+    assert index.lookup("template junk") is None
+
+
+def test_extract_is_first_sentences(index):
+    assert index.lookup("black hole", sentences=2)["extract"] == (
+        "A black hole is a region of spacetime where gravity is so strong that nothing can escape. "
+        "It was first predicted by general relativity."
+    )
+
+
+def test_prefix_lists_sorted_titles(index):
+    assert index.prefix("black") == ["Black", "Black hole"]
+
+
+def test_missing_index_opens_as_none(tmp_path):
+    assert WikiIndex.open(str(tmp_path)) is None
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Dr. Smith studied in St. Louis. He later moved. Then he retired.",
+     "Dr. Smith studied in St. Louis. He later moved."),
+    ("J. R. R. Tolkien was a writer. He wrote novels. He taught.",
+     "J. R. R. Tolkien was a writer. He wrote novels."),
+    ("Rivers (e.g. The Nile) are long. They flow. They end.",
+     "Rivers (e.g. The Nile) are long. They flow."),
+    ("One sentence only.", "One sentence only."),
+])
+def test_first_sentences_skip_abbreviations(text, expected):
+    assert _first_sentences(text, 2) == expected